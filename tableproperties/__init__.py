@@ -9,21 +9,18 @@ PY_VER_MAJOR = sys.version_info[0]
 PY_VER_MINOR = sys.version_info[1]
 
 if PY_VER_MAJOR < 3 or (PY_VER_MAJOR == 3 and PY_VER_MINOR < 4):
-    print(
+    raise ImportError(
         "This app requires Python 3.4 or higher. Version used : {}.{}".format(
             PY_VER_MAJOR, PY_VER_MINOR
         )
     )
-    #TODO don't exit here
-    exit(1)
 
 try:
-    from . import db, utils, generator
+    from . import db, utils, generator, api
 except ImportError as iex:
-    print(iex)
-    print("Please run 'pip install -r requirements.txt'")
-    #TODO don't exit here
-    exit(1)
+    raise ImportError(
+        "{}. Please run 'pip install -r requirements.txt'".format(iex)
+    ) from iex
 
 PROG_NAME = "cassandra-table-properties"
 
@@ -0,0 +1,172 @@
+""" Library interface
+
+The functions of this module only read from the database. They do not
+parse arguments, configure logging, print or exit, so they can be called
+in-process any number of times. A connected Db keeps one driver session
+with its connection pool and can be shared by all calls and threads.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from tableproperties import db, generator as gen
+
+ChangeSet = Tuple[str, Optional[str], list]
+
+
+def connect(
+    host: str = db.DEFAULT_HOST, port: int = db.DEFAULT_NATIVE_CQL_PORT, **kwargs
+    ) -> db.Db:
+    """Open a reusable database connection
+
+    Args:
+        host:   IP address or hostname
+        port:   Port number
+        kwargs: Other db.ConnectionParams arguments
+
+    Returns:
+        Connected Db with prepared schema queries. Call shutdown() or use
+        it as context manager to close it.
+    """
+    conn = db.Db(db.ConnectionParams(host=host, port=port, **kwargs))
+    conn.connect(warm_up=True)
+    return conn
+
+
+def get_current_config(
+    conn: db.Db, desired_config: Dict[str, Any] = None
+    ) -> Optional[Dict[str, Any]]:
+    """Retrieve current keyspace and table properties
+
+    Args:
+        conn:           Database connection
+        desired_config: If set, only the keyspaces and tables it lists are
+                        read with targeted queries
+
+    Returns:
+        Dictionary with keyspace and table properties or None if there
+        are no matching keyspaces
+
+    Raises:
+        KeyError if a keyspace or table of desired_config has no name
+    """
+    if desired_config is None:
+        return conn.get_current_config()
+    return conn.get_matching_config(desired_config)
+
+
+def fetch_configs(
+    conns: Sequence[db.Db], drop_ids: bool = True
+    ) -> List[Optional[Dict[str, Any]]]:
+    """Retrieve the current properties of several clusters concurrently
+
+    Args:
+        conns:    Database connections
+        drop_ids: Skip table ids, which differ between clusters
+
+    Returns:
+        List of configurations in the order of the connections
+    """
+    with ThreadPoolExecutor(max_workers=max(1, len(conns))) as executor:
+        return list(
+            executor.map(lambda conn: conn.get_current_config(drop_ids), conns)
+        )
+
+
+def compare_clusters(
+    conn: db.Db, reference_conn: db.Db, workers: int = None
+    ) -> List[ChangeSet]:
+    """Compare a cluster with a reference cluster
+
+    Both clusters are read concurrently. The reference properties are the
+    desired side of the comparison.
+
+    Args:
+        conn:           Connection of the cluster to change
+        reference_conn: Connection of the cluster with the desired properties
+        workers:        Number of worker processes for the comparison
+
+    Returns:
+        List of (keyspace name, table name, changes) tuples that make the
+        cluster match the reference
+    """
+    current_config, reference_config = fetch_configs([conn, reference_conn])
+    if not current_config or not reference_config:
+        return []
+    return list(gen.iter_change_sets(current_config, reference_config, workers))
+
+
+def get_change_sets(
+    conn: db.Db, desired_config: Dict[str, Any], workers: int = None
+    ) -> List[ChangeSet]:
+    """Compare desired properties with the cluster
+
+    Args:
+        conn:           Database connection
+        desired_config: Desired properties in the layout of the YAML files
+        workers:        Number of worker processes for the comparison
+
+    Returns:
+        List of (keyspace name, table name, changes) tuples. The table name
+        is None for keyspace changes.
+
+    Raises:
+        KeyError if a keyspace or table of desired_config has no name
+    """
+    current_config = get_current_config(conn, desired_config)
+    if not current_config:
+        return []
+    return list(gen.iter_change_sets(current_config, desired_config, workers))
+
+
+def get_changes(
+    conn: db.Db, desired_config: Dict[str, Any], workers: int = None
+    ) -> List[Dict[str, Any]]:
+    """Compare desired properties with the cluster
+
+    Args:
+        conn:           Database connection
+        desired_config: Desired properties in the layout of the YAML files
+        workers:        Number of worker processes for the comparison
+
+    Returns:
+        List of change records with keyspace, table, property, current
+        and desired value
+    """
+    records = []  # type: List[Dict[str, Any]]
+    for ks_name, tbl_name, changes in get_change_sets(conn, desired_config, workers):
+        records.extend(gen.make_change_records(ks_name, tbl_name, changes))
+    return records
+
+
+def get_alter_statements(
+    conn: db.Db, desired_config: Dict[str, Any], workers: int = None
+    ) -> List[str]:
+    """Generate the statements that apply the desired properties
+
+    Args:
+        conn:           Database connection
+        desired_config: Desired properties in the layout of the YAML files
+        workers:        Number of worker processes for the comparison
+
+    Returns:
+        List of ALTER KEYSPACE and ALTER TABLE statements
+    """
+    return [
+        gen.format_alter_statement(ks_name, tbl_name, changes).strip()
+        for ks_name, tbl_name, changes in get_change_sets(
+            conn, desired_config, workers
+        )
+    ]
+
+
+def is_converged(conn: db.Db, desired_config: Dict[str, Any]) -> bool:
+    """Check whether the cluster has the desired properties
+
+    Args:
+        conn:           Database connection
+        desired_config: Desired properties in the layout of the YAML files
+
+    Returns:
+        True if no keyspace or table property differs
+    """
+    return not get_change_sets(conn, desired_config)
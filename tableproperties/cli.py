@@ -2,14 +2,190 @@
 """ CLI interface class
 """
 import argparse
+import copy
 import getpass
+import json
 import logging
 import os
 import sys
+from typing import Any, Dict, Iterable, List, Optional, TextIO, Tuple
 
 import yaml
 
-from tableproperties import PROG_NAME, __version__, db, utils, generator as gen
+from tableproperties import (
+    PROG_NAME,
+    __version__,
+    api,
+    configdir,
+    db,
+    drift,
+    dump,
+    estimate,
+    exporter,
+    inventory,
+    journal,
+    plan,
+    profiling,
+    scheduler,
+    snapshots,
+    utils,
+    validation,
+    verify,
+    generator as gen,
+)
+
+OUTPUT_FORMAT_CQL = "cql"
+OUTPUT_FORMAT_JSON = "json"
+OUTPUT_FORMAT_NDJSON = "ndjson"
+OUTPUT_FORMATS = [OUTPUT_FORMAT_CQL, OUTPUT_FORMAT_JSON, OUTPUT_FORMAT_NDJSON]
+# First argument selecting the inventory subcommand
+INVENTORY_COMMAND = "inventory"
+
+# Db method name to profiler phase name
+PROFILED_DB_METHODS = {
+    "connect": "connect",
+    "get_keyspace_configs": "get_keyspace_configs",
+    "get_table_configs": "get_table_configs",
+    "get_matching_config": "get_matching_config",
+}
+
+
+def positive_int(value: str) -> int:
+    """Argument type of counts that must be at least 1
+
+    Args:
+        value: Argument string
+
+    Returns:
+        Integer value
+
+    Raises:
+        argparse.ArgumentTypeError if the value is not a positive integer
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(
+            "'{}' is not a positive integer".format(value)
+        )
+    return number
+
+
+def positive_float(value: str) -> float:
+    """Argument type of rates and durations that must be above 0
+
+    Args:
+        value: Argument string
+
+    Returns:
+        Float value
+
+    Raises:
+        argparse.ArgumentTypeError if the value is not a positive number
+    """
+    try:
+        number = float(value)
+    except ValueError:
+        number = 0.0
+    if not number > 0 or number == float("inf"):
+        raise argparse.ArgumentTypeError("'{}' is not a positive number".format(value))
+    return number
+
+
+def listen_address(value: str) -> Tuple[str, int]:
+    """Argument type of [host:]port listen addresses
+
+    Args:
+        value: Argument string
+
+    Returns:
+        Tuple of (host, port). The host defaults to 127.0.0.1.
+
+    Raises:
+        argparse.ArgumentTypeError if the port is not a number from 0 to
+        65535
+    """
+    host, _, port = value.rpartition(":")
+    if not port.isdigit() or int(port) > 65535:
+        raise argparse.ArgumentTypeError(
+            "'{}' is not a valid [host:]port address".format(value)
+        )
+    return host if host else "127.0.0.1", int(port)
+
+
+def get_option_error(args: argparse.Namespace) -> Optional[str]:
+    """Check that the given options can be combined
+
+    Args:
+        args: Parsed arguments
+
+    Returns:
+        Message of the first invalid combination or None if all are valid
+    """
+    if args.cluster_name is not None:
+        try:
+            snapshots.check_name(args.cluster_name)
+        except snapshots.SnapshotError as ex:
+            return str(ex)
+
+    modes = [args.apply_changes, args.dump_config, args.reference_host, args.snapshot_diff]
+    checks = [
+        (
+            args.resume_apply and not (args.apply_changes and args.journal_file),
+            "--resume requires --apply and --journal.",
+        ),
+        (
+            args.apply_changes
+            and any(
+                [
+                    args.state_file,
+                    args.run_quiet,
+                    args.output_format != OUTPUT_FORMAT_CQL,
+                ]
+            ),
+            "--apply excludes --since, --quiet and --format.",
+        ),
+        (
+            args.changed_only and (not args.parse_cache or args.state_file),
+            "--changed-only requires --parse-cache and excludes --since.",
+        ),
+        (
+            args.snapshot_dir and not (args.dump_config or args.snapshot_diff),
+            "--snapshot requires --dump or --snapshot-diff.",
+        ),
+        (args.stream_dump and not args.dump_config, "--stream requires --dump."),
+        (
+            args.snapshot_diff and not args.snapshot_dir,
+            "--snapshot-diff requires --snapshot.",
+        ),
+        (
+            args.estimate_costs
+            and any(
+                modes
+                + [
+                    args.exporter_address,
+                    args.state_file,
+                    args.run_quiet,
+                    args.stream_dump,
+                ]
+            ),
+            "--estimate excludes --apply, --dump, --reference, --exporter, "
+            "--snapshot-diff, --since, --quiet and --stream.",
+        ),
+        (
+            args.exporter_address and (not args.config_filenames or any(modes)),
+            "--exporter requires <filename> and excludes --apply, --dump, "
+            "--reference and --snapshot-diff.",
+        ),
+        (
+            args.rewrite_rate is not None
+            and not (args.apply_changes and args.size_order),
+            "--rewrite-rate requires --apply and --size-order.",
+        ),
+    ]
+    return next((message for failed, message in checks if failed), None)
 
 
 class TablePropertiesCli:
@@ -17,6 +193,118 @@ class TablePropertiesCli:
 
     def __init__(self):
         self._args = None
+        self._profiler = profiling.PhaseProfiler(None)
+        # Parse cache entries of all configuration directories
+        self._parse_cache_entries = {}  # type: Dict[str, Dict[str, Any]]
+
+    @staticmethod
+    def get_connection_arg_parser() -> argparse.ArgumentParser:
+        """Set up the connection and logging arguments
+
+        The parser is a parent of get_arg_parser and
+        get_inventory_arg_parser, whose arguments are read by
+        get_connection_params.
+
+        Returns:
+            argparse.ArgumentParser without help
+        """
+        parser = argparse.ArgumentParser(add_help=False)
+
+        parser.add_argument(
+            "-c",
+            "--cqlshrc",
+            metavar="<filename>",
+            dest="rc_file",
+            help="cqlshrc file name.",
+        )
+        # Misspelt name of earlier versions
+        parser.add_argument("--cqlsgrc", dest="rc_file", help=argparse.SUPPRESS)
+
+        parser.add_argument(
+            "-C",
+            "--clientcert",
+            metavar="<filename>",
+            dest="client_cert_file",
+            help="Client cert file name.",
+        )
+
+        parser.add_argument(
+            "--compression",
+            dest="compression",
+            choices=db.COMPRESSIONS + (db.COMPRESSION_NONE,),
+            help="Protocol compression. lz4 and snappy require the lz4 or\n"
+            "python-snappy package. Default: any installed one",
+        )
+
+        parser.add_argument(
+            "--fast-connect",
+            dest="fast_connect",
+            help="Connect without building the token map and schema metadata\n"
+            "of the driver, with protocol version {} pinned and a {:.0f}s\n"
+            "connect timeout.".format(
+                db.FAST_CONNECT_PROTOCOL_VERSION, db.FAST_CONNECT_TIMEOUT
+            ),
+            action="store_true",
+        )
+
+        parser.add_argument(
+            "--fetch-size",
+            type=positive_int,
+            metavar="<n>",
+            dest="fetch_size",
+            help="Rows per page of system_schema reads.\n"
+            "Default: {}".format(db.DEFAULT_FETCH_SIZE),
+        )
+
+        parser.add_argument(
+            "-k",
+            "--clientkey",
+            metavar="<filename>",
+            dest="client_key_file",
+            help="Client key file name.",
+        )
+
+        parser.add_argument(
+            "-l",
+            "--log",
+            metavar="<filename>",
+            dest="log_file",
+            help="Log file name. If none is provided, STDERR is used.",
+        )
+
+        parser.add_argument(
+            "--protocol-version",
+            type=int,
+            metavar="<n>",
+            dest="protocol_version",
+            help="Pin the native protocol version instead of negotiating it.",
+        )
+
+        parser.add_argument(
+            "-s",
+            "--ssl",
+            dest="use_ssl",
+            help="Use SSL/TLS encryption for client server communication.",
+            action="store_true",
+        )
+
+        parser.add_argument(
+            "--tls-min-version",
+            dest="tls_min_version",
+            choices=list(db.TLS_VERSIONS),
+            help="Oldest TLS version accepted with --ssl.\n"
+            "Default: {}".format(db.DEFAULT_TLS_MIN_VERSION),
+        )
+
+        parser.add_argument(
+            "-u",
+            "--username",
+            metavar="<user name>",
+            dest="username",
+            help="User name for plain text authentication.",
+        )
+
+        return parser
 
     @staticmethod
     def get_arg_parser() -> argparse.ArgumentParser:
@@ -34,30 +322,55 @@ class TablePropertiesCli:
         parser = argparse.ArgumentParser(  # type: ignore
             prog=PROG_NAME,
             description=msg,
+            epilog="Run '{} {} -h' for the fleet inventory.".format(
+                PROG_NAME, INVENTORY_COMMAND
+            ),
+            parents=[TablePropertiesCli.get_connection_arg_parser()],
             formatter_class=lambda prog: argparse.RawTextHelpFormatter(prog, width=120),
         )
 
         parser.add_argument(
             metavar="<filename>",
-            nargs="?",
-            dest="config_filename",
-            help="Desired configuration YAML file",
+            nargs="*",
+            dest="config_filenames",
+            help="Desired configuration YAML file(s) or directories of YAML\n"
+            "files. Changes of several files are merged into one plan with\n"
+            "one ALTER per keyspace or table.",
         )
 
         parser.add_argument(
-            "-c",
-            "--cqlsgrc",
-            metavar="<filename>",
-            dest="rc_file",
-            help="cqlshrc file name.",
+            "-a",
+            "--apply",
+            dest="apply_changes",
+            help="Execute the ALTER statements instead of printing them.\n"
+            "Statements are throttled and each one waits for schema\n"
+            "agreement before the next one is started.",
+            action="store_true",
         )
 
         parser.add_argument(
-            "-C",
-            "--clientcert",
-            metavar="<filename>",
-            dest="client_cert_file",
-            help="Client cert file name.",
+            "--agreement-timeout",
+            type=positive_float,
+            metavar="<seconds>",
+            dest="agreement_timeout",
+            default=scheduler.DEFAULT_AGREEMENT_TIMEOUT,
+            help="Stop --apply if nodes do not agree on the schema within\n"
+            "<seconds>. Default: {:.0f}".format(scheduler.DEFAULT_AGREEMENT_TIMEOUT),
+        )
+
+        parser.add_argument(
+            "--changed-only",
+            dest="changed_only",
+            help="Only compare keyspaces of directory files that changed\n"
+            "since the run recorded in the --parse-cache file.",
+            action="store_true",
+        )
+
+        parser.add_argument(
+            "--cluster-name",
+            metavar="<name>",
+            dest="cluster_name",
+            help="Cluster name of --snapshot. Default: the host",
         )
 
         parser.add_argument(
@@ -68,6 +381,38 @@ class TablePropertiesCli:
             action="store_true",
         )
 
+        parser.add_argument(
+            "--estimate",
+            dest="estimate_costs",
+            help="Instead of printing the changes, estimate the bytes\n"
+            "rewritten and the temporary disk space per table and node\n"
+            "caused by changes of compaction, compression and\n"
+            "bloom_filter_fp_chance, using system.size_estimates.",
+            action="store_true",
+        )
+
+        parser.add_argument(
+            "--exporter",
+            type=listen_address,
+            metavar="<[host:]port>",
+            dest="exporter_address",
+            help="Run as Prometheus exporter: keep one connection, recompute the\n"
+            "drift of the YAML file(s) every --refresh-interval seconds and\n"
+            "on schema changes and serve it on http://<host>:<port>/metrics.\n"
+            "Default host: 127.0.0.1",
+        )
+
+        parser.add_argument(
+            "-f",
+            "--format",
+            dest="output_format",
+            choices=OUTPUT_FORMATS,
+            default=OUTPUT_FORMAT_CQL,
+            help="Output format of the changes. cql prints ALTER statements,\n"
+            "json a list of change records and ndjson one change record\n"
+            "per line. Default: cql",
+        )
+
         parser.add_argument(
             "-i",
             "--ip",
@@ -77,20 +422,19 @@ class TablePropertiesCli:
         )
 
         parser.add_argument(
-            "-k",
-            "--clientkey",
+            "--journal",
             metavar="<filename>",
-            dest="client_key_file",
-            help="Client key file name.",
-            required=False,
+            dest="journal_file",
+            help="Record every statement executed by --apply in the journal\n"
+            "file before the next one is started.",
         )
 
         parser.add_argument(
-            "-l",
-            "--log",
+            "--parse-cache",
             metavar="<filename>",
-            dest="log_file",
-            help="Log file name. If none is provied, " "STDERR is used.",
+            dest="parse_cache",
+            help="Cache parsed files of configuration directories. Files\n"
+            "are only parsed again if their mtime or size changed.",
         )
 
         parser.add_argument(
@@ -103,6 +447,15 @@ class TablePropertiesCli:
             required=False,
         )
 
+        parser.add_argument(
+            "--profile",
+            metavar="<directory>",
+            dest="profile_dir",
+            help="Profile the run and write one pstats file per phase\n"
+            "(connect, get_keyspace_configs, get_table_configs, generator,\n"
+            "yaml, ...) and a summary of the top functions to <directory>.",
+        )
+
         parser.add_argument(
             "-q",
             "--quiet",
@@ -114,19 +467,106 @@ class TablePropertiesCli:
         )
 
         parser.add_argument(
-            "-s",
-            "--ssl",
-            dest="use_ssl",
-            help="Use SSL/TLS encryption for client server " "communication.",
+            "--rate",
+            type=positive_float,
+            metavar="<n>",
+            dest="rate",
+            default=scheduler.DEFAULT_RATE,
+            help="Execute at most <n> ALTER statements per second with\n"
+            "--apply. Default: {}".format(scheduler.DEFAULT_RATE),
+        )
+
+        parser.add_argument(
+            "--reference",
+            metavar="<host[:port]>",
+            dest="reference_host",
+            help="Compare with another cluster instead of a YAML file. The\n"
+            "reference cluster's properties are the desired ones. Both\n"
+            "clusters are read at the same time with the same credentials.",
+        )
+
+        parser.add_argument(
+            "--refresh-interval",
+            type=float,
+            metavar="<seconds>",
+            dest="refresh_interval",
+            default=exporter.DEFAULT_REFRESH_INTERVAL,
+            help="Seconds between drift computations of --exporter.\n"
+            "Default: {:.0f}".format(exporter.DEFAULT_REFRESH_INTERVAL),
+        )
+
+        parser.add_argument(
+            "--resume",
+            dest="resume_apply",
+            help="Continue an interrupted --apply. Keyspaces and tables in\n"
+            "the --journal file are skipped and only the remaining tables\n"
+            "are read from the cluster again.",
             action="store_true",
         )
 
         parser.add_argument(
-            "-u",
-            "--username",
-            metavar="<user name>",
-            dest="username",
-            help="User name for plain text authentication.",
+            "--rewrite-rate",
+            type=positive_float,
+            metavar="<bytes>",
+            dest="rewrite_rate",
+            help="With --apply and --size-order, assume every node rewrites\n"
+            "<bytes> per second and wait for the estimated rewrite of a\n"
+            "table before rewriting the next.",
+        )
+
+        parser.add_argument(
+            "--snapshot",
+            metavar="<directory>",
+            dest="snapshot_dir",
+            help="With --dump, store the configuration in the snapshot store\n"
+            "<directory> instead of printing it. Properties are stored once\n"
+            "per distinct content and every snapshot is a small manifest.",
+        )
+
+        parser.add_argument(
+            "--snapshot-diff",
+            nargs=2,
+            metavar=("<old>", "<new>"),
+            dest="snapshot_diff",
+            help="Compare two snapshots of the --snapshot store without\n"
+            "connecting. Snapshots are <cluster>/<id>, <cluster>/latest or\n"
+            "<cluster>/latest~<n>.",
+        )
+
+        parser.add_argument(
+            "--since",
+            metavar="<filename>",
+            dest="state_file",
+            help="Only print changes that appeared or were resolved since the\n"
+            "run recorded in the state file. The file is updated afterwards.",
+        )
+
+        parser.add_argument(
+            "--size-order",
+            dest="size_order",
+            help="Read system.size_estimates and change compaction,\n"
+            "compression and bloom_filter_fp_chance of the smallest tables\n"
+            "first, after all other changes.",
+            action="store_true",
+        )
+
+        parser.add_argument(
+            "--stream",
+            dest="stream_dump",
+            help="Write --dump output keyspace by keyspace while it is\n"
+            "fetched, in the YAML layout of --dump, or one JSON line per\n"
+            "keyspace and table with --format ndjson.",
+            action="store_true",
+        )
+
+        parser.add_argument(
+            "-w",
+            "--workers",
+            type=int,
+            metavar="<n>",
+            dest="workers",
+            help="Compare tables in <n> worker processes. Speeds up diffs of\n"
+            "very large configurations. Default: compare in one process",
         )
 
         parser.add_argument(
@@ -138,9 +578,256 @@ class TablePropertiesCli:
 
         return parser
 
+    @staticmethod
+    def filter_incremental(
+        change_sets: List[plan.ChangeSet], state_filename: str
+        ) -> Tuple[List[plan.ChangeSet], List[str]]:
+        """Filter change sets down to drifts that changed since the last run
+
+        Args:
+            change_sets:    (keyspace, table, changes) tuples of this run
+            state_filename: Drift state file of the last recorded run
+
+        Returns:
+            Tuple of (new or changed change sets, resolved drift keys)
+        """
+        previous_state = drift.load_drift_state(state_filename)
+        current_state = drift.get_drift_state(
+            (ks_name, tbl_name, gen.format_alter_statement(ks_name, tbl_name, chgs))
+            for ks_name, tbl_name, chgs in change_sets
+        )
+        new_keys, resolved_keys = drift.diff_drift_states(
+            previous_state, current_state
+        )
+        logging.info(
+            "%d new or changed and %d resolved drifts since last run",
+            len(new_keys),
+            len(resolved_keys),
+        )
+
+        new_keys_set = set(new_keys)
+        new_change_sets = [
+            (ks_name, tbl_name, chgs)
+            for ks_name, tbl_name, chgs in change_sets
+            if drift.get_drift_key(ks_name, tbl_name) in new_keys_set
+        ]
+
+        drift.save_drift_state(state_filename, current_state)
+
+        return new_change_sets, resolved_keys
+
+    @staticmethod
+    def write_changes(
+        change_sets: Iterable[Tuple[str, Optional[str], list]],
+        output_format: str = OUTPUT_FORMAT_CQL,
+        resolved_keys: Optional[List[str]] = None,
+        out: Optional[TextIO] = None,
+        ) -> bool:
+        """Write change sets as CQL, JSON or newline delimited JSON
+
+        Change sets are written as they are produced, so ndjson and CQL
+        output can be piped into other tools without buffering the diff.
+
+        Args:
+            change_sets:   (keyspace, table, changes) tuples
+            output_format: One of OUTPUT_FORMATS
+            resolved_keys: Drift keys resolved since the last recorded run
+            out:           Output stream. Default: STDOUT
+
+        Returns:
+            True if any change was written
+        """
+        out = out if out else sys.stdout
+        resolved_keys = resolved_keys if resolved_keys else []
+        has_changes = False
+        records = []
+
+        for ks_name, tbl_name, changes in change_sets:
+            has_changes = True
+            if output_format == OUTPUT_FORMAT_CQL:
+                out.write(gen.format_alter_statement(ks_name, tbl_name, changes))
+            elif output_format == OUTPUT_FORMAT_NDJSON:
+                for record in gen.make_change_records(ks_name, tbl_name, changes):
+                    out.write(json.dumps(record, default=str) + "\n")
+                out.flush()
+            else:
+                records.extend(gen.make_change_records(ks_name, tbl_name, changes))
+
+        resolved_records = []
+        for key in resolved_keys:
+            ks_name, _, tbl_name = key.partition(".")
+            resolved_records.append(
+                {"keyspace": ks_name, "table": tbl_name or None, "resolved": True}
+            )
+
+        if output_format == OUTPUT_FORMAT_CQL:
+            out.write("".join("\n-- Resolved: {}".format(key) for key in resolved_keys))
+            out.write("\n")
+        elif output_format == OUTPUT_FORMAT_NDJSON:
+            for record in resolved_records:
+                out.write(json.dumps(record) + "\n")
+        else:
+            json.dump(records + resolved_records, out, default=str, indent=2)
+            out.write("\n")
+
+        return has_changes
+
+    @staticmethod
+    def get_inventory_arg_parser() -> argparse.ArgumentParser:
+        """Set up the arguments of the inventory subcommand
+
+        Connection switches are shared with get_arg_parser.
+
+        Returns:
+            argparse.ArgumentParser
+        """
+        parser = argparse.ArgumentParser(  # type: ignore
+            prog="{} {}".format(PROG_NAME, INVENTORY_COMMAND),
+            description="Load the keyspace and table properties of many clusters "
+            "into a SQLite database and find keyspaces and tables by property.",
+            parents=[TablePropertiesCli.get_connection_arg_parser()],
+            formatter_class=lambda prog: argparse.RawTextHelpFormatter(prog, width=120),
+        )
+        parser.set_defaults(host_ip=None, host_port=None)
+
+        parser.add_argument(
+            metavar="<database>", dest="inventory_file", help="SQLite file name."
+        )
+
+        parser.add_argument(
+            "--refresh",
+            action="append",
+            metavar="<name=host[:port]>",
+            dest="refresh_clusters",
+            help="Reload the properties of a cluster if its schema version\n"
+            "changed since its last refresh. May be repeated; clusters are\n"
+            "read at the same time.",
+        )
+
+        parser.add_argument(
+            "--where",
+            action="append",
+            metavar="<condition>",
+            dest="conditions",
+            help="Print the keyspaces and tables matching all conditions.\n"
+            "Conditions are <property><op><value> with op =, !=, <, <=, >,\n"
+            ">= or ~ (SQL LIKE pattern). Nested properties are dotted,\n"
+            "e.g. compaction.class~%%SizeTiered%% or gc_grace_seconds>86400",
+        )
+
+        parser.add_argument(
+            "-f",
+            "--format",
+            dest="output_format",
+            choices=OUTPUT_FORMATS,
+            default=OUTPUT_FORMAT_CQL,
+            help="Output format of --where. json prints a list of records\n"
+            "and ndjson one record per line. Default: one line per match",
+        )
+
+        parser.add_argument(
+            "-w",
+            "--workers",
+            type=int,
+            metavar="<n>",
+            dest="workers",
+            help="Clusters read at the same time. Default: all",
+        )
+
+        return parser
+
+    def execute_inventory(self, args: list) -> None:
+        """Execute the inventory subcommand
+
+        Args:
+            args: Arguments after the subcommand
+        """
+        self._args = TablePropertiesCli.get_inventory_arg_parser().parse_args(args)
+        utils.setup_logging(
+            self._args.log_file,
+            os.environ.get("TP_LOG_LEVEL", utils.DEFAULT_LOG_LEVEL),
+        )
+
+        clusters = {}
+        for spec in self._args.refresh_clusters or []:
+            name, _, address = spec.partition("=")
+            if not name or not address:
+                print("Invalid cluster '{}'. Expected <name=host[:port]>.".format(spec))
+                sys.exit(1)
+            clusters[name] = address
+
+        statuses = {}  # type: Dict[str, str]
+        password = None
+        if clusters and self._args.username:
+            password = getpass.getpass(
+                prompt="Password for user '{}': ".format(self._args.username)
+            )
+
+        try:
+            with inventory.Inventory(self._args.inventory_file) as fleet:
+                if clusters:
+                    conn_params = self.get_connection_params(password)
+                    statuses = inventory.refresh(
+                        fleet,
+                        {
+                            name: TablePropertiesCli.get_reference_params(
+                                conn_params, address
+                            )
+                            for name, address in clusters.items()
+                        },
+                        self._args.workers,
+                    )
+                    for name, status in sorted(statuses.items()):
+                        print("{}: {}".format(name, status), file=sys.stderr)
+
+                if self._args.conditions:
+                    TablePropertiesCli.write_inventory_matches(
+                        fleet.query(self._args.conditions), self._args.output_format
+                    )
+                elif not clusters:
+                    for cluster in fleet.get_clusters():
+                        print(
+                            "{name} {properties} properties, schema version "
+                            "{schema_version}".format(**cluster)
+                        )
+        except inventory.InventoryError as ex:
+            print(ex, file=sys.stderr)
+            sys.exit(1)
+
+        if inventory.REFRESH_FAILED in statuses.values():
+            sys.exit(1)
+
+    @staticmethod
+    def write_inventory_matches(records: List[dict], output_format: str) -> None:
+        """Write the keyspaces and tables found in the inventory
+
+        Args:
+            records:       Records with cluster, keyspace and table keys
+            output_format: OUTPUT_FORMAT_CQL for one line per match, json
+                           or ndjson
+        """
+        if output_format == OUTPUT_FORMAT_JSON:
+            json.dump(records, sys.stdout, indent=2)
+            sys.stdout.write("\n")
+        elif output_format == OUTPUT_FORMAT_NDJSON:
+            for record in records:
+                sys.stdout.write(json.dumps(record) + "\n")
+        else:
+            for record in records:
+                print(
+                    "{} {}".format(
+                        record["cluster"],
+                        drift.get_drift_key(record["keyspace"], record["table"]),
+                    )
+                )
+
     # pylint: disable=too-many-statements
     def execute(self, args: list) -> None:
         """Execute applicaton"""
+        if args and args[0] == INVENTORY_COMMAND:
+            self.execute_inventory(args[1:])
+            return
+
         password = None
         log_level = os.environ.get("TP_LOG_LEVEL", utils.DEFAULT_LOG_LEVEL)
 
@@ -158,7 +845,39 @@ class TablePropertiesCli:
                 prompt="Password for user '{}': ".format(self._args.username)
             )
 
-        config_filename = None
+        error = get_option_error(self._args)
+        if error:
+            print(error)
+            sys.exit(1)
+
+        conn_params = self.get_connection_params(password)
+
+        self._profiler = profiling.PhaseProfiler(self._args.profile_dir)
+        try:
+            self.run(conn_params)
+        finally:
+            if self._profiler.enabled:
+                self._profiler.write()
+                logging.info("Profiles written to '%s'", self._profiler.directory)
+
+    def get_connection_params(self, password: Optional[str]) -> db.ConnectionParams:
+        """Build the connection parameters from cqlshrc and switches
+
+        Args:
+            password: Password of --username
+
+        Returns:
+            Connection parameters
+        """
+        if self._args.compression and not db.is_compression_available(
+            self._args.compression
+        ):
+            print(
+                "--compression {} is not available. Install lz4 or "
+                "python-snappy.".format(self._args.compression)
+            )
+            sys.exit(1)
+
         conn_params = db.ConnectionParams()
         if self._args.rc_file:
             if not os.path.exists(self._args.rc_file):
@@ -182,40 +901,550 @@ class TablePropertiesCli:
             conn_params.client_cert_file = self._args.client_cert_file
         if self._args.client_key_file:
             conn_params.client_key_file = self._args.client_key_file
+        if self._args.fast_connect:
+            conn_params.fast_connect = True
+        if self._args.protocol_version:
+            conn_params.protocol_version = self._args.protocol_version
+        if self._args.compression:
+            conn_params.compression = self._args.compression
+        if self._args.fetch_size is not None:
+            conn_params.fetch_size = self._args.fetch_size
+        if self._args.tls_min_version:
+            conn_params.tls_min_version = self._args.tls_min_version
+
+        return conn_params
+
+    def open_db(self, conn_params: db.ConnectionParams) -> db.Db:
+        """Create a database connection, profiled with --profile
+
+        Args:
+            conn_params: Connection parameters
+
+        Returns:
+            Db
+        """
+        conn = db.Db(conn_params)
+        self._profiler.instrument(conn, PROFILED_DB_METHODS)
+        return conn
+
+    def run(self, conn_params: db.ConnectionParams) -> None:
+        """Run the selected mode
+
+        Args:
+            conn_params: Connection parameters
+        """
+        if self._args.snapshot_diff:
+            self.diff_snapshots(*self._args.snapshot_diff)
+        elif self._args.dump_config:
+            with self.open_db(conn_params) as conn:
+                if self._args.snapshot_dir:
+                    self.save_snapshot(conn, conn_params)
+                else:
+                    self.dump_config(conn)
+        elif self._args.reference_host:
+            reference_params = TablePropertiesCli.get_reference_params(
+                conn_params, self._args.reference_host
+            )
+            with db.Db(conn_params) as conn, db.Db(reference_params) as reference_conn:
+                self.compare_clusters(conn, reference_conn)
+        elif self._args.config_filenames:
+            # Fail on broken configurations before connecting
+            with self._profiler.phase("yaml"):
+                desired_configs = self.load_desired_configs()
+            with self.open_db(conn_params) as conn:
+                if self._args.exporter_address:
+                    self.run_exporter(conn, desired_configs)
+                else:
+                    self.diff_config(conn, desired_configs)
+        else:
+            self.get_arg_parser().print_usage()
+
+    @staticmethod
+    def get_reference_params(
+        conn_params: db.ConnectionParams, reference_host: str
+        ) -> db.ConnectionParams:
+        """Connection parameters of a reference cluster
+
+        Args:
+            conn_params:    Parameters of the compared cluster
+            reference_host: "<host>" or "<host>:<port>"
+
+        Returns:
+            Copy of the parameters with the reference host and port
+        """
+        host, _, port = reference_host.rpartition(":")
+        if not host or not port.isdigit():
+            host, port = reference_host, str(conn_params.port)
+
+        reference_params = copy.copy(conn_params)
+        reference_params.host = host
+        reference_params.port = int(port)
+        reference_params.load_balancing_policy = None
+        return reference_params
+
+    def compare_clusters(self, conn: db.Db, reference_conn: db.Db) -> None:
+        """Write the changes that make a cluster match a reference cluster
+
+        Args:
+            conn:           Database connection
+            reference_conn: Reference cluster connection
+        """
+        change_sets = api.compare_clusters(conn, reference_conn, self._args.workers)
+        has_changes = TablePropertiesCli.write_changes(
+            change_sets, self._args.output_format
+        )
+
+        if has_changes and self._args.run_quiet:
+            sys.exit(1)
+
+    def run_exporter(self, conn: db.Db, desired_configs: List[dict]) -> None:
+        """Serve drift metrics until interrupted
+
+        Args:
+            conn:            Database connection
+            desired_configs: Desired properties
+        """
+        drift_exporter = exporter.DriftExporter(
+            conn, desired_configs, refresh_interval=self._args.refresh_interval
+        )
+        server = exporter.MetricsServer(self._args.exporter_address, drift_exporter)
+        server.start()
+        logging.info("Serving metrics on %s:%d", *server.server_address[:2])
+
+        try:
+            drift_exporter.run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def dump_config(self, conn: db.Db) -> None:
+        """Write the current configuration to STDOUT
+
+        Args:
+            conn: Database connection
+        """
+        if self._args.stream_dump:
+            keyspaces = conn.iter_current_config()
+            # Tables are fetched while they are written
+            with self._profiler.phase("yaml"):
+                if self._args.output_format == OUTPUT_FORMAT_NDJSON:
+                    count = dump.write_ndjson_stream(keyspaces, sys.stdout)
+                else:
+                    count = dump.write_yaml_stream(keyspaces, sys.stdout)
+
+            if not count:
+                print("No keyspaces found.", file=sys.stderr)
+            return
+
+        # Read current configuration from database
+        current_config = conn.get_current_config()
+
+        if not current_config:
+            # No keyspaces besides system* present
+            print("No keyspaces found.", file=sys.stderr)
+            return
+
+        with self._profiler.phase("yaml"):
+            print(yaml.dump(current_config, default_flow_style=False))
+
+    def save_snapshot(self, conn: db.Db, conn_params: db.ConnectionParams) -> None:
+        """Store the current configuration in the snapshot store
+
+        Args:
+            conn:        Database connection
+            conn_params: Connection parameters naming the default cluster
+        """
+        current_config = conn.get_current_config()
+        if not current_config:
+            print("No keyspaces found.", file=sys.stderr)
+            return
+
+        cluster_name = (
+            self._args.cluster_name if self._args.cluster_name else conn_params.host
+        )
+        store = snapshots.SnapshotStore(self._args.snapshot_dir)
+        try:
+            with self._profiler.phase("snapshot"):
+                ref = store.save(cluster_name, current_config)
+        except snapshots.SnapshotError as ex:
+            print(ex, file=sys.stderr)
+            sys.exit(1)
+        print(ref)
+
+    def diff_snapshots(self, old_ref: str, new_ref: str) -> None:
+        """Write the differences between two snapshots
+
+        Args:
+            old_ref: Reference of the older snapshot
+            new_ref: Reference of the newer snapshot
+        """
+        store = snapshots.SnapshotStore(self._args.snapshot_dir)
+        try:
+            records = store.diff(old_ref, new_ref)
+        except snapshots.SnapshotError as ex:
+            print(ex, file=sys.stderr)
+            sys.exit(1)
+
+        if self._args.output_format == OUTPUT_FORMAT_JSON:
+            json.dump(records, sys.stdout, default=str, indent=2)
+            sys.stdout.write("\n")
+        elif self._args.output_format == OUTPUT_FORMAT_NDJSON:
+            for record in records:
+                sys.stdout.write(json.dumps(record, default=str) + "\n")
+        else:
+            for record in records:
+                key = drift.get_drift_key(record["keyspace"], record["table"])
+                if record["change"] == snapshots.CHANGE_CHANGED:
+                    print(
+                        "{} {}: {!r} -> {!r}".format(
+                            key, record["property"], record["old"], record["new"]
+                        )
+                    )
+                else:
+                    print("{} {}".format(key, record["change"]))
+
+        if records and self._args.run_quiet:
+            sys.exit(1)
+
+    def write_estimate(self, costs: dict) -> None:
+        """Write the estimated rewrite costs
+
+        Args:
+            costs: Estimate as returned by estimate.estimate_plan
+        """
+        if self._args.output_format == OUTPUT_FORMAT_JSON:
+            print(json.dumps(costs, indent=2))
+            return
+        if self._args.output_format == OUTPUT_FORMAT_NDJSON:
+            for record in costs["tables"] + costs["data_centers"]:
+                sys.stdout.write(json.dumps(record) + "\n")
+            return
+
+        for record in costs["tables"]:
+            print(
+                "{} ({}) in {}: estimated {}, rewrite {}, temporary {} per node".format(
+                    drift.get_drift_key(record["keyspace"], record["table"]),
+                    ", ".join(record["properties"]),
+                    record["data_center"],
+                    estimate.format_bytes(record["estimated_bytes"]),
+                    estimate.format_bytes(record["rewrite_bytes"]),
+                    estimate.format_bytes(record["temp_bytes"]),
+                )
+            )
+        for record in costs["data_centers"]:
+            print(
+                "{data_center} ({nodes} nodes): rewrite {rewrite} and temporary {peak} "
+                "per node ({total} if all rewrites overlap), rewrite {cluster} "
+                "in total".format(
+                    data_center=record["data_center"],
+                    nodes=record["nodes"],
+                    rewrite=estimate.format_bytes(record["rewrite_bytes"]),
+                    peak=estimate.format_bytes(record["temp_bytes_peak"]),
+                    total=estimate.format_bytes(record["temp_bytes_total"]),
+                    cluster=estimate.format_bytes(record["cluster_rewrite_bytes"]),
+                )
+            )
+
+    def build_plan(
+        self,
+        current_config: dict,
+        desired_configs: List[dict],
+        sizes: Optional[plan.SizeEstimates] = None,
+        ) -> plan.ChangePlan:
+        """Merge the changes of all desired configurations into one plan
+
+        Args:
+            current_config:  Current properties
+            desired_configs: Desired properties
+            sizes:           Table size estimates ordering the changes of
+                             plan.REWRITE_PROPERTIES
+
+        Returns:
+            ChangePlan
+        """
+        change_plan = plan.ChangePlan()
+        if sizes is not None:
+            change_plan.set_size_estimates(sizes)
+        with self._profiler.phase("generator"):
+            for desired_config in desired_configs:
+                change_plan.add_config(
+                    current_config, desired_config, self._args.workers
+                )
+        logging.info("Change plan cost: %s", change_plan.estimate_cost())
+        for rewrite in change_plan.rewrites():
+            if rewrite["estimated_bytes"] is None:
+                logging.warning(
+                    "No size estimate of %s (%s). Rewriting it after the tables "
+                    "of known size",
+                    drift.get_drift_key(rewrite["keyspace"], rewrite["table"]),
+                    ", ".join(rewrite["properties"]),
+                )
+                continue
+            logging.info(
+                "Rewrite of %s (%s): %d bytes per node",
+                drift.get_drift_key(rewrite["keyspace"], rewrite["table"]),
+                ", ".join(rewrite["properties"]),
+                rewrite["estimated_bytes"],
+            )
+
+        return change_plan
+
+    def apply_plan(
+        self,
+        conn: db.Db,
+        change_plan: plan.ChangePlan,
+        apply_journal: Optional[journal.ApplyJournal] = None,
+        ) -> None:
+        """Execute the statements of a plan
+
+        Every executed statement is written to STDOUT, progress to STDERR.
+
+        Args:
+            conn:          Database connection
+            change_plan:   Planned changes
+            apply_journal: Journal recording the executed statements
+        """
+        changes_by_key = {
+            (ks_name, tbl_name): changes
+            for ks_name, tbl_name, changes in change_plan.iter_change_sets()
+        }
+
+        def executed(stmt: tuple):
+            if apply_journal is not None:
+                apply_journal.record(
+                    stmt[0], stmt[1], stmt[2], changes_by_key[(stmt[0], stmt[1])]
+                )
+
+        def progress(done: int, total: int, stmt: tuple, agreement_time: float):
+            print(stmt[2])
+            print(
+                "[{}/{}] Applied {}, schema agreement after {:.2f}s".format(
+                    done, total, drift.get_drift_key(stmt[0], stmt[1]), agreement_time
+                ),
+                file=sys.stderr,
+            )
 
-        if self._args.dump_config or self._args.config_filename:
-            # Construct the connection parameters
-            conn = db.Db(conn_params)
+        # Tables of unknown size are throttled like the largest known table
+        rewrites = change_plan.rewrites()
+        largest = max(
+            (rewrite["estimated_bytes"] or 0 for rewrite in rewrites), default=0
+        )
+        applier = scheduler.ApplyScheduler(
+            conn,
+            rate=self._args.rate,
+            agreement_timeout=self._args.agreement_timeout,
+            progress=progress,
+            executed=executed,
+            rewrite_rate=self._args.rewrite_rate,
+            rewrite_sizes={
+                (rewrite["keyspace"], rewrite["table"]): largest
+                if rewrite["estimated_bytes"] is None
+                else rewrite["estimated_bytes"]
+                for rewrite in rewrites
+            },
+        )
+        applier.apply(change_plan.statements())
+
+    @staticmethod
+    def verify_plan(conn: db.Db, change_plan: plan.ChangePlan) -> None:
+        """Re-read the changed keyspaces and tables after applying a plan
+
+        Properties that did not converge are written to STDERR and the
+        application exits with code 1.
+
+        Args:
+            conn:        Database connection
+            change_plan: Applied changes
+        """
+        if not change_plan:
+            return
+
+        records = verify.verify_change_sets(conn, change_plan.iter_change_sets())
+        for record in records:
+            print(
+                "Not converged: {} {}: {!r} instead of {!r}".format(
+                    drift.get_drift_key(record["keyspace"], record["table"]),
+                    record["property"],
+                    record["current"],
+                    record["desired"],
+                ),
+                file=sys.stderr,
+            )
+        if records:
+            sys.exit(1)
+
+        logging.info("Verified %d keyspaces and tables", len(change_plan))
+
+    def load_desired_configs(self) -> List[dict]:
+        """Read and validate the desired configuration files and directories
+
+        All files are checked. Every problem is written to STDERR with its
+        file name, line and column and the application exits with code 1.
+
+        Returns:
+            List of desired configurations
+        """
+        desired_configs = []
+        errors = []
+        for config_filename in self._args.config_filenames:
+            logging.info("Reading config from '%s'", config_filename)
+            try:
+                if os.path.isdir(config_filename):
+                    desired_configs.append(self.load_config_dir(config_filename))
+                else:
+                    desired_configs.append(validation.load_config_file(config_filename))
+            except validation.ValidationError as ex:
+                errors.append(str(ex))
+
+        if errors:
+            print("\n".join(errors), file=sys.stderr)
+            sys.exit(1)
+
+        return desired_configs
+
+    def load_config_dir(self, directory: str) -> dict:
+        """Read a directory of configuration files
+
+        Args:
+            directory: Directory name
+
+        Returns:
+            Merged desired configuration. Only keyspaces of changed files
+            with --changed-only.
+        """
+        config, changed_keyspaces, entries = configdir.load_config_dir(
+            directory, self._args.parse_cache, self._args.workers
+        )
+        self._parse_cache_entries.update(entries)
+        if self._args.changed_only:
+            config["keyspaces"] = [
+                ks for ks in config["keyspaces"] if ks["name"] in changed_keyspaces
+            ]
+            logging.info(
+                "Comparing %d changed keyspaces of '%s'",
+                len(changed_keyspaces),
+                directory,
+            )
 
+        return config
+
+    def save_parse_cache(self) -> None:
+        """Record the parsed configuration files after a successful run
+
+        Until then a later --changed-only run still treats the files as
+        changed.
+        """
+        if self._args.parse_cache and self._parse_cache_entries:
+            configdir.save_parse_cache(
+                self._args.parse_cache, self._parse_cache_entries
+            )
+
+    def diff_config(self, conn: db.Db, desired_configs: List[dict]) -> None:
+        """Write the changes between current and desired configuration
+
+        Args:
+            conn:            Database connection
+            desired_configs: Desired properties
+        """
+        apply_journal = None  # type: Optional[journal.ApplyJournal]
+        if self._args.journal_file:
+            apply_journal = journal.ApplyJournal(self._args.journal_file)
+
+        # --resume requires --journal
+        if apply_journal is not None and self._args.resume_apply:
+            # Only re-read the tables that were not applied yet or no longer
+            # hold the applied values
+            applied_keys = apply_journal.applied_keys() - journal.get_diverged_keys(
+                conn, apply_journal.load()
+            )
+            logging.info("Skipping %d applied keyspaces and tables", len(applied_keys))
+            desired_configs = [
+                journal.filter_applied(desired_config, applied_keys)
+                for desired_config in desired_configs
+            ]
+
+        if self._args.changed_only and not any(
+            desired_config.get("keyspaces") for desired_config in desired_configs
+        ):
+            logging.info("No changed keyspaces")
+            self.save_parse_cache()
+            return
+
+        if self._args.resume_apply or self._args.changed_only:
+            current_config = conn.get_matching_config(
+                {
+                    "keyspaces": [
+                        ks
+                        for desired_config in desired_configs
+                        for ks in desired_config.get("keyspaces", [])
+                    ]
+                }
+            )
+        else:
             # Read current configuration from database
             current_config = conn.get_current_config()
 
-            if not current_config:
-                # No keyspaces besides system* present
-                print("No keyspaces found.", file=sys.stderr)
-                return
+        if not current_config:
+            # No keyspaces besides system* present
+            print("No keyspaces found.", file=sys.stderr)
+            return
 
-            if self._args.dump_config:
-                print(yaml.dump(current_config, default_flow_style=False))
-            else:
-                config_filename = self._args.config_filename
-                logging.info("Reading config from '%s'", config_filename)
-                with open(config_filename, "r", encoding="utf-8") as conf_file:
-                    desired_config = yaml.safe_load(conf_file)
-
-                # Generate ALTER statements for Keyspaces and Tables
-                alter_statements = gen.generate_alter_statements(
-                    current_config, desired_config
+        # One read of the size estimates of all tables
+        sizes = None  # type: Optional[plan.SizeEstimates]
+        if self._args.estimate_costs:
+            sizes = conn.get_size_estimates()
+            change_plan = self.build_plan(current_config, desired_configs, sizes)
+            self.write_estimate(
+                estimate.estimate_plan(
+                    change_plan, current_config, sizes, conn.get_data_center_nodes()
                 )
+            )
+            return
+        if self._args.size_order:
+            sizes = conn.get_size_estimates()
 
-                print(alter_statements)
+        # Compare Keyspaces and Tables
+        if self._args.apply_changes:
+            change_plan = self.build_plan(current_config, desired_configs, sizes)
+            self.apply_plan(conn, change_plan, apply_journal)
+            self.verify_plan(conn, change_plan)
+            self.save_parse_cache()
+            return
 
-                if alter_statements and self._args.run_quiet:
-                    # Exit with code 1 if running in quiet mode and
-                    # we have changes pending
-                    sys.exit(1)
+        if len(desired_configs) == 1 and sizes is None:
+            change_sets = gen.iter_change_sets(
+                current_config, desired_configs[0], self._args.workers
+            )  # type: Iterable[plan.ChangeSet]
         else:
-            self.get_arg_parser().print_usage()
+            change_sets = self.build_plan(
+                current_config, desired_configs, sizes
+            ).iter_change_sets()
+        if self._profiler.enabled:
+            # Separate the comparison from writing the output
+            with self._profiler.phase("generator"):
+                change_sets = list(change_sets)
+
+        if self._args.state_file:
+            all_change_sets = list(change_sets)
+            has_changes = bool(all_change_sets)
+            new_change_sets, resolved_keys = TablePropertiesCli.filter_incremental(
+                all_change_sets, self._args.state_file
+            )
+            TablePropertiesCli.write_changes(
+                new_change_sets, self._args.output_format, resolved_keys
+            )
+        else:
+            has_changes = TablePropertiesCli.write_changes(
+                change_sets, self._args.output_format
+            )
+
+        self.save_parse_cache()
+        if has_changes and self._args.run_quiet:
+            # Exit with code 1 if running in quiet mode and
+            # we have changes pending
+            sys.exit(1)
 
 
 def main():
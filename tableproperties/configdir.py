@@ -0,0 +1,268 @@
+""" Desired configuration split into a directory of YAML files
+"""
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from tableproperties import validation
+
+PARSE_CACHE_VERSION = 2
+CONFIG_EXTENSIONS = (".yaml", ".yml")
+
+
+class ConfigDirError(validation.ValidationError):
+    """Invalid configuration files in a directory
+
+    Attributes:
+        file_errors: ValidationError of every invalid file
+    """
+
+    def __init__(self, directory: str, file_errors: List[validation.ValidationError]):
+        super().__init__(directory, [err for ex in file_errors for err in ex.errors])
+        # Name every file instead of the directory
+        self.args = ("\n".join(str(ex) for ex in file_errors),)
+        self.file_errors = file_errors
+
+
+def list_config_files(directory: str) -> List[str]:
+    """List the YAML files of a directory
+
+    Args:
+        directory: Directory name
+
+    Returns:
+        Sorted list of file names
+    """
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.endswith(CONFIG_EXTENSIONS)
+        and os.path.isfile(os.path.join(directory, name))
+    )
+
+
+def parse_config_file(filename: str) -> Dict[str, Any]:
+    """Read, hash and validate a configuration file
+
+    Runs in worker processes, so errors are returned instead of raised.
+
+    Args:
+        filename: YAML file name
+
+    Returns:
+        Dictionary with the mtime, size and digest of the file and either
+        the configuration and the locations of its table names or the
+        validation errors
+    """
+    stat = os.stat(filename)
+    with open(filename, "rb") as conf_file:
+        data = conf_file.read()
+
+    entry = {
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "digest": hashlib.sha1(data).hexdigest(),
+        "config": None,
+        "tables": {},
+        "errors": [],
+    }  # type: Dict[str, Any]
+    locations = {}  # type: Dict[str, validation.Location]
+    try:
+        entry["config"] = validation.load_config(
+            data.decode("utf-8"), filename, locations
+        )
+    except validation.ValidationError as ex:
+        entry["errors"] = ex.errors
+    # Lists as read back from the parse cache
+    entry["tables"] = {key: list(location) for key, location in locations.items()}
+    return entry
+
+
+def load_parse_cache(filename: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    """Read parsed configurations of the last run
+
+    Args:
+        filename: Cache file name or None
+
+    Returns:
+        Dictionary of file name to cache entry
+    """
+    if not filename or not os.path.exists(filename):
+        return {}
+
+    with open(filename, "r", encoding="utf-8") as cache_file:
+        cache = json.load(cache_file)
+
+    if cache.get("version") != PARSE_CACHE_VERSION:
+        logging.warning("Ignoring parse cache '%s' of another version", filename)
+        return {}
+
+    return cache.get("files", {})
+
+
+def is_json_safe(value: Any) -> bool:
+    """ Check that a value is read back unchanged from JSON """
+    try:
+        return json.loads(json.dumps(value)) == value
+    except (TypeError, ValueError):
+        return False
+
+
+def save_parse_cache(filename: str, entries: Dict[str, Dict[str, Any]]) -> None:
+    """Record parsed configurations
+
+    The file is replaced atomically. Entries holding values that JSON
+    cannot represent, e.g. YAML dates or binary values, are not cached,
+    so their files are parsed again by the next run.
+
+    Args:
+        filename: Cache file name
+        entries:  Dictionary of file name to cache entry
+    """
+    cached = {}
+    for name, entry in entries.items():
+        if is_json_safe(entry):
+            cached[name] = entry
+        else:
+            logging.info("Not caching '%s': its values cannot be stored as JSON", name)
+
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "w", encoding="utf-8") as cache_file:
+        json.dump({"version": PARSE_CACHE_VERSION, "files": cached}, cache_file)
+    os.replace(tmp_filename, filename)
+
+
+def merge_configs(configs: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge configurations into one
+
+    Tables of a keyspace that appears in several configurations are
+    combined. Keyspace properties of later configurations win.
+
+    Args:
+        configs: Configurations in file name order
+
+    Returns:
+        Merged configuration
+    """
+    keyspaces = {}  # type: Dict[str, Dict[str, Any]]
+    for config in configs:
+        for keyspace in config.get("keyspaces", []):
+            merged = keyspaces.get(keyspace["name"])
+            if merged is None:
+                keyspaces[keyspace["name"]] = dict(keyspace)
+                continue
+            tables = merged.get("tables", []) + keyspace.get("tables", [])
+            merged.update(keyspace)
+            merged["tables"] = tables
+
+    return {"keyspaces": list(keyspaces.values())}
+
+
+def get_duplicate_table_errors(
+    entries: Dict[str, Dict[str, Any]]
+    ) -> List[validation.ValidationError]:
+    """Find tables defined in more than one file
+
+    Args:
+        entries: Dictionary of file name to cache entry in file name order
+
+    Returns:
+        ValidationError of every file redefining a table of an earlier file
+    """
+    defined_in = {}  # type: Dict[str, str]
+    file_errors = []
+    for name, entry in entries.items():
+        errors = []
+        for key, location in sorted(entry.get("tables", {}).items()):
+            if key in defined_in:
+                errors.append(
+                    (
+                        tuple(location),
+                        "Duplicate table '{}', already defined in '{}'".format(
+                            key, defined_in[key]
+                        ),
+                    )
+                )
+            else:
+                defined_in[key] = name
+        if errors:
+            file_errors.append(validation.ValidationError(name, sorted(errors)))
+    return file_errors
+
+
+def is_unchanged(filename: str, entry: Optional[Dict[str, Any]]) -> bool:
+    """ Check the mtime and size of a file against its cache entry """
+    if not entry:
+        return False
+    stat = os.stat(filename)
+    return stat.st_mtime == entry.get("mtime") and stat.st_size == entry.get("size")
+
+
+def load_config_dir(
+    directory: str, cache_filename: str = None, workers: int = None
+    ) -> Tuple[Dict[str, Any], Set[str], Dict[str, Dict[str, Any]]]:
+    """Load all configuration files of a directory
+
+    Files whose mtime and size match the parse cache are not read. Other
+    files are parsed in parallel. A file that was touched but has the
+    same content hash is not considered changed.
+
+    Args:
+        directory:      Directory name
+        cache_filename: Parse cache file name. No cache if None.
+        workers:        Number of worker processes. Parse in the current
+                        process if None or 1.
+
+    Returns:
+        Tuple of (merged configuration, names of keyspaces defined in
+        changed files, parse cache entries of the directory). The cache is
+        not written here: save the entries with save_parse_cache only once
+        the configuration was compared or applied, so changed files are
+        reported again after a failed run.
+
+    Raises:
+        ValidationError with the problems of all invalid files and of
+        tables defined in more than one file
+    """
+    filenames = list_config_files(directory)
+    cache = load_parse_cache(cache_filename)
+    stale = [name for name in filenames if not is_unchanged(name, cache.get(name))]
+    logging.info(
+        "Parsing %d of %d config files in '%s'", len(stale), len(filenames), directory
+    )
+
+    if workers and workers > 1 and len(stale) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = dict(zip(stale, executor.map(parse_config_file, stale)))
+    else:
+        parsed = {name: parse_config_file(name) for name in stale}
+
+    file_errors = []
+    for name, entry in sorted(parsed.items()):
+        errors = entry.pop("errors")
+        if errors:
+            file_errors.append(validation.ValidationError(name, errors))
+    if file_errors:
+        raise ConfigDirError(directory, file_errors)
+
+    changed_keyspaces = set()  # type: Set[str]
+    entries = {}
+    for name in filenames:
+        entry = parsed.get(name)
+        if entry is None:
+            entry = cache[name]
+        elif not cache.get(name) or cache[name].get("digest") != entry["digest"]:
+            changed_keyspaces.update(
+                keyspace["name"] for keyspace in entry["config"].get("keyspaces", [])
+            )
+        entries[name] = entry
+
+    file_errors = get_duplicate_table_errors(entries)
+    if file_errors:
+        raise ConfigDirError(directory, file_errors)
+
+    config = merge_configs(entry["config"] for entry in entries.values())
+    return config, changed_keyspaces, entries
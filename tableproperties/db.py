@@ -2,18 +2,369 @@
 """ Database interface
 """
 from abc import abstractmethod, ABC
+from collections import OrderedDict
 import configparser
+import logging
+import operator
 import os
 import ssl
-from typing import Any, Dict, List, Optional
-
-from cassandra import __version__ as cassver, auth, cluster, query, util, policies
+import threading
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from cassandra import (
+    __version__ as cassver,
+    auth,
+    cluster,
+    connection,
+    cqltypes,
+    policies,
+    query,
+)
+
+from tableproperties import utils
 
 DEFAULT_HOST = "127.0.0.1"
 DEFAULT_NATIVE_CQL_PORT = 9042
+# Rows per page when paging through schema tables
+DEFAULT_FETCH_SIZE = 5000
+# Names per IN query of targeted schema reads
+DEFAULT_IN_BATCH_SIZE = 100
 
 MAPPED_FIELD_NAMES = {"keyspace_name": "name", "table_name": "name"}
 
+KEYSPACES_QUERY = "SELECT * FROM system_schema.keyspaces;"
+TABLES_QUERY = "SELECT * FROM system_schema.tables WHERE keyspace_name = ?;"
+TABLE_QUERY = (
+    "SELECT * FROM system_schema.tables WHERE keyspace_name = ? AND table_name = ?;"
+)
+KEYSPACES_IN_QUERY = (
+    "SELECT * FROM system_schema.keyspaces WHERE keyspace_name IN ?;"
+)
+TABLES_IN_QUERY = (
+    "SELECT * FROM system_schema.tables WHERE keyspace_name = ? AND table_name IN ?;"
+)
+LOCAL_SCHEMA_VERSION_QUERY = "SELECT schema_version FROM system.local WHERE key='local';"
+PEERS_SCHEMA_VERSION_QUERY = "SELECT peer, schema_version FROM system.peers;"
+LOCAL_DATA_CENTER_QUERY = "SELECT data_center FROM system.local WHERE key='local';"
+PEERS_DATA_CENTER_QUERY = "SELECT peer, data_center FROM system.peers;"
+SIZE_ESTIMATES_QUERY = (
+    "SELECT keyspace_name, table_name, mean_partition_size, partitions_count "
+    "FROM system.size_estimates;"
+)
+# Queries prepared when warming up a connection
+SCHEMA_QUERIES = [KEYSPACES_QUERY, TABLES_QUERY, TABLE_QUERY]
+# Cassandra 3.0 and later speak v4, so pinning it skips the downgrade
+# negotiation of newer drivers
+FAST_CONNECT_PROTOCOL_VERSION = 4
+# Seconds to establish a connection and run control queries with fast connect
+FAST_CONNECT_TIMEOUT = 2.0
+COMPRESSION_NONE = "none"
+# Protocol compressions of the driver, usable if their package is installed
+COMPRESSIONS = ("lz4", "snappy")
+# Negotiate the highest TLS version both sides support
+TLS_CLIENT_PROTOCOL = getattr(ssl, "PROTOCOL_TLS_CLIENT", ssl.PROTOCOL_SSLv23)
+# Minimum TLS version name to ssl.TLSVersion member and the ssl.OP_NO_*
+# option disabling it on Python < 3.7
+TLS_VERSIONS = OrderedDict(
+    [
+        ("1.0", ("TLSv1", "OP_NO_TLSv1")),
+        ("1.1", ("TLSv1_1", "OP_NO_TLSv1_1")),
+        ("1.2", ("TLSv1_2", "OP_NO_TLSv1_2")),
+        ("1.3", ("TLSv1_3", "OP_NO_TLSv1_3")),
+    ]
+)
+DEFAULT_TLS_MIN_VERSION = "1.2"
+# SSLContext.sslsocket_class, which resumes sessions, needs Python 3.7
+SESSION_RESUMPTION_SUPPORTED = hasattr(ssl.SSLContext, "sslsocket_class")
+
+SSLContextKey = Tuple[Optional[str], Optional[str], int, str]
+# TLS contexts by (client cert, client key, protocol, minimum TLS version)
+_SSL_CONTEXTS = {}  # type: Dict[SSLContextKey, ssl.SSLContext]
+_SSL_CONTEXTS_LOCK = threading.Lock()
+
+
+def is_compression_available(compression: str) -> bool:
+    """Check if the driver can use a protocol compression
+
+    Args:
+        compression: lz4, snappy or none
+
+    Returns:
+        True if the compression package is installed
+    """
+    return (
+        compression == COMPRESSION_NONE
+        or compression in connection.locally_supported_compressions
+    )
+
+
+# SSLSocket only marks dup, recvmsg, recvmsg_into and sendmsg abstract
+# because TLS does not support them; they are not meant to be overridden.
+class ResumingSSLSocket(ssl.SSLSocket):  # pylint: disable=abstract-method
+    """Client socket resuming the last TLS session with the same peer
+
+    Instances are created by SSLContext.wrap_socket through the
+    sslsocket_class hook. The driver wraps sockets before connecting them,
+    so the peer address, and with it the session to offer, is only known
+    on connect. The session is saved again on close, because TLS 1.3
+    servers send session tickets after the handshake.
+    """
+
+    # Peer address once connected
+    _resume_addr = None  # type: Any
+
+    def connect(self, addr):
+        self._resume_addr = addr
+        self.context.restore_session(self, addr)
+        super().connect(addr)
+        self.context.save_session(addr, self.session)
+
+    def close(self):
+        if self._resume_addr is not None:
+            # None once the TLS connection is shut down
+            self.context.save_session(self._resume_addr, self.session)
+        super().close()
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """Client context remembering the last TLS session per peer address
+
+    Requires Python 3.7 (SESSION_RESUMPTION_SUPPORTED); older versions
+    ignore sslsocket_class.
+    """
+
+    sslsocket_class = ResumingSSLSocket
+
+    # The protocol is consumed by SSLContext.__new__
+    def __init__(self, protocol: int = TLS_CLIENT_PROTOCOL):
+        # pylint: disable=unused-argument
+        super().__init__()
+        self._sessions = {}  # type: Dict[Any, ssl.SSLSession]
+        self._sessions_lock = threading.Lock()
+
+    def restore_session(self, sock: ssl.SSLSocket, addr: Any) -> None:
+        """ Offer the last session with a peer on a new socket """
+        with self._sessions_lock:
+            session = self._sessions.get(addr)
+        if session is not None:
+            sock.session = session
+
+    def save_session(self, addr: Any, session: "Optional[ssl.SSLSession]") -> None:
+        """ Remember the session of a connected socket """
+        if session is not None:
+            with self._sessions_lock:
+                self._sessions[addr] = session
+
+
+def set_minimum_tls_version(context: ssl.SSLContext, tls_min_version: str) -> None:
+    """Refuse TLS versions older than a minimum
+
+    Args:
+        context:         SSL context
+        tls_min_version: Key of TLS_VERSIONS
+
+    Raises:
+        ValueError if the version is unknown
+    """
+    if tls_min_version not in TLS_VERSIONS:
+        raise ValueError(
+            "Unknown TLS version '{}'. Expected one of {}".format(
+                tls_min_version, ", ".join(TLS_VERSIONS)
+            )
+        )
+    version_name = TLS_VERSIONS[tls_min_version][0]
+    if hasattr(context, "minimum_version"):
+        context.minimum_version = getattr(ssl.TLSVersion, version_name)
+    else:  # pragma: no cover
+        for name, (_, option) in TLS_VERSIONS.items():
+            if name == tls_min_version:
+                break
+            context.options |= getattr(ssl, option, 0)
+
+
+def create_ssl_context(
+    client_cert_filename: Optional[str],
+    client_key_filename: Optional[str],
+    protocol: int = TLS_CLIENT_PROTOCOL,
+    tls_min_version: str = DEFAULT_TLS_MIN_VERSION,
+    ) -> ssl.SSLContext:
+    """Create a TLS client context
+
+    The protocol version is negotiated, TLS 1.2 being the default minimum.
+    Server certificates are not verified. Sessions are resumed with Python
+    3.7 or later only.
+
+    Args:
+        client_cert_filename: Client certificate or None
+        client_key_filename:  Client key or None
+        protocol:             ssl.PROTOCOL_* constant
+        tls_min_version:      Oldest accepted TLS version, key of
+                              TLS_VERSIONS
+
+    Returns:
+        SSL context
+
+    Raises:
+        ValueError if the TLS version is unknown
+    """
+    if SESSION_RESUMPTION_SUPPORTED:
+        context = ResumingSSLContext(protocol)  # type: ssl.SSLContext
+    else:  # pragma: no cover
+        logging.info("TLS sessions are not resumed. This requires Python 3.7")
+        context = ssl.SSLContext(protocol)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    set_minimum_tls_version(context, tls_min_version)
+    if client_cert_filename and client_key_filename:
+        context.load_cert_chain(
+            certfile=client_cert_filename, keyfile=client_key_filename
+        )
+    return context
+
+
+def get_ssl_context(
+    client_cert_filename: Optional[str],
+    client_key_filename: Optional[str],
+    protocol: int = TLS_CLIENT_PROTOCOL,
+    tls_min_version: str = DEFAULT_TLS_MIN_VERSION,
+    ) -> ssl.SSLContext:
+    """Get the cached TLS client context of a client certificate
+
+    Contexts are shared by all connections, so certificates are loaded
+    once and TLS sessions are resumed across connections.
+
+    Args:
+        client_cert_filename: Client certificate or None
+        client_key_filename:  Client key or None
+        protocol:             ssl.PROTOCOL_* constant
+        tls_min_version:      Oldest accepted TLS version, key of
+                              TLS_VERSIONS
+
+    Returns:
+        SSL context
+    """
+    key = (client_cert_filename, client_key_filename, protocol, tls_min_version)
+    with _SSL_CONTEXTS_LOCK:
+        context = _SSL_CONTEXTS.get(key)
+        if context is None:
+            context = create_ssl_context(
+                client_cert_filename, client_key_filename, protocol, tls_min_version
+            )
+            _SSL_CONTEXTS[key] = context
+    return context
+
+
+def convert_map(val: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Convert the values of a map column to int or float where possible
+
+    Args:
+        val: Map column value
+
+    Returns:
+        Dictionary or None for a null column
+    """
+    if val is None:
+        return None
+    return {key: Db.convert_value(item) for key, item in val.items()}
+
+
+def convert_set(val: Optional[Iterable[Any]]) -> Optional[List[Any]]:
+    """ Convert a set column to a list """
+    return None if val is None else list(val)
+
+
+def get_column_converter(
+    column_name: str, column_type: Any
+    ) -> Optional[Callable[[Any], Any]]:
+    """Resolve the conversion of a schema column
+
+    Args:
+        column_name: Column name
+        column_type: Driver type class of the column
+
+    Returns:
+        Conversion function or None if values are used as they are
+    """
+    if issubclass(column_type, cqltypes.MapType):
+        return convert_map
+    if column_name == "flags" and issubclass(column_type, cqltypes.SetType):
+        return convert_set
+    if column_name == "id":
+        return str
+    return None
+
+
+def get_skipped_table_columns(drop_ids: bool) -> Tuple[str, ...]:
+    """ Columns of system_schema.tables not included in table properties """
+    return ("keyspace_name", "id") if drop_ids else ("keyspace_name",)
+
+
+class RowNormalizer:
+    """Convert tuple rows of a schema query to properties
+
+    Column positions, property names and conversions are resolved once from
+    the column metadata of a result, so converting a row only builds one
+    dictionary and calls the conversion of the few non-scalar columns.
+    """
+
+    def __init__(
+        self,
+        column_names: Sequence[str],
+        column_types: Sequence[Any],
+        skipped_columns: Iterable[str] = (),
+    ):
+        """Resolve the columns of a result
+
+        Args:
+            column_names:    Column names of the result
+            column_types:    Driver type classes of the columns
+            skipped_columns: Columns left out of the properties
+        """
+        skipped = set(skipped_columns)
+        indexes = []
+        self._keys = []  # type: List[str]
+        self._converters = []  # type: List[Tuple[str, Callable[[Any], Any]]]
+        for idx, (name, cql_type) in enumerate(zip(column_names, column_types)):
+            if name in skipped:
+                continue
+            key = MAPPED_FIELD_NAMES.get(name, name)
+            indexes.append(idx)
+            self._keys.append(key)
+            converter = get_column_converter(name, cql_type)
+            if converter is not None:
+                self._converters.append((key, converter))
+
+        getter = operator.itemgetter(*indexes) if indexes else lambda row: ()
+        # itemgetter of a single index returns the value instead of a tuple
+        self._get_values = (
+            (lambda row: (getter(row),)) if len(indexes) == 1 else getter
+        )
+
+    def __call__(self, row: Sequence[Any]) -> Dict[str, Any]:
+        """Convert a row
+
+        Args:
+            row: Tuple row
+
+        Returns:
+            Keyspace or table properties
+        """
+        props = dict(zip(self._keys, self._get_values(row)))
+        for key, convert in self._converters:
+            props[key] = convert(props[key])
+        return props
+
 
 class ConnectionParams:
     """ Cassandra connection parameters """
@@ -28,6 +379,12 @@ class ConnectionParams:
         ssl_required: bool = False,
         client_cert_filename: str = None,
         client_key_filename: str = None,
+        fast_connect: bool = False,
+        protocol_version: int = None,
+        connect_timeout: float = None,
+        compression: str = None,
+        fetch_size: int = DEFAULT_FETCH_SIZE,
+        tls_min_version: str = DEFAULT_TLS_MIN_VERSION,
     ):
         """Construct connection settings dictionary.
         Args:
@@ -39,6 +396,15 @@ class ConnectionParams:
             ssl_required:     flag whether to use encrypted connection
             client_cert_file: location of client certificate
             client_key_file:  location of client key
+            fast_connect:     skip token map and schema metadata of the driver
+            protocol_version: native protocol version. Negotiated if None,
+                              FAST_CONNECT_PROTOCOL_VERSION with fast_connect.
+            connect_timeout:  seconds to establish a connection
+            compression:      protocol compression: lz4, snappy or none. Any
+                              installed one is negotiated if None.
+            fetch_size:       rows per page of schema scans
+            tls_min_version:  oldest accepted TLS version: 1.0, 1.1, 1.2
+                              or 1.3
         """
         self._host = host if isinstance(host, str) else DEFAULT_HOST
         self._port = port if isinstance(port, int) else DEFAULT_NATIVE_CQL_PORT
@@ -47,23 +413,12 @@ class ConnectionParams:
         self._ssl_required = ssl_required  # None = not set
         self._client_cert_filename = client_cert_filename
         self._client_key_filename = client_key_filename
-        if ssl_required or (client_cert_filename and client_key_filename):
-            self._ssl_context = ssl.SSLContext(
-                ssl.PROTOCOL_TLSv1
-            )  # type: Optional[ssl.SSLContext]
-            # Build options dict for older driver versions
-            self._ssl_options = {
-                "ssl_version": ssl.PROTOCOL_TLSv1
-            }  # type: Optional[Dict[str, Any]]
-            if client_cert_filename and client_key_filename:
-                self._ssl_context.load_cert_chain(
-                    certfile=client_cert_filename, keyfile=client_key_filename
-                )
-                self._ssl_options["ca_certs"] = client_cert_filename
-        else:
-            self._ssl_context = None
-            self._ssl_options = None
-
+        self._fast_connect = fast_connect
+        self._protocol_version = protocol_version
+        self._connect_timeout = connect_timeout
+        self._compression = compression
+        self._fetch_size = fetch_size
+        self._tls_min_version = tls_min_version
         self._username = username
         self._password = password
         self._auth_provider = None
@@ -132,7 +487,6 @@ class ConnectionParams:
     def is_ssl_required(self, value: bool) -> None:
         """ Set SSL/TLS required flag """
         self._ssl_required = value
-        self._update_security_context()
 
     @property
     def client_cert_file(self) -> Optional[str]:
@@ -143,7 +497,6 @@ class ConnectionParams:
     def client_cert_file(self, value: str) -> None:
         """ Set the client cert filename """
         self._client_cert_filename = value
-        self._update_security_context()
 
     @property
     def client_key_file(self) -> Optional[str]:
@@ -154,34 +507,126 @@ class ConnectionParams:
     def client_key_file(self, value: str) -> None:
         """ Set the client key filename """
         self._client_key_filename = value
-        self._update_security_context()
 
     @property
     def ssl_context(self) -> Optional[ssl.SSLContext]:
-        """ SSL Context """
-        return self._ssl_context
+        """ SSL Context shared by all connections with the same client cert """
+        if not self._is_ssl_enabled():
+            return None
+        return get_ssl_context(
+            self._client_cert_filename,
+            self._client_key_filename,
+            tls_min_version=self.tls_min_version,
+        )
+
+    @property
+    def tls_min_version(self) -> str:
+        """ Get the oldest accepted TLS version """
+        return (
+            self._tls_min_version if self._tls_min_version else DEFAULT_TLS_MIN_VERSION
+        )
+
+    @tls_min_version.setter
+    def tls_min_version(self, value: str) -> None:
+        """ Set the oldest accepted TLS version: 1.0, 1.1, 1.2 or 1.3 """
+        self._tls_min_version = value
 
     @property
     def ssl_options(self) -> Optional[Dict[str, Any]]:
         """ SSL Options """
-        return self._ssl_options
+        if not self._is_ssl_enabled():
+            return None
+        # Build options dict for older driver versions
+        ssl_options = {
+            "ssl_version": getattr(ssl, "PROTOCOL_TLS", ssl.PROTOCOL_SSLv23)
+        }  # type: Dict[str, Any]
+        if self._client_cert_filename and self._client_key_filename:
+            ssl_options["ca_certs"] = self._client_cert_filename
+        return ssl_options
+
+    @property
+    def fast_connect(self) -> bool:
+        """ Is the fast-connect profile enabled """
+        return self._fast_connect
+
+    @fast_connect.setter
+    def fast_connect(self, value: bool) -> None:
+        """ Enable or disable the fast-connect profile """
+        self._fast_connect = value
+
+    @property
+    def protocol_version(self) -> Optional[int]:
+        """ Get the pinned native protocol version """
+        if self._protocol_version:
+            return self._protocol_version
+        return FAST_CONNECT_PROTOCOL_VERSION if self._fast_connect else None
+
+    @protocol_version.setter
+    def protocol_version(self, value: int) -> None:
+        """ Pin the native protocol version """
+        self._protocol_version = value
+
+    @property
+    def connect_timeout(self) -> Optional[float]:
+        """ Get the connect timeout in seconds """
+        if self._connect_timeout:
+            return self._connect_timeout
+        return FAST_CONNECT_TIMEOUT if self._fast_connect else None
+
+    @connect_timeout.setter
+    def connect_timeout(self, value: float) -> None:
+        """ Set the connect timeout in seconds """
+        self._connect_timeout = value
+
+    @property
+    def compression(self) -> Optional[str]:
+        """ Get the protocol compression """
+        return self._compression
+
+    @compression.setter
+    def compression(self, value: str) -> None:
+        """ Set the protocol compression: lz4, snappy or none """
+        self._compression = value
+
+    @property
+    def fetch_size(self) -> int:
+        """ Get the rows per page of schema scans """
+        return self._fetch_size if self._fetch_size else DEFAULT_FETCH_SIZE
+
+    @fetch_size.setter
+    def fetch_size(self, value: int) -> None:
+        """ Set the rows per page of schema scans """
+        self._fetch_size = value
+
+    @property
+    def cluster_options(self) -> Dict[str, Any]:
+        """ Keyword arguments of cluster.Cluster for the connection settings """
+        options = {}  # type: Dict[str, Any]
+        if self.protocol_version:
+            options["protocol_version"] = self.protocol_version
+        if self.connect_timeout:
+            options["connect_timeout"] = self.connect_timeout
+            options["control_connection_timeout"] = self.connect_timeout
+        if self._compression:
+            options["compression"] = (
+                False if self._compression == COMPRESSION_NONE else self._compression
+            )
+        if self._fast_connect:
+            # Properties are read from system_schema by Db itself
+            options["schema_metadata_enabled"] = False
+            options["token_metadata_enabled"] = False
+        return options
 
     @property
     def auth_provider(self):
         """ Auth Provider """
         return self._auth_provider
 
-    def _update_security_context(self):
-        """ Create/recreate the security context """
-        if not self._ssl_context:
-            self._ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLSv1)
-            self._ssl_options = {"ssl_version": ssl.PROTOCOL_TLSv1}
-        if self._client_cert_filename and self._client_key_filename:
-            # Only update if both are set
-            self._ssl_context.load_cert_chain(
-                certfile=self._client_cert_filename, keyfile=self._client_key_filename
-            )
-            self._ssl_options["ca_certs"] = self._client_cert_filename
+    def _is_ssl_enabled(self) -> bool:
+        """ Use TLS if it is required or a client certificate is set """
+        return self.is_ssl_required or bool(
+            self._client_cert_filename and self._client_key_filename
+        )
 
     def _update_authentication_provider(self):
         """ Create/recreate the auth provider """
@@ -215,6 +660,9 @@ class ConnectionParams:
         password = rc_config.get("authentication", "password", fallback=None)
         key_file = rc_config.get("ssl", "userkey", fallback=None)
         cert_file = rc_config.get("ssl", "usercert", fallback=None)
+        connect_timeout = rc_config.getfloat(
+            "connection", "connect_timeout", fallback=None
+        )
         lbp = policies.WhiteListRoundRobinPolicy([host])
 
         return ConnectionParams(
@@ -226,6 +674,7 @@ class ConnectionParams:
             client_cert_filename=cert_file,
             client_key_filename=key_file,
             lbp=lbp,
+            connect_timeout=connect_timeout,
         )
 
 
@@ -258,6 +707,7 @@ class Db(AbstractDb):
             load_balancing_policy=self._params.load_balancing_policy,
             port=self._params.port,
             auth_provider=self._params.auth_provider,
+            **self._params.cluster_options
         )
 
         if hasattr(self.cluster, "ssl_context"):
@@ -266,6 +716,66 @@ class Db(AbstractDb):
             # driver versions < 3.17.0 do not have support for ssl_context
             self.cluster.ssl_options = self._params.ssl_options
 
+        self._session = None
+        # Guards the lazy session creation against concurrent fetch workers
+        self._session_lock = threading.Lock()
+        self._prepared = {}  # type: Dict[str, query.PreparedStatement]
+        # Number of executed queries and statements
+        self.query_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    @property
+    def session(self):
+        """ Session shared by all queries, connected on first use """
+        if self._session is None:
+            self.connect()
+        return self._session
+
+    def connect(self, warm_up: bool = False) -> None:
+        """Connect the shared session
+
+        Args:
+            warm_up: Also prepare the schema queries and run a query, so
+                     the first fetch does not pay for connection setup.
+        """
+        with self._session_lock:
+            if self._session is None:
+                session = self.cluster.connect()
+                session.row_factory = query.tuple_factory
+                self._prepared = {}
+                self._session = session
+
+        if warm_up:
+            for query_stmt in SCHEMA_QUERIES:
+                self.prepare(query_stmt)
+            self.check_connection()
+
+    def shutdown(self) -> None:
+        """Close the shared session and all cluster connections"""
+        self._session = None
+        self._prepared = {}
+        self.cluster.shutdown()
+
+    def prepare(self, query_stmt: str) -> query.PreparedStatement:
+        """Prepare a statement once per session
+
+        Args:
+            query_stmt: CQL query with ? placeholders
+
+        Returns:
+            Prepared statement
+        """
+        prepared = self._prepared.get(query_stmt)
+        if prepared is None:
+            prepared = self.session.prepare(query_stmt)
+            self._prepared[query_stmt] = prepared
+        return prepared
+
     #TODO replace this function with ast.literal_eval
     @staticmethod
     def convert_value(val: Any) -> Any:
@@ -294,37 +804,100 @@ class Db(AbstractDb):
 
         return val
 
-    @staticmethod
-    def convert_mapped_props(subconfig) -> dict:
-        """Convert mapped properties
+    def exec_query(self, query_stmt: str) -> list:
+        """Execute Cassandra query
 
         Args:
-            subconfig: Mapping properties
+            query_stmt: CQL query
 
         Returns:
-            Dictionary with converted object properties
+            List of rows or empty list
         """
-        #TODO replace with ast.literal_eval
-        return (
-            {key: Db.convert_value(val) for key, val in subconfig.items()}
-            if isinstance(subconfig, util.OrderedMapSerializedKey)
-            else {}
-        )
+        self.query_count += 1
+        rows = self.session.execute(query_stmt)
 
-    def exec_query(self, query_stmt: str) -> list:
-        """Execute Cassandra query
+        if not hasattr(rows, "current_rows"):
+            return []
+        return [OrderedDict(zip(rows.column_names, row)) for row in rows.current_rows]
+
+    def execute_paged(
+        self,
+        query_stmt: str,
+        params: Sequence[Any] = None,
+        fetch_size: int = None,
+        ) -> cluster.ResultSet:
+        """Execute Cassandra query with paging
 
         Args:
             query_stmt: CQL query
+            params:     Bound parameters. If set, the query is prepared
+                        once per session and executed as bound statement.
+            fetch_size: Number of rows per page. Default: fetch_size of the
+                        connection parameters
 
         Returns:
-            List of rows or empty list
+            Result set of tuple rows fetching the next page on iteration
+        """
+        if fetch_size is None:
+            fetch_size = self._params.fetch_size
+        if params is None:
+            statement = query.SimpleStatement(query_stmt, fetch_size=fetch_size)
+        else:
+            statement = self.prepare(query_stmt).bind(params)
+            statement.fetch_size = fetch_size
+
+        self.query_count += 1
+        return self.session.execute(statement)
+
+    def iter_query(
+        self,
+        query_stmt: str,
+        params: Sequence[Any] = None,
+        fetch_size: int = None,
+        ) -> Iterator[Dict[str, Any]]:
+        """Execute Cassandra query and page through the results
+
+        Only one page of rows is held in memory at a time. The next page
+        is requested when the current one has been consumed.
+
+        Args:
+            query_stmt: CQL query
+            params:     Bound parameters. If set, the query is prepared
+                        once per session and executed as bound statement.
+            fetch_size: Number of rows per page. Default: fetch_size of the
+                        connection parameters
+
+        Returns:
+            Iterator of rows
         """
-        with self.cluster.connect() as session:
-            session.row_factory = query.ordered_dict_factory
-            rows = session.execute(query_stmt)
+        result = self.execute_paged(query_stmt, params, fetch_size)
+        for row in result:
+            yield OrderedDict(zip(result.column_names, row))
 
-            return rows.current_rows if hasattr(rows, "current_rows") else []
+    def iter_properties(
+        self,
+        query_stmt: str,
+        params: Sequence[Any],
+        skipped_columns: Iterable[str] = (),
+        ) -> Iterator[Dict[str, Any]]:
+        """Execute a schema query and convert its rows to properties
+
+        Args:
+            query_stmt:      CQL query
+            params:          Bound parameters
+            skipped_columns: Columns left out of the properties
+
+        Returns:
+            Iterator of keyspace or table properties
+        """
+        result = self.execute_paged(query_stmt, params)
+        normalize = None
+        for row in result:
+            if normalize is None:
+                normalize = RowNormalizer(
+                    result.column_names, result.column_types, skipped_columns
+                )
+            yield normalize(row)
 
     def check_connection(self) -> bool:
         """Test Cassandra connectivity
@@ -334,32 +907,97 @@ class Db(AbstractDb):
         """
         return self.exec_query("SELECT cql_version FROM system.local;") != []
 
-    def get_keyspace_configs(self) -> dict:
-        """Retrieve all keyspace properties.
+    def execute_statement(self, stmt: str) -> None:
+        """Execute a schema changing statement
+
+        Args:
+            stmt: CQL statement
+        """
+        self.query_count += 1
+        self.session.execute(stmt)
+
+    def get_schema_versions(self) -> Set[str]:
+        """Retrieve the schema versions of all nodes
 
         Returns:
-            Dictionary with keyspace settings.
+            Set of schema versions. One version means the nodes agree.
         """
-        keyspace_configs = []
+        versions = set()
+        for query_stmt in (LOCAL_SCHEMA_VERSION_QUERY, PEERS_SCHEMA_VERSION_QUERY):
+            for row in self.exec_query(query_stmt):
+                if row.get("schema_version") is not None:
+                    versions.add(str(row.get("schema_version")))
+
+        return versions
+
+    def get_data_center_nodes(self) -> Dict[str, int]:
+        """Count the nodes of every data center
+
+        Returns:
+            Data center name to number of nodes
+        """
+        nodes = {}  # type: Dict[str, int]
+        for query_stmt in (LOCAL_DATA_CENTER_QUERY, PEERS_DATA_CENTER_QUERY):
+            for row in self.exec_query(query_stmt):
+                data_center = row.get("data_center")
+                nodes[data_center] = nodes.get(data_center, 0) + 1
+
+        return nodes
+
+    def get_size_estimates(self) -> Dict[Tuple[str, str], int]:
+        """Retrieve the estimated data size of all tables with one query
 
-        rows = self.exec_query("SELECT * FROM system_schema.keyspaces;")
-        for row in rows:
+        system.size_estimates is local to the node answering the query and
+        covers the token ranges it owns, so the sizes are bytes per node.
+
+        Returns:
+            (keyspace name, table name) to estimated bytes
+        """
+        sizes = {}  # type: Dict[Tuple[str, str], int]
+        for ks_name, tbl_name, mean_size, count in self.execute_paged(
+            SIZE_ESTIMATES_QUERY
+        ):
+            key = (ks_name, tbl_name)
+            sizes[key] = sizes.get(key, 0) + (mean_size or 0) * (count or 0)
+
+        return sizes
+
+    def iter_keyspace_configs(self) -> Iterator[Dict[str, Any]]:
+        """Retrieve keyspace properties page by page.
+
+        Returns:
+            Iterator of keyspace properties without system keyspaces
+        """
+        for keyspace in self.iter_properties(KEYSPACES_QUERY, ()):
             # Skip system tables.
-            if row.get("keyspace_name").startswith("system"):
+            if keyspace["name"].startswith("system"):
                 continue
 
-            keyspace = {}
-            for key, val in row.items():
-                mapped_key = MAPPED_FIELD_NAMES.get(key, key)
+            yield keyspace
 
-                if isinstance(val, util.OrderedMapSerializedKey):
-                    val = Db.convert_mapped_props(val)
-                elif key == "flags":
-                    val = list(val) if isinstance(val, util.SortedSet) else val
-                keyspace[mapped_key] = val
-            keyspace_configs.append(keyspace)
+    def get_keyspace_configs(self) -> dict:
+        """Retrieve all keyspace properties.
 
-        return {"keyspaces": keyspace_configs}
+        Returns:
+            Dictionary with keyspace settings.
+        """
+        return {"keyspaces": list(self.iter_keyspace_configs())}
+
+    def iter_table_configs(
+        self, keyspace_name: str, drop_ids: bool
+        ) -> Iterator[Dict[str, Any]]:
+        """Retrieve table properties page by page
+
+        Args:
+            keyspace_name: Keyspace name
+            drop_ids:      Skip table ids
+
+        Returns:
+            Iterator of table properties
+        """
+        yield from self.iter_properties(
+            TABLES_QUERY, (keyspace_name,), get_skipped_table_columns(drop_ids)
+        )
 
     def get_table_configs(
         self, keyspace_name: str, drop_ids: bool
@@ -372,30 +1010,164 @@ class Db(AbstractDb):
         Returns:
             Table properties in dictionary
         """
-        table_configs = []
+        return list(self.iter_table_configs(keyspace_name, drop_ids))
+
+    def get_table_config(
+        self, keyspace_name: str, table_name: str, drop_ids: bool
+        ) -> Optional[Dict[str, Any]]:
+        """Retrieve the properties of a single table
+
+        Args:
+            keyspace_name: Keyspace name
+            table_name:    Table name
+            drop_ids:      Skip the table id
+
+        Returns:
+            Table properties or None if the table does not exist
+        """
+        for table in self.iter_properties(
+            TABLE_QUERY, (keyspace_name, table_name), get_skipped_table_columns(drop_ids)
+        ):
+            return table
+        return None
+
+    def iter_keyspace_configs_by_name(
+        self, keyspace_names: Iterable[str], batch_size: int = DEFAULT_IN_BATCH_SIZE
+        ) -> Iterator[Dict[str, Any]]:
+        """Retrieve the properties of the listed keyspaces
+
+        Keyspaces are read with one IN query per batch of names.
+
+        Args:
+            keyspace_names: Keyspace names
+            batch_size:     Names per query
+
+        Returns:
+            Iterator of keyspace properties without system keyspaces
+        """
+        for names in utils.chunked(sorted(set(keyspace_names)), batch_size):
+            for keyspace in self.iter_properties(KEYSPACES_IN_QUERY, (names,)):
+                if not keyspace["name"].startswith("system"):
+                    yield keyspace
+
+    def iter_table_configs_by_name(
+        self,
+        keyspace_name: str,
+        table_names: Iterable[str],
+        drop_ids: bool,
+        batch_size: int = DEFAULT_IN_BATCH_SIZE,
+        ) -> Iterator[Dict[str, Any]]:
+        """Retrieve the properties of the listed tables of a keyspace
+
+        Tables are read with one IN query per batch of names, so the cost
+        depends on the number of listed tables and not on the schema size.
+
+        Args:
+            keyspace_name: Keyspace name
+            table_names:   Table names
+            drop_ids:      Skip table ids
+            batch_size:    Names per query
+
+        Returns:
+            Iterator of table properties of the existing tables
+        """
+        for names in utils.chunked(sorted(set(table_names)), batch_size):
+            yield from self.iter_properties(
+                TABLES_IN_QUERY,
+                (keyspace_name, names),
+                get_skipped_table_columns(drop_ids),
+            )
+
+    def get_partial_config(
+        self,
+        table_keys: Iterable[Tuple[str, str]],
+        keyspace_names: Iterable[str] = None,
+        drop_ids: bool = False,
+        ) -> Optional[Dict[Any, Any]]:
+        """Retrieve the properties of the listed keyspaces and tables only
 
-        query_stmt = (
-            "SELECT * FROM system_schema.tables "
-            "WHERE keyspace_name = '{}';".format(keyspace_name)
+        Args:
+            table_keys:     (keyspace name, table name) tuples
+            keyspace_names: Additional keyspaces without listed tables
+            drop_ids:       Skip table ids
+
+        Returns:
+            Dictionary with keyspace and table properties or None
+        """
+        table_names = {}  # type: Dict[str, List[str]]
+        for keyspace_name, table_name in table_keys:
+            table_names.setdefault(keyspace_name, []).append(table_name)
+
+        keyspaces = list(
+            self.iter_keyspace_configs_by_name(
+                set(table_names) | set(keyspace_names if keyspace_names else [])
+            )
         )
+        if not keyspaces:
+            return None
+
+        for keyspace in keyspaces:
+            ks_name = keyspace.get("name")
+            keyspace["tables"] = list(
+                self.iter_table_configs_by_name(
+                    ks_name, table_names.get(ks_name, []), drop_ids
+                )
+            )
+
+        return {"keyspaces": keyspaces}
+
+    def get_matching_config(
+        self, config: Dict[str, Any], drop_ids: bool = False
+        ) -> Optional[Dict[Any, Any]]:
+        """Retrieve the current properties of the keyspaces and tables of a config
+
+        Args:
+            config:   Configuration listing keyspaces and tables by name
+            drop_ids: Skip table ids
 
-        rows = self.exec_query(query_stmt)
-        for row in rows:
-            tbl = {}
-            for key, val in row.items():
-                if key == "keyspace_name" or (key == "id" and drop_ids):
-                    continue
-                elif isinstance(val, util.OrderedMapSerializedKey):
-                    val = Db.convert_mapped_props(val)
-                elif key == "flags":
-                    val = list(val) if isinstance(val, util.SortedSet) else val
-                elif key == "id":
-                    val = str(val)
-                tbl[MAPPED_FIELD_NAMES.get(key, key)] = val
-
-            table_configs.append(tbl)
-
-        return table_configs
+        Returns:
+            Dictionary with keyspace and table properties or None
+
+        Raises:
+            KeyError if a keyspace or table has no name
+        """
+        keyspaces = config.get("keyspaces", []) if config else []
+        for keyspace in keyspaces:
+            if not keyspace.get("name"):
+                raise KeyError("Invalid config. Missing keyspace name")
+            for table in keyspace.get("tables", []):
+                if not table.get("name"):
+                    raise KeyError(
+                        "Invalid config. Missing table name in keyspace '{}'".format(
+                            keyspace["name"]
+                        )
+                    )
+        return self.get_partial_config(
+            [
+                (keyspace.get("name"), table.get("name"))
+                for keyspace in keyspaces
+                for table in keyspace.get("tables", [])
+            ],
+            [keyspace.get("name") for keyspace in keyspaces],
+            drop_ids,
+        )
+
+    def iter_current_config(
+        self, drop_ids: bool = False
+        ) -> Iterator[Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]]:
+        """Retrieve the current config keyspace by keyspace.
+
+        Tables are fetched lazily, so consuming the config keeps only the
+        current page of rows in memory.
+
+        Args:
+            drop_ids: Skip table ids
+
+        Returns:
+            Iterator of (keyspace properties, iterator of table properties)
+        """
+        for keyspace in self.iter_keyspace_configs():
+            yield keyspace, self.iter_table_configs(keyspace.get("name"), drop_ids)
 
     def get_current_config(self, drop_ids: bool = False) -> Optional[Dict[Any, Any]]:
         """Retrieve the current config from the Cassandra instance.
@@ -0,0 +1,114 @@
+""" Drift state tracking between runs
+"""
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DRIFT_STATE_VERSION = 1
+
+
+def get_drift_key(keyspace_name: str, table_name: Optional[str] = None) -> str:
+    """Build the state key for a keyspace or table
+
+    Args:
+        keyspace_name: Keyspace name
+        table_name:    Table name or None for keyspace properties
+
+    Returns:
+        "<keyspace>" or "<keyspace>.<table>"
+    """
+    return keyspace_name if not table_name else "{}.{}".format(keyspace_name, table_name)
+
+
+def get_digest(stmt: str) -> str:
+    """Digest of a pending ALTER statement
+
+    The statement lists every drifting property with its desired value,
+    so the digest changes whenever the set of pending changes does.
+
+    Args:
+        stmt: CQL statement
+
+    Returns:
+        Hex digest
+    """
+    return hashlib.sha1(stmt.strip().encode("utf-8")).hexdigest()
+
+
+def get_drift_state(
+    statements: Iterable[Tuple[str, Optional[str], str]]
+    ) -> Dict[str, str]:
+    """Build the drift state of a run
+
+    Args:
+        statements: (keyspace name, table name, CQL statement) tuples as
+                    returned by generator.iter_alter_statements
+
+    Returns:
+        Dictionary mapping keyspace/table keys to statement digests
+    """
+    return {
+        get_drift_key(ks_name, tbl_name): get_digest(stmt)
+        for ks_name, tbl_name, stmt in statements
+    }
+
+
+def diff_drift_states(
+    previous: Dict[str, str], current: Dict[str, str]
+    ) -> Tuple[List[str], List[str]]:
+    """Compare the drift states of two runs
+
+    Args:
+        previous: Drift state of the last recorded run
+        current:  Drift state of this run
+
+    Returns:
+        Tuple of (new or changed keys, resolved keys)
+    """
+    new_keys = [key for key, dgst in current.items() if previous.get(key) != dgst]
+    resolved_keys = sorted(key for key in previous if key not in current)
+
+    return new_keys, resolved_keys
+
+
+def load_drift_state(filename: str) -> Dict[str, str]:
+    """Read the drift state of the last recorded run
+
+    Args:
+        filename: State file name
+
+    Returns:
+        Drift state or empty dictionary if no run was recorded yet
+    """
+    if not os.path.exists(filename):
+        return {}
+
+    with open(filename, "r", encoding="utf-8") as state_file:
+        state = json.load(state_file)
+
+    if state.get("version") != DRIFT_STATE_VERSION:
+        raise ValueError("Unsupported drift state file '{}'".format(filename))
+
+    return state.get("drift", {})
+
+
+def save_drift_state(filename: str, drift: Dict[str, str]) -> None:
+    """Record the drift state of this run
+
+    The file is replaced atomically so an interrupted run keeps the
+    previous state intact.
+
+    Args:
+        filename: State file name
+        drift:    Drift state
+    """
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "w", encoding="utf-8") as state_file:
+        json.dump(
+            {"version": DRIFT_STATE_VERSION, "drift": drift},
+            state_file,
+            indent=1,
+            sort_keys=True,
+        )
+    os.replace(tmp_filename, filename)
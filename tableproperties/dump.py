@@ -0,0 +1,73 @@
+""" Streaming configuration dump
+"""
+import json
+import textwrap
+from typing import Any, Dict, Iterable, Iterator, TextIO, Tuple
+
+import yaml
+
+KeyspaceStream = Iterable[Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]]
+
+
+def write_yaml_stream(keyspaces: KeyspaceStream, out: TextIO) -> int:
+    """Write the keyspaces list of the regular dump as tables are fetched
+
+    The output has the layout of the regular dump, so it can be used as a
+    desired configuration file. Keyspaces and tables are rendered one at a
+    time, so memory use does not grow with the number of tables.
+
+    Args:
+        keyspaces: (keyspace properties, iterator of table properties) tuples
+        out:       Output stream
+
+    Returns:
+        Number of keyspaces written
+    """
+    count = 0
+    for keyspace, tables in keyspaces:
+        if not count:
+            out.write("keyspaces:\n")
+        out.write(yaml.dump([keyspace], default_flow_style=False))
+
+        has_tables = False
+        for table in tables:
+            if not has_tables:
+                out.write("  tables:\n")
+                has_tables = True
+            out.write(
+                textwrap.indent(yaml.dump([table], default_flow_style=False), "  ")
+            )
+        if not has_tables:
+            out.write("  tables: []\n")
+
+        out.flush()
+        count += 1
+
+    return count
+
+
+def write_ndjson_stream(keyspaces: KeyspaceStream, out: TextIO) -> int:
+    """Write one JSON line per keyspace and table as they are fetched
+
+    Keyspace lines have a "type" of "keyspace". Table lines have a "type"
+    of "table" and carry the name of their keyspace in "keyspace".
+
+    Args:
+        keyspaces: (keyspace properties, iterator of table properties) tuples
+        out:       Output stream
+
+    Returns:
+        Number of keyspaces written
+    """
+    count = 0
+    for keyspace, tables in keyspaces:
+        ks_name = keyspace.get("name")
+        out.write(json.dumps(dict(keyspace, type="keyspace"), default=str) + "\n")
+        for table in tables:
+            record = dict(table, type="table", keyspace=ks_name)
+            out.write(json.dumps(record, default=str) + "\n")
+
+        out.flush()
+        count += 1
+
+    return count
@@ -0,0 +1,251 @@
+""" Disk I/O and temporary space of the SSTable rewrites of a change plan
+
+system.size_estimates of the node answering the query covers the token
+ranges that node owns, so the data of a table in the whole ring is about
+its estimate times the number of nodes. NetworkTopologyStrategy stores
+that data replication factor times in every data center, spread over the
+nodes of the data center. SimpleStrategy ignores data centers and places
+its replicas on the next nodes of the whole ring, so every node stores
+about the data times the replication factor divided by the number of nodes
+of the cluster.
+
+Per table and data center node the cost of a change is modelled as:
+
+- compaction class switch: all SSTables are compacted again. Switching to
+  leveled compaction works in small SSTables; other strategies may
+  compact all SSTables of the node at once.
+- compression and bloom_filter_fp_chance: existing SSTables keep their
+  old settings until they are rewritten (upgradesstables -a), which
+  happens one SSTable at a time.
+- compaction options without a class switch: only affect future
+  compactions and cost nothing up front.
+
+One rewrite applies all changes of a table, so the most expensive change
+of a table determines its cost.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from tableproperties import generator as gen, plan
+
+LEVELED_COMPACTION = "LeveledCompactionStrategy"
+SIMPLE_STRATEGY = "SimpleStrategy"
+DEFAULT_SSTABLE_SIZE_MB = 160
+# SSTables of the next level a leveled compaction reads per input SSTable
+LEVELED_FANOUT = 10
+# Share of the data of a table held by its largest SSTable without
+# leveled compaction
+LARGEST_SSTABLE_SHARE = 0.5
+
+REWRITE_NONE = "none"
+REWRITE_FULL = "full"
+REWRITE_PER_SSTABLE = "per_sstable"
+
+BYTE_UNITS = ("KiB", "MiB", "GiB", "TiB")
+
+
+def is_simple_strategy(replication: Dict[str, Any]) -> bool:
+    """ True if the replicas are placed regardless of data centers """
+    return gen.do_class_names_match(replication.get("class"), SIMPLE_STRATEGY)
+
+
+def get_replication_factor(replication: Dict[str, Any], data_center: str) -> int:
+    """Replicas of a keyspace in a data center
+
+    Args:
+        replication:  Replication of the keyspace
+        data_center:  Data center name
+
+    Returns:
+        Number of replicas. For SimpleStrategy the replicas of the whole
+        cluster, whichever data centers they are placed in.
+    """
+    if is_simple_strategy(replication):
+        factor = replication.get("replication_factor", 0)
+    else:
+        factor = replication.get(data_center, 0)
+    # Cassandra 4 writes transient replicas as "<all>/<transient>"
+    return int(str(factor).split("/")[0])
+
+
+def get_node_bytes(
+    replication: Dict[str, Any], data_center: str, nodes: Dict[str, int],
+    ring_bytes: int
+    ) -> int:
+    """Data of a table on one node of a data center
+
+    Args:
+        replication:  Replication of the keyspace
+        data_center:  Data center name
+        nodes:        Data center name to number of nodes
+        ring_bytes:   Data of the table in the whole ring, without replicas
+
+    Returns:
+        Bytes per node
+    """
+    if is_simple_strategy(replication):
+        count = sum(nodes.values())
+    else:
+        count = nodes.get(data_center, 0)
+    if not count:
+        return 0
+    factor = min(count, get_replication_factor(replication, data_center))
+    return ring_bytes * factor // count
+
+
+def get_sstable_size(compaction: Dict[str, Any]) -> int:
+    """ Size of the SSTables of a leveled compaction in bytes """
+    return int(compaction.get("sstable_size_in_mb", DEFAULT_SSTABLE_SIZE_MB)) << 20
+
+
+def is_leveled(compaction: Dict[str, Any]) -> bool:
+    """ True if the compaction strategy is leveled """
+    return gen.do_class_names_match(compaction.get("class"), LEVELED_COMPACTION)
+
+
+def estimate_node_cost(
+    changes: list, compaction: Dict[str, Any], node_bytes: int
+    ) -> Tuple[int, int]:
+    """Estimate the rewrite of the data of a table on one node
+
+    Args:
+        changes:    Changed values as returned by the generator
+        compaction: Compaction of the table after the change
+        node_bytes: Data of the table on the node
+
+    Returns:
+        Tuple of (bytes rewritten, temporary bytes)
+    """
+    rewrite = REWRITE_NONE
+    for chg in changes:
+        prop = chg.get("property")
+        if prop == "compaction":
+            current_class = (chg.get("current") or {}).get("class")
+            desired_class = (chg.get("desired") or {}).get("class")
+            if desired_class and not gen.do_class_names_match(
+                current_class, desired_class
+            ):
+                rewrite = REWRITE_FULL
+        elif prop in plan.PER_SSTABLE_REWRITE_PROPERTIES and rewrite == REWRITE_NONE:
+            rewrite = REWRITE_PER_SSTABLE
+
+    if rewrite == REWRITE_NONE or not node_bytes:
+        return 0, 0
+
+    if is_leveled(compaction):
+        sstable_bytes = get_sstable_size(compaction)
+        if rewrite == REWRITE_FULL:
+            # One SSTable and the overlapping SSTables of the next level
+            sstable_bytes *= LEVELED_FANOUT + 1
+        return node_bytes, min(node_bytes, sstable_bytes)
+
+    if rewrite == REWRITE_FULL:
+        return node_bytes, node_bytes
+    return node_bytes, int(node_bytes * LARGEST_SSTABLE_SHARE)
+
+
+def estimate_plan(
+    change_plan: plan.ChangePlan,
+    current_config: Dict[str, Any],
+    sizes: plan.SizeEstimates,
+    nodes: Dict[str, int],
+    ) -> Dict[str, List[Dict[str, Any]]]:
+    """Estimate the rewrites of a change plan
+
+    Args:
+        change_plan:    Planned changes
+        current_config: Current properties
+        sizes:          Table size estimates as returned by
+                        Db.get_size_estimates
+        nodes:          Data center name to number of nodes as returned by
+                        Db.get_data_center_nodes
+
+    Returns:
+        Dictionary with tables and data_centers lists. Table records have
+        keyspace, table, data_center, properties, estimated_bytes (size
+        estimate of the queried node), rewrite_bytes and temp_bytes (per
+        node) keys. Data center records have data_center, nodes,
+        rewrite_bytes, temp_bytes_peak and temp_bytes_total (per node) and
+        cluster_rewrite_bytes (all nodes of the data center) keys.
+    """
+    keyspaces = {ks["name"]: ks for ks in current_config.get("keyspaces", [])}
+    node_count = sum(nodes.values())
+    tables = []  # type: List[Dict[str, Any]]
+    data_centers = {
+        dc: {
+            "data_center": dc,
+            "nodes": count,
+            "rewrite_bytes": 0,
+            "temp_bytes_peak": 0,
+            "temp_bytes_total": 0,
+            "cluster_rewrite_bytes": 0,
+        }
+        for dc, count in sorted(nodes.items())
+    }
+
+    for ks_name, tbl_name, changes in change_plan.iter_change_sets():
+        properties = [
+            chg.get("property")
+            for chg in changes
+            if chg.get("property") in plan.REWRITE_PROPERTIES
+        ]
+        if tbl_name is None or not properties:
+            continue
+
+        keyspace = keyspaces.get(ks_name, {})
+        current_table = next(
+            (tbl for tbl in keyspace.get("tables", []) if tbl["name"] == tbl_name), {}
+        )
+        compaction = next(
+            (chg["desired"] for chg in changes if chg.get("property") == "compaction"),
+            current_table.get("compaction") or {},
+        )
+        estimated_bytes = sizes.get((ks_name, tbl_name))
+        # Data of the table in the whole ring
+        ring_bytes = (estimated_bytes or 0) * node_count
+
+        for dc, count in sorted(nodes.items()):
+            node_bytes = get_node_bytes(
+                keyspace.get("replication", {}), dc, nodes, ring_bytes
+            )
+            rewrite_bytes, temp_bytes = estimate_node_cost(
+                changes, compaction, node_bytes
+            )
+            tables.append(
+                {
+                    "keyspace": ks_name,
+                    "table": tbl_name,
+                    "data_center": dc,
+                    "properties": properties,
+                    "estimated_bytes": estimated_bytes,
+                    "rewrite_bytes": rewrite_bytes,
+                    "temp_bytes": temp_bytes,
+                }
+            )
+            summary = data_centers[dc]
+            summary["rewrite_bytes"] += rewrite_bytes
+            summary["temp_bytes_peak"] = max(summary["temp_bytes_peak"], temp_bytes)
+            summary["temp_bytes_total"] += temp_bytes
+            summary["cluster_rewrite_bytes"] += rewrite_bytes * count
+
+    return {"tables": tables, "data_centers": list(data_centers.values())}
+
+
+def format_bytes(size: Optional[int]) -> str:
+    """Human readable size
+
+    Args:
+        size: Bytes or None
+
+    Returns:
+        Size with binary unit, e.g. "1.5 GiB", or "unknown"
+    """
+    if size is None:
+        return "unknown"
+    if size < 1024:
+        return "{} B".format(size)
+    value = float(size)
+    for unit in BYTE_UNITS:
+        value /= 1024
+        if value < 1024 or unit == BYTE_UNITS[-1]:
+            break
+    return "{:.1f} {}".format(value, unit)
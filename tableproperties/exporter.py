@@ -0,0 +1,315 @@
+""" Prometheus exporter for drift between desired and current properties
+"""
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import logging
+from socketserver import ThreadingMixIn
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from tableproperties import configdir, db, plan
+
+METRIC_PREFIX = "cassandra_table_properties_"
+# Seconds between full drift computations
+DEFAULT_REFRESH_INTERVAL = 300.0
+# Seconds between schema version checks
+SCHEMA_POLL_INTERVAL = 5.0
+FETCH_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def format_labels(labels: Labels) -> str:
+    """Render metric labels
+
+    Args:
+        labels: (name, value) tuples
+
+    Returns:
+        '{name="value",...}' or an empty string
+    """
+    if not labels:
+        return ""
+    return "{{{}}}".format(
+        ",".join(
+            '{}="{}"'.format(
+                name,
+                value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+            )
+            for name, value in labels
+        )
+    )
+
+
+class Histogram:
+    """ Cumulative histogram in the Prometheus layout """
+
+    def __init__(self, buckets: Tuple[float, ...] = FETCH_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """ Record a value """
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[idx] += 1
+        self.count += 1
+        self.sum += value
+
+    def render(self, name: str) -> List[str]:
+        """ Sample lines of the histogram """
+        lines = [
+            '{}_bucket{{le="{}"}} {}'.format(name, bound, count)
+            for bound, count in zip(self.buckets, self.counts)
+        ]
+        lines.append('{}_bucket{{le="+Inf"}} {}'.format(name, self.count))
+        lines.append("{}_sum {}".format(name, self.sum))
+        lines.append("{}_count {}".format(name, self.count))
+        return lines
+
+
+class DriftExporter:
+    """Recompute drift with one reused connection and expose it as metrics
+
+    Drift is recomputed every refresh interval and whenever the schema
+    version of the cluster changes.
+    """
+
+    def __init__(
+        self,
+        conn: db.Db,
+        desired_configs: List[dict],
+        refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+        poll_interval: float = SCHEMA_POLL_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """Construct exporter
+
+        Args:
+            conn:             Database connection shared by all refreshes
+            desired_configs:  Desired properties
+            refresh_interval: Seconds between drift computations
+            poll_interval:    Seconds between schema version checks
+            clock:            Monotonic clock
+            sleep:            Sleep function
+        """
+        self._conn = conn
+        self._desired_configs = desired_configs
+        self._desired_config = configdir.merge_configs(desired_configs)
+        self._refresh_interval = refresh_interval
+        self._poll_interval = poll_interval
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+        self._schema_versions = None  # type: Optional[Set[str]]
+        self._last_refresh = None  # type: Optional[float]
+        self._drift = {}  # type: Dict[Tuple[str, str], int]
+        self._refreshes = {}  # type: Dict[str, int]
+        self._errors = 0
+        self._last_success = 0.0
+        self._fetch_histogram = Histogram()
+
+    def refresh(self, reason: str) -> None:
+        """Recompute the drift
+
+        Args:
+            reason: Label of the refresh counter
+        """
+        start = time.perf_counter()
+        current_config = self._conn.get_matching_config(self._desired_config)
+        fetch_time = time.perf_counter() - start
+
+        change_plan = plan.ChangePlan()
+        if current_config:
+            for desired_config in self._desired_configs:
+                change_plan.add_config(current_config, desired_config)
+
+        drift = {
+            (ks_name, tbl_name if tbl_name else ""): len(changes)
+            for ks_name, tbl_name, changes in change_plan.iter_change_sets()
+        }
+        with self._lock:
+            self._drift = drift
+            self._fetch_histogram.observe(fetch_time)
+            self._refreshes[reason] = self._refreshes.get(reason, 0) + 1
+            self._last_success = time.time()
+        logging.info(
+            "Drift refreshed (%s): %d keyspaces and tables, fetch took %.2fs",
+            reason,
+            len(drift),
+            fetch_time,
+        )
+
+    def poll(self) -> Optional[str]:
+        """Refresh the drift if it is due or the schema changed
+
+        Errors are logged and counted, so a temporary outage does not stop
+        the exporter.
+
+        Returns:
+            Reason of the refresh or None
+        """
+        reason = None
+        try:
+            versions = self._conn.get_schema_versions()
+            now = self._clock()
+            if self._last_refresh is None:
+                reason = "startup"
+            elif versions != self._schema_versions:
+                reason = "schema_change"
+            elif now - self._last_refresh >= self._refresh_interval:
+                reason = "schedule"
+
+            if reason:
+                self.refresh(reason)
+                self._schema_versions = versions
+                self._last_refresh = now
+        except Exception:  # pylint: disable=broad-except
+            logging.exception("Drift refresh failed")
+            with self._lock:
+                self._errors += 1
+            reason = None
+
+        return reason
+
+    def run(self) -> None:
+        """ Poll until interrupted """
+        while True:
+            self.poll()
+            self._sleep(self._poll_interval)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text format
+
+        Returns:
+            Exposition text
+        """
+        drift_name = METRIC_PREFIX + "drift_properties"
+        keyspace_name = METRIC_PREFIX + "keyspace_drift_objects"
+        fetch_name = METRIC_PREFIX + "fetch_duration_seconds"
+
+        with self._lock:
+            keyspace_drift = {}  # type: Dict[str, int]
+            for ks_name, _ in self._drift:
+                keyspace_drift[ks_name] = keyspace_drift.get(ks_name, 0) + 1
+
+            lines = [
+                "# HELP {} Properties differing from the desired value".format(
+                    drift_name
+                ),
+                "# TYPE {} gauge".format(drift_name),
+            ]
+            lines.extend(
+                "{}{} {}".format(
+                    drift_name,
+                    format_labels((("keyspace", ks_name), ("table", tbl_name))),
+                    count,
+                )
+                for (ks_name, tbl_name), count in sorted(self._drift.items())
+            )
+            lines.extend(
+                [
+                    "# HELP {} Drifting keyspaces and tables per keyspace".format(
+                        keyspace_name
+                    ),
+                    "# TYPE {} gauge".format(keyspace_name),
+                ]
+            )
+            lines.extend(
+                "{}{} {}".format(
+                    keyspace_name, format_labels((("keyspace", ks_name),)), count
+                )
+                for ks_name, count in sorted(keyspace_drift.items())
+            )
+            lines.extend(
+                [
+                    "# HELP {}drift_objects Drifting keyspaces and tables".format(
+                        METRIC_PREFIX
+                    ),
+                    "# TYPE {}drift_objects gauge".format(METRIC_PREFIX),
+                    "{}drift_objects {}".format(METRIC_PREFIX, len(self._drift)),
+                    "# HELP {} Time to read the current properties".format(fetch_name),
+                    "# TYPE {} histogram".format(fetch_name),
+                ]
+            )
+            lines.extend(self._fetch_histogram.render(fetch_name))
+            lines.extend(
+                [
+                    "# HELP {}queries_total Queries sent to the cluster".format(
+                        METRIC_PREFIX
+                    ),
+                    "# TYPE {}queries_total counter".format(METRIC_PREFIX),
+                    "{}queries_total {}".format(METRIC_PREFIX, self._conn.query_count),
+                    "# HELP {}refreshes_total Drift computations".format(METRIC_PREFIX),
+                    "# TYPE {}refreshes_total counter".format(METRIC_PREFIX),
+                ]
+            )
+            lines.extend(
+                "{}refreshes_total{} {}".format(
+                    METRIC_PREFIX, format_labels((("reason", reason),)), count
+                )
+                for reason, count in sorted(self._refreshes.items())
+            )
+            lines.extend(
+                [
+                    "# HELP {}refresh_errors_total Failed drift computations".format(
+                        METRIC_PREFIX
+                    ),
+                    "# TYPE {}refresh_errors_total counter".format(METRIC_PREFIX),
+                    "{}refresh_errors_total {}".format(METRIC_PREFIX, self._errors),
+                    "# HELP {}last_refresh_timestamp_seconds Time of the last "
+                    "drift computation".format(METRIC_PREFIX),
+                    "# TYPE {}last_refresh_timestamp_seconds gauge".format(
+                        METRIC_PREFIX
+                    ),
+                    "{}last_refresh_timestamp_seconds {}".format(
+                        METRIC_PREFIX, self._last_success
+                    ),
+                ]
+            )
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer(ThreadingMixIn, HTTPServer):
+    """ HTTP server exposing the metrics of an exporter on /metrics """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], exporter: DriftExporter):
+        self.exporter = exporter
+        super().__init__(address, MetricsHandler)
+
+    def start(self) -> threading.Thread:
+        """Serve requests in a daemon thread
+
+        Returns:
+            Server thread
+        """
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """ Request handler of MetricsServer """
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """ Respond with the metrics """
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+
+        body = self.server.exporter.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logging.debug("%s - %s", self.address_string(), format % args)
@@ -1,11 +1,15 @@
 # pylint: disable=missing-docstring
 """ Functions to create ALTER statements
 """
+from concurrent.futures import ProcessPoolExecutor
 import logging
-from typing import Any
+from typing import Any, Iterator, List, Optional, Tuple
 
 from tableproperties import utils
 
+# Number of keyspace/table pairs compared per work item
+DEFAULT_CHUNK_SIZE = 256
+
 
 def do_class_names_match(src_class: str, dst_class: str) -> bool:
     if src_class and dst_class:
@@ -26,6 +30,8 @@ def do_class_names_match(src_class: str, dst_class: str) -> bool:
 def compare_values(src: dict, dst: dict) -> list:
     """Compare configuration properties
 
+    Neither src nor dst is modified.
+
     Args:
         src: Current values
         dst: Desired values
@@ -43,26 +49,112 @@ def compare_values(src: dict, dst: dict) -> list:
         src_value = src.get(key)
         is_same_class = True
         if src_value and isinstance(src_value, dict) and isinstance(dst_value, dict):
-            src_class = src_value.pop("class", None)
-            dst_class = dst_value.pop("class", None)
+            src_class = src_value.get("class", None)
+            dst_class = dst_value.get("class", None)
             is_same_class = do_class_names_match(src_class, dst_class)
+            src_props = {k: v for k, v in src_value.items() if k != "class"}
+            dst_props = {k: v for k, v in dst_value.items() if k != "class"}
         else:
             src_class = None
             dst_class = None
+            src_props = src_value
+            dst_props = dst_value
 
-        if src_value != dst_value or not is_same_class:
-            # Pop the class back in (changed or not)
+        if src_props != dst_props or not is_same_class:
             if dst_class or src_class:
-                # pylint: disable=line-too-long
-                dst_value["class"] = (  # type: ignore
-                    dst_class if dst_class else src_class
-                )
-                # pylint: enable=line-too-long
-            changed_values.append({"property": key, "desired": dst_value})
+                # Desired class (or the current one if none is desired) last
+                dst_value = dict(dst_props)  # type: ignore
+                dst_value["class"] = dst_class if dst_class else src_class
+            changed_values.append(
+                {"property": key, "current": src_value, "desired": dst_value}
+            )
 
     return changed_values
 
 
+def get_table_changes(current_table: dict, desired_table: dict) -> list:
+    """Compare table properties
+
+    Table ids and properties without a desired value are skipped as they
+    cannot be set with ALTER TABLE.
+
+    Args:
+        current_table: Current table properties
+        desired_table: Desired table properties
+
+    Returns:
+        List of changed values
+    """
+    return [
+        chg
+        for chg in compare_values(current_table, desired_table)
+        if chg.get("desired") and chg.get("property") != "id"
+    ]
+
+
+def format_alter_keyspace_statement(keyspace_name: str, changes: list) -> str:
+    """Render keyspace changes as ALTER KEYSPACE statement
+
+    Args:
+        keyspace_name: Keyspace name
+        changes:       Changed values as returned by compare_values
+
+    Returns:
+        CQL statement
+    """
+    prop_values = [
+        "{} = {}".format(chg.get("property"), chg.get("desired")) for chg in changes
+    ]
+    assignments = "\nAND ".join(prop_values)
+    return 'ALTER KEYSPACE "{}" WITH {};'.format(keyspace_name, assignments)
+
+
+def format_alter_table_statement(
+    keyspace_name: str, table_name: str, changes: list
+    ) -> str:
+    """Render table changes as ALTER TABLE statement
+
+    Args:
+        keyspace_name: Keyspace name
+        table_name:    Table name
+        changes:       Changed values as returned by get_table_changes
+
+    Returns:
+        CQL statement
+    """
+
+    def format_value(val: Any) -> Any:
+        return val if isinstance(val, dict) else "'" + str(val) + "'"
+
+    prop_values = [
+        "{} = {}".format(chg.get("property"), format_value(chg.get("desired")))
+        for chg in changes
+    ]
+    assignments = "\nAND ".join(prop_values)
+    return '\nALTER TABLE "{}"."{}"\nWITH {};'.format(
+        keyspace_name, table_name, assignments
+    )
+
+
+def format_alter_statement(
+    keyspace_name: str, table_name: Optional[str], changes: list
+    ) -> str:
+    """Render keyspace or table changes as ALTER statement
+
+    Args:
+        keyspace_name: Keyspace name
+        table_name:    Table name or None for keyspace changes
+        changes:       Changed values
+
+    Returns:
+        CQL statement
+    """
+    if table_name is None:
+        return format_alter_keyspace_statement(keyspace_name, changes)
+
+    return format_alter_table_statement(keyspace_name, table_name, changes)
+
+
 def generate_alter_keyspace_statement(
     keyspace_name: str, current_keyspace: dict, desired_keyspace: dict
     ) -> str:
@@ -77,77 +169,116 @@ def generate_alter_keyspace_statement(
         CQL statement with changed properties or empty string
     """
 
-    alter_stmt = ""
     changes = compare_values(current_keyspace, desired_keyspace)
 
-    if changes:
-        prop_values = [
-            "{} = {}".format(chg.get("property"), chg.get("desired")) for chg in changes
-        ]
-        assignments = "\nAND ".join(prop_values)
-        alter_stmt = 'ALTER KEYSPACE "{}" WITH {};'.format(keyspace_name, assignments)
-
-    return alter_stmt
+    return format_alter_keyspace_statement(keyspace_name, changes) if changes else ""
 
 
-def generate_alter_table_statement(
-    keyspace_name: str, current_tables: list, desired_tables: list
-    ) -> str:
-    """Create ALTER statements for tables in keyspace
+def iter_table_pairs(
+    current_tables: list, desired_tables: list
+    ) -> Iterator[Tuple[str, dict, dict]]:
+    """Match desired tables with current tables by name
 
     Args:
-        keyspace_name:  Keyspace name
         current_tables: Current table properties
         desired_tables: Desired table properties
 
     Returns:
-        CQL statement with changed properties or empty string
+        Iterator of (table name, current table, desired table) tuples
     """
+    current_tables_by_name = utils.index_by_value(current_tables, "name")
 
-    def format_value(val: Any) -> Any:
-        return val if isinstance(val, dict) else "'" + str(val) + "'"
-
-    tbl_stmts = ""
     for desired_table in desired_tables:
         tbl_name = desired_table.get("name", None)
         if not tbl_name:
             raise Exception("Missing table name in config")
 
-        current_table = utils.find_by_value(current_tables, "name", tbl_name)
+        current_table = current_tables_by_name.get(tbl_name)
 
         if not current_table:
             logging.warning("Table '%s' does not exist. Skipping...", tbl_name)
+            continue
+
+        yield tbl_name, current_table, desired_table
+
 
-        changes = compare_values(current_table, desired_table)
+def iter_table_change_sets(
+    current_tables: list, desired_tables: list
+    ) -> Iterator[Tuple[str, list]]:
+    """Compare tables in keyspace one table at a time
+
+    Args:
+        current_tables: Current table properties
+        desired_tables: Desired table properties
+
+    Returns:
+        Iterator of (table name, changed values) tuples for changed tables
+    """
+    for tbl_name, current_table, desired_table in iter_table_pairs(
+            current_tables, desired_tables
+    ):
+        changes = get_table_changes(current_table, desired_table)
         if changes:
-            prop_values = [
-                "{} = {}".format(chg.get("property"), format_value(chg.get("desired")))
-                for chg in changes
-                if chg.get("desired") and chg.get("property") != "id"
-            ]
-            assignments = "\nAND ".join(prop_values)
-            tbl_stmt = '\nALTER TABLE "{}"."{}"\nWITH {};'.format(
-                keyspace_name, tbl_name, assignments
-            )
-            tbl_stmts += tbl_stmt
+            yield tbl_name, changes
 
-    return tbl_stmts
 
+def iter_alter_table_statements(
+    keyspace_name: str, current_tables: list, desired_tables: list
+    ) -> Iterator[Tuple[str, str]]:
+    """Create ALTER statements for tables in keyspace one table at a time
 
-def generate_alter_statements(current_config: dict, desired_config: dict) -> str:
-    """Create ALTER statements for tables and keyspaces
+    Args:
+        keyspace_name:  Keyspace name
+        current_tables: Current table properties
+        desired_tables: Desired table properties
+
+    Returns:
+        Iterator of (table name, CQL statement) tuples for changed tables
+    """
+    for tbl_name, changes in iter_table_change_sets(current_tables, desired_tables):
+        yield tbl_name, format_alter_table_statement(keyspace_name, tbl_name, changes)
+
+
+def generate_alter_table_statement(
+    keyspace_name: str, current_tables: list, desired_tables: list
+    ) -> str:
+    """Create ALTER statements for tables in keyspace
+
+    Args:
+        keyspace_name:  Keyspace name
+        current_tables: Current table properties
+        desired_tables: Desired table properties
+
+    Returns:
+        CQL statement with changed properties or empty string
+    """
+    return "".join(
+        tbl_stmt
+        for _, tbl_stmt in iter_alter_table_statements(
+            keyspace_name, current_tables, desired_tables
+        )
+    )
+
+
+def iter_config_pairs(
+    current_config: dict, desired_config: dict
+    ) -> Iterator[Tuple[str, Optional[str], dict, dict]]:
+    """Match desired keyspaces and tables with the current ones
+
+    Every pair can be compared independently of all others.
 
     Args:
         current_config: Current properties
         desired_config: Desired properties
 
     Returns:
-        CQL statement with changed properties or empty string
+        Iterator of (keyspace name, table name, current properties, desired
+        properties) tuples. The table name is None for keyspace properties,
+        which are returned without their tables.
     """
     current_keyspaces = current_config.get("keyspaces", [])
     desired_keyspaces = desired_config.get("keyspaces", [])
-
-    stmt = ""
+    current_keyspaces_by_name = utils.index_by_value(current_keyspaces, "name")
 
     for desired_keyspace in desired_keyspaces:
         ks_name = desired_keyspace.get("name", None)
@@ -157,7 +288,7 @@ def generate_alter_statements(current_config: dict, desired_config: dict) -> str
             )
             raise KeyError("Invalid YAML conf. Missing keyspace name")
 
-        current_keyspace = utils.find_by_value(current_keyspaces, "name", ks_name)
+        current_keyspace = current_keyspaces_by_name.get(ks_name)
         if not current_keyspace:
             logging.warning(
                 """Skipped keyspace '%s'. Not found in
@@ -166,13 +297,168 @@ def generate_alter_statements(current_config: dict, desired_config: dict) -> str
             )
             continue
 
-        current_tables = current_keyspace.pop("tables", {})
-        desired_tables = desired_keyspace.pop("tables", {})
-
-        stmt += generate_alter_keyspace_statement(
-            ks_name, current_keyspace, desired_keyspace
+        yield (
+            ks_name,
+            None,
+            {k: v for k, v in current_keyspace.items() if k != "tables"},
+            {k: v for k, v in desired_keyspace.items() if k != "tables"},
         )
 
-        stmt += generate_alter_table_statement(ks_name, current_tables, desired_tables)
+        for tbl_name, current_table, desired_table in iter_table_pairs(
+                current_keyspace.get("tables", []), desired_keyspace.get("tables", [])
+        ):
+            yield ks_name, tbl_name, current_table, desired_table
+
+
+def compare_config_pairs(
+    pairs: List[Tuple[str, Optional[str], dict, dict]]
+    ) -> List[Tuple[str, Optional[str], list]]:
+    """Compare a chunk of keyspace and table pairs
+
+    Runs in pool worker processes in parallel mode and must therefore stay
+    a module level function.
+
+    Args:
+        pairs: Tuples as returned by iter_config_pairs
+
+    Returns:
+        List of (keyspace name, table name, changed values) tuples for
+        changed keyspaces and tables
+    """
+    change_sets = []
+    for ks_name, tbl_name, current, desired in pairs:
+        if tbl_name is None:
+            changes = compare_values(current, desired)
+        else:
+            changes = get_table_changes(current, desired)
+        if changes:
+            change_sets.append((ks_name, tbl_name, changes))
+
+    return change_sets
+
+
+def iter_change_sets(
+    current_config: dict,
+    desired_config: dict,
+    workers: int = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> Iterator[Tuple[str, Optional[str], list]]:
+    """Compare keyspaces and tables one at a time
+
+    With more than one worker the pairs are compared in chunks by a
+    process pool. Results are returned in the same order as in serial mode.
+
+    Args:
+        current_config: Current properties
+        desired_config: Desired properties
+        workers:        Number of worker processes. None or 1 compares in
+                        the current process.
+        chunk_size:     Number of pairs sent to a worker at once
+
+    Returns:
+        Iterator of (keyspace name, table name, changed values) tuples. The
+        table name is None for keyspace changes.
+    """
+    pairs = iter_config_pairs(current_config, desired_config)
 
-    return stmt
+    if not workers or workers < 2:
+        for chunk in utils.chunked(pairs, chunk_size):
+            for change_set in compare_config_pairs(chunk):
+                yield change_set
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() returns results in submission order
+        for change_sets in executor.map(
+                compare_config_pairs, utils.chunked(pairs, chunk_size)
+        ):
+            for change_set in change_sets:
+                yield change_set
+
+
+def make_change_records(
+    keyspace_name: str, table_name: Optional[str], changes: list
+    ) -> list:
+    """Convert changed values to structured change records
+
+    Args:
+        keyspace_name: Keyspace name
+        table_name:    Table name or None for keyspace changes
+        changes:       Changed values
+
+    Returns:
+        List of change records with keyspace, table, property, current and
+        desired keys
+    """
+    return [
+        {
+            "keyspace": keyspace_name,
+            "table": table_name,
+            "property": chg.get("property"),
+            "current": chg.get("current"),
+            "desired": chg.get("desired"),
+        }
+        for chg in changes
+    ]
+
+
+def generate_changes(
+    current_config: dict, desired_config: dict, workers: int = None
+    ) -> Iterator[dict]:
+    """Create structured change records for tables and keyspaces
+
+    Args:
+        current_config: Current properties
+        desired_config: Desired properties
+        workers:        Number of worker processes, see iter_change_sets
+
+    Returns:
+        Iterator of change records with keyspace, table (None for keyspace
+        properties), property, current and desired keys
+    """
+    for ks_name, tbl_name, changes in iter_change_sets(
+            current_config, desired_config, workers
+    ):
+        for record in make_change_records(ks_name, tbl_name, changes):
+            yield record
+
+
+def iter_alter_statements(
+    current_config: dict, desired_config: dict, workers: int = None
+    ) -> Iterator[Tuple[str, Optional[str], str]]:
+    """Create ALTER statements for tables and keyspaces one at a time
+
+    Args:
+        current_config: Current properties
+        desired_config: Desired properties
+        workers:        Number of worker processes, see iter_change_sets
+
+    Returns:
+        Iterator of (keyspace name, table name, CQL statement) tuples. The
+        table name is None for ALTER KEYSPACE statements.
+    """
+    for ks_name, tbl_name, changes in iter_change_sets(
+            current_config, desired_config, workers
+    ):
+        yield ks_name, tbl_name, format_alter_statement(ks_name, tbl_name, changes)
+
+
+def generate_alter_statements(
+    current_config: dict, desired_config: dict, workers: int = None
+    ) -> str:
+    """Create ALTER statements for tables and keyspaces
+
+    Args:
+        current_config: Current properties
+        desired_config: Desired properties
+        workers:        Number of worker processes, see iter_change_sets
+
+    Returns:
+        CQL statement with changed properties or empty string
+    """
+    return "".join(
+        stmt
+        for _, _, stmt in iter_alter_statements(
+            current_config, desired_config, workers
+        )
+    )
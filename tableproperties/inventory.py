@@ -0,0 +1,336 @@
+""" SQLite inventory of the keyspace and table properties of many clusters
+"""
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import re
+import sqlite3
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from tableproperties import db
+
+INVENTORY_VERSION = 1
+# Table name of keyspace property rows
+KEYSPACE_ROW = ""
+
+SCHEMA_STATEMENTS = [
+    """CREATE TABLE IF NOT EXISTS clusters (
+        name TEXT PRIMARY KEY,
+        schema_version TEXT,
+        refreshed_at REAL
+    )""",
+    """CREATE TABLE IF NOT EXISTS properties (
+        cluster TEXT NOT NULL,
+        keyspace_name TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        property TEXT NOT NULL,
+        value TEXT,
+        numeric REAL
+    )""",
+    "CREATE INDEX IF NOT EXISTS properties_value ON properties (property, value)",
+    "CREATE INDEX IF NOT EXISTS properties_numeric ON properties (property, numeric)",
+    "CREATE INDEX IF NOT EXISTS properties_cluster ON properties (cluster)",
+]
+
+# Refresh status of a cluster
+REFRESH_REFRESHED = "refreshed"
+REFRESH_UNCHANGED = "unchanged"
+REFRESH_FAILED = "failed"
+
+CONDITION_RE = re.compile(r"^\s*([\w.]+)\s*(<=|>=|!=|=|<|>|~)\s*(.*?)\s*$")
+NUMERIC_OPERATORS = ("<", "<=", ">", ">=")
+
+
+class InventoryError(Exception):
+    """ Invalid filter condition or inventory file """
+
+
+def iter_flat_properties(
+    props: Dict[str, Any], prefix: str = ""
+    ) -> Iterator[Tuple[str, Any]]:
+    """Flatten nested properties
+
+    Args:
+        props:  Keyspace or table properties
+        prefix: Path of the enclosing property
+
+    Returns:
+        Iterator of (dotted property path, value), e.g. compaction.class
+    """
+    for key, val in props.items():
+        if not prefix and key in ("name", "tables"):
+            continue
+        path = prefix + key
+        if isinstance(val, dict):
+            yield from iter_flat_properties(val, path + ".")
+        else:
+            yield path, val
+
+
+def get_numeric(val: Any) -> Optional[float]:
+    """ Numeric value of a property for range filters or None """
+    if isinstance(val, bool) or not isinstance(val, (int, float)):
+        return None
+    return float(val)
+
+
+def format_value(val: Any) -> Optional[str]:
+    """ Text value of a property for equality filters """
+    if val is None:
+        return None
+    return val if isinstance(val, str) else json.dumps(val, default=str)
+
+
+def iter_property_rows(
+    cluster: str, config: Optional[Dict[str, Any]]
+    ) -> Iterator[Tuple[str, str, str, str, Optional[str], Optional[float]]]:
+    """Convert a configuration to property rows
+
+    Args:
+        cluster: Cluster name
+        config:  Configuration as returned by get_current_config
+
+    Returns:
+        Iterator of (cluster, keyspace, table, property, value, numeric)
+        tuples. The table is KEYSPACE_ROW for keyspace properties.
+    """
+    for keyspace in config.get("keyspaces", []) if config else []:
+        objects = [(KEYSPACE_ROW, keyspace)]
+        objects.extend(
+            (table["name"], table) for table in keyspace.get("tables", [])
+        )
+        for tbl_name, props in objects:
+            for path, val in iter_flat_properties(props):
+                yield (
+                    cluster,
+                    keyspace["name"],
+                    tbl_name,
+                    path,
+                    format_value(val),
+                    get_numeric(val),
+                )
+
+
+def parse_condition(condition: str) -> Tuple[str, List[Any]]:
+    """Translate a filter condition to SQL
+
+    Args:
+        condition: "<property><operator><value>". Operators are =, !=, <,
+                   <=, >, >= and ~ (SQL LIKE pattern). Numbers are compared
+                   numerically.
+
+    Returns:
+        Tuple of (SELECT of the matching keyspaces and tables, parameters)
+
+    Raises:
+        InventoryError if the condition is invalid
+    """
+    match = CONDITION_RE.match(condition)
+    if not match:
+        raise InventoryError("Invalid condition '{}'".format(condition))
+    path, operator, value = match.groups()
+
+    numeric = get_numeric(db.Db.convert_value(value))
+    if operator == "~":
+        column = "value LIKE ?"
+    elif numeric is not None:
+        column = "numeric {} ?".format("<>" if operator == "!=" else operator)
+        value = numeric
+    elif operator in NUMERIC_OPERATORS:
+        raise InventoryError(
+            "Condition '{}' compares with a non-numeric value".format(condition)
+        )
+    else:
+        column = "value {} ?".format("<>" if operator == "!=" else operator)
+
+    return (
+        "SELECT cluster, keyspace_name, table_name FROM properties "
+        "WHERE property = ? AND " + column,
+        [path, value],
+    )
+
+
+class Inventory:
+    """ SQLite database with one row per keyspace and table property """
+
+    def __init__(self, filename: str):
+        """Open or create an inventory
+
+        Args:
+            filename: SQLite file name
+        """
+        self.filename = filename
+        self._conn = sqlite3.connect(filename)
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, INVENTORY_VERSION):
+            raise InventoryError(
+                "Inventory '{}' has version {}".format(filename, version)
+            )
+        with self._conn:
+            for stmt in SCHEMA_STATEMENTS:
+                self._conn.execute(stmt)
+            self._conn.execute("PRAGMA user_version = {}".format(INVENTORY_VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        """ Close the database """
+        self._conn.close()
+
+    def get_schema_version(self, cluster: str) -> Optional[str]:
+        """ Schema version of the last refresh of a cluster or None """
+        row = self._conn.execute(
+            "SELECT schema_version FROM clusters WHERE name = ?", (cluster,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def get_clusters(self) -> List[Dict[str, Any]]:
+        """List the clusters of the inventory
+
+        Returns:
+            List of dictionaries with name, schema_version, refreshed_at
+            and properties keys
+        """
+        rows = self._conn.execute(
+            "SELECT name, schema_version, refreshed_at, "
+            "(SELECT COUNT(*) FROM properties WHERE cluster = name) "
+            "FROM clusters ORDER BY name"
+        )
+        return [
+            {
+                "name": name,
+                "schema_version": schema_version,
+                "refreshed_at": refreshed_at,
+                "properties": count,
+            }
+            for name, schema_version, refreshed_at, count in rows
+        ]
+
+    def replace_cluster(
+        self, cluster: str, schema_version: str, config: Optional[Dict[str, Any]]
+        ) -> int:
+        """Replace the properties of a cluster in one transaction
+
+        Args:
+            cluster:        Cluster name
+            schema_version: Schema version the configuration was read at
+            config:         Configuration as returned by get_current_config
+
+        Returns:
+            Number of property rows
+        """
+        rows = list(iter_property_rows(cluster, config))
+        with self._conn:
+            self._conn.execute("DELETE FROM properties WHERE cluster = ?", (cluster,))
+            self._conn.executemany(
+                "INSERT INTO properties VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO clusters VALUES (?, ?, ?)",
+                (cluster, schema_version, time.time()),
+            )
+        return len(rows)
+
+    def query(self, conditions: Sequence[str]) -> List[Dict[str, Any]]:
+        """Find keyspaces and tables matching all conditions
+
+        Args:
+            conditions: Filter conditions, see parse_condition()
+
+        Returns:
+            List of dictionaries with cluster, keyspace and table keys.
+            The table is None for keyspaces.
+        """
+        selects = [parse_condition(condition) for condition in conditions]
+        if not selects:
+            return []
+        sql = " INTERSECT ".join(select for select, _ in selects)
+        params = [param for _, select_params in selects for param in select_params]
+        rows = self._conn.execute(sql + " ORDER BY 1, 2, 3", params)
+        return [
+            {
+                "cluster": cluster,
+                "keyspace": ks_name,
+                "table": tbl_name if tbl_name != KEYSPACE_ROW else None,
+            }
+            for cluster, ks_name, tbl_name in rows
+        ]
+
+
+def get_schema_version(conn: db.Db) -> str:
+    """ Schema versions of all nodes of a cluster as one string """
+    return ",".join(sorted(conn.get_schema_versions()))
+
+
+def fetch_cluster(
+    cluster: str, conn_params: db.ConnectionParams, known_version: Optional[str]
+    ) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    """Read the properties of a cluster if its schema version changed
+
+    Args:
+        cluster:       Cluster name
+        conn_params:   Connection parameters
+        known_version: Schema version of the last refresh or None
+
+    Returns:
+        Tuple of (cluster, schema version, configuration or None if the
+        schema version is unchanged)
+    """
+    with db.Db(conn_params) as conn:
+        schema_version = get_schema_version(conn)
+        if schema_version == known_version:
+            return cluster, schema_version, None
+        # None means no keyspaces besides the system ones
+        config = conn.get_current_config()
+        return cluster, schema_version, config if config else {"keyspaces": []}
+
+
+def refresh(
+    inventory: Inventory,
+    clusters: Dict[str, db.ConnectionParams],
+    workers: int = None,
+    ) -> Dict[str, str]:
+    """Reload the clusters whose schema version changed
+
+    Clusters are read concurrently. The inventory is written by the
+    calling thread. A cluster that cannot be read is logged and keeps its
+    previous properties; the other clusters are refreshed regardless.
+
+    Args:
+        inventory: Inventory
+        clusters:  Cluster name to connection parameters
+        workers:   Number of clusters read at the same time. Default: all
+
+    Returns:
+        Cluster name to REFRESH_REFRESHED, REFRESH_UNCHANGED or
+        REFRESH_FAILED
+    """
+    known_versions = {name: inventory.get_schema_version(name) for name in clusters}
+    statuses = {}
+    max_workers = workers if workers else max(1, len(clusters))
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        futures = [
+            (name, ex.submit(fetch_cluster, name, conn_params, known_versions[name]))
+            for name, conn_params in sorted(clusters.items())
+        ]
+        for name, future in futures:
+            try:
+                cluster, schema_version, config = future.result()
+            except Exception:  # pylint: disable=broad-except
+                logging.exception("Refresh of cluster '%s' failed", name)
+                statuses[name] = REFRESH_FAILED
+                continue
+            if config is None:
+                logging.info("Cluster '%s' is unchanged", cluster)
+                statuses[cluster] = REFRESH_UNCHANGED
+                continue
+            count = inventory.replace_cluster(cluster, schema_version, config)
+            logging.info("Cluster '%s' reloaded with %d properties", cluster, count)
+            statuses[cluster] = REFRESH_REFRESHED
+
+    return statuses
@@ -0,0 +1,198 @@
+""" Checkpoint journal of applied schema changes
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from tableproperties import db, drift, generator as gen, verify
+
+
+def get_pre_change_digest(changes: list) -> str:
+    """Digest of the values a change set replaces
+
+    Args:
+        changes: Changed values with current and desired keys
+
+    Returns:
+        Hex digest of the current values of the changed properties
+    """
+    current = {chg.get("property"): chg.get("current") for chg in changes}
+    data = json.dumps(current, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+class ApplyJournal:
+    """Append-only journal of executed statements
+
+    Every statement is written as one JSON line and synced to disk before
+    the next statement is started, so an interrupted run can be resumed
+    without executing a statement twice.
+    """
+
+    def __init__(self, filename: str):
+        self._filename = filename
+
+    @property
+    def filename(self) -> str:
+        """ Journal file name """
+        return self._filename
+
+    def load(self) -> List[dict]:
+        """Read all journal entries
+
+        Returns:
+            List of entries, empty if the journal does not exist
+        """
+        if not os.path.exists(self._filename):
+            return []
+
+        entries = []
+        with open(self._filename, "r", encoding="utf-8") as journal_file:
+            for line in journal_file:
+                line = line.strip()
+                if line:
+                    entries.append(json.loads(line))
+        return entries
+
+    def applied_keys(self) -> Set[str]:
+        """Keyspaces and tables with an applied statement
+
+        Returns:
+            Set of drift keys ("<keyspace>" or "<keyspace>.<table>")
+        """
+        return {
+            drift.get_drift_key(entry["keyspace"], entry.get("table"))
+            for entry in self.load()
+        }
+
+    def record(
+        self, keyspace_name: str, table_name: Optional[str], stmt: str, changes: list
+    ) -> None:
+        """Append an executed statement
+
+        Args:
+            keyspace_name: Keyspace name
+            table_name:    Table name or None for keyspace statements
+            stmt:          Executed CQL statement
+            changes:       Changed values of the statement
+        """
+        entry = {
+            "keyspace": keyspace_name,
+            "table": table_name,
+            "statement": stmt,
+            "changes": changes,
+            "pre_change_digest": get_pre_change_digest(changes),
+            "applied_at": time.time(),
+        }
+        with open(self._filename, "a", encoding="utf-8") as journal_file:
+            journal_file.write(json.dumps(entry, default=str) + "\n")
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+
+
+def get_current_values(
+    current_config: Optional[Dict[str, Any]],
+    keyspace_name: str,
+    table_name: Optional[str],
+    ) -> Optional[Dict[str, Any]]:
+    """ Properties of a keyspace or table of a configuration or None """
+    for keyspace in current_config.get("keyspaces", []) if current_config else []:
+        if keyspace.get("name") != keyspace_name:
+            continue
+        if table_name is None:
+            return keyspace
+        for table in keyspace.get("tables", []):
+            if table.get("name") == table_name:
+                return table
+    return None
+
+
+def get_diverged_keys(conn: db.Db, entries: List[dict]) -> Set[str]:
+    """Find applied keyspaces and tables that no longer hold the applied values
+
+    The keyspaces and tables of the journal are read with targeted
+    system_schema queries. If the changed properties do not have their
+    desired values, the pre-change digest tells whether the statement did
+    not take effect or the keyspace or table was changed since the
+    statement was recorded. Either way it has to be planned again.
+
+    Args:
+        conn:    Database connection
+        entries: Journal entries. Entries of older journals without
+                 changes cannot be checked and are trusted.
+
+    Returns:
+        Set of drift keys that must not be skipped
+    """
+    # The last entry of a keyspace or table wins
+    latest = {
+        (entry["keyspace"], entry.get("table")): entry
+        for entry in entries
+        if entry.get("changes")
+    }
+    if not latest:
+        return set()
+
+    desired_config = verify.get_desired_config(
+        (ks_name, tbl_name, entry["changes"])
+        for (ks_name, tbl_name), entry in latest.items()
+    )
+    current_config = conn.get_matching_config(desired_config)
+
+    diverged = set()
+    for ks_name, tbl_name, _ in gen.iter_change_sets(
+        current_config if current_config else {"keyspaces": []}, desired_config
+    ):
+        entry = latest.get((ks_name, tbl_name))
+        if entry is None:
+            continue
+        key = drift.get_drift_key(ks_name, tbl_name)
+        current = get_current_values(current_config, ks_name, tbl_name) or {}
+        digest = get_pre_change_digest(
+            [
+                {"property": prop, "current": current.get(prop)}
+                for prop in (chg.get("property") for chg in entry["changes"])
+            ]
+        )
+        if digest == entry.get("pre_change_digest"):
+            logging.warning(
+                "The statement of %s did not take effect. Planning it again", key
+            )
+        else:
+            logging.warning(
+                "%s changed since its statement was recorded. Planning it again", key
+            )
+        diverged.add(key)
+
+    return diverged
+
+
+def filter_applied(config: dict, applied_keys: Set[str]) -> dict:
+    """Remove keyspace and table properties that were already applied
+
+    Args:
+        config:       Desired configuration
+        applied_keys: Drift keys of applied statements
+
+    Returns:
+        Copy of the configuration. Applied keyspaces keep only their name
+        and tables, applied tables are removed.
+    """
+    keyspaces = []
+    for keyspace in config.get("keyspaces", []) if config else []:
+        ks_name = keyspace.get("name")
+        if drift.get_drift_key(ks_name) in applied_keys:
+            filtered = {"name": ks_name}
+        else:
+            filtered = {key: val for key, val in keyspace.items() if key != "tables"}
+        filtered["tables"] = [
+            tbl
+            for tbl in keyspace.get("tables", [])
+            if drift.get_drift_key(ks_name, tbl.get("name")) not in applied_keys
+        ]
+        keyspaces.append(filtered)
+
+    return dict(config, keyspaces=keyspaces) if config else {"keyspaces": []}
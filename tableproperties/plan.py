@@ -0,0 +1,308 @@
+""" Change plan merging keyspace and table changes
+"""
+from collections import OrderedDict
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from tableproperties import drift, generator as gen
+
+ChangeSet = Tuple[str, Optional[str], list]
+SizeEstimates = Dict[Tuple[str, str], int]
+
+# Properties that only reach existing SSTables when every node rewrites them
+PER_SSTABLE_REWRITE_PROPERTIES = ("compression", "bloom_filter_fp_chance")
+# Properties whose change makes every node rewrite the SSTables of a table
+REWRITE_PROPERTIES = ("compaction",) + PER_SSTABLE_REWRITE_PROPERTIES
+
+
+def get_rewrite_properties(changes: list) -> List[str]:
+    """Find the changes that rewrite SSTables
+
+    Args:
+        changes: Changed values as returned by the generator
+
+    Returns:
+        Names of the changed properties in REWRITE_PROPERTIES
+    """
+    return [
+        chg.get("property")
+        for chg in changes
+        if chg.get("property") in REWRITE_PROPERTIES
+    ]
+
+
+def iter_desired_properties(
+    desired_config: dict
+    ) -> Iterator[Tuple[str, Optional[str], List[str]]]:
+    """List the properties a configuration sets
+
+    Table ids and table properties without a desired value are skipped like
+    in generator.get_table_changes.
+
+    Args:
+        desired_config: Desired properties
+
+    Returns:
+        Iterator of (keyspace name, table name, property names) tuples. The
+        table name is None for keyspace properties.
+    """
+    for keyspace in desired_config.get("keyspaces") or []:
+        yield (
+            keyspace.get("name"),
+            None,
+            [key for key in keyspace if key not in ("name", "tables")],
+        )
+        for table in keyspace.get("tables") or []:
+            yield (
+                keyspace.get("name"),
+                table.get("name"),
+                [key for key, val in table.items() if val and key not in ("name", "id")],
+            )
+
+
+class ChangePlan:
+    """Merged keyspace and table changes
+
+    Changes can be added from any number of comparisons. Every property of
+    a keyspace or table is changed at most once and all changes of a
+    keyspace or table are applied with a single ALTER statement. Keyspace
+    statements are ordered before table statements.
+
+    With size estimates, tables whose SSTables are rewritten by a change of
+    REWRITE_PROPERTIES are moved after the other tables and ordered
+    from the smallest to the largest, so small tables converge first and
+    huge tables are not rewritten at the same time. Tables without a size
+    estimate, e.g. tables that were never flushed or created after the last
+    update of system.size_estimates, may be of any size and are ordered
+    after all tables of known size.
+    """
+
+    def __init__(self):
+        # (keyspace name, table name) -> property name -> change
+        self._changes = (
+            OrderedDict()
+        )  # type: Dict[Tuple[str, Optional[str]], Dict[str, dict]]
+        # (keyspace name, table name) -> properties desired at their current value
+        self._kept = {}  # type: Dict[Tuple[str, Optional[str]], Set[str]]
+        self._added = 0
+        self._sizes = None  # type: Optional[SizeEstimates]
+
+    def __len__(self) -> int:
+        return len(self._changes)
+
+    def __iter__(self) -> Iterator[ChangeSet]:
+        return self.iter_change_sets()
+
+    def add(
+        self,
+        keyspace_name: str,
+        table_name: Optional[str],
+        changes: list,
+        unchanged: Iterable[str] = (),
+        ) -> None:
+        """Add the changes of a keyspace or table
+
+        Changes whose desired value equals the current one are dropped but
+        still take part in conflict detection like the unchanged properties.
+        If a property is desired again with another value, the later desired
+        value wins, also if it is the current value.
+
+        Args:
+            keyspace_name: Keyspace name
+            table_name:    Table name or None for keyspace changes
+            changes:       Changed values as returned by the generator
+            unchanged:     Names of properties that are desired at their
+                           current value
+        """
+        key = (keyspace_name, table_name)
+        merged = self._changes.get(key, OrderedDict())
+        kept = self._kept.get(key, set())
+        drift_key = drift.get_drift_key(keyspace_name, table_name)
+
+        def keep(prop: str) -> None:
+            previous = merged.pop(prop, None)
+            if previous:
+                logging.warning(
+                    "Conflicting changes of '%s' for %s. Keeping the current "
+                    "value instead of %r",
+                    prop,
+                    drift_key,
+                    previous.get("desired"),
+                )
+            kept.add(prop)
+
+        for chg in changes:
+            self._added += 1
+            prop = chg.get("property")
+            if "current" in chg and chg.get("current") == chg.get("desired"):
+                keep(prop)
+                continue
+            if prop in kept:
+                logging.warning(
+                    "Conflicting changes of '%s' for %s. Using %r instead of "
+                    "the current value",
+                    prop,
+                    drift_key,
+                    chg.get("desired"),
+                )
+                kept.discard(prop)
+            previous = merged.get(prop)
+            if previous and previous.get("desired") != chg.get("desired"):
+                logging.warning(
+                    "Conflicting changes of '%s' for %s. Using %r instead of %r",
+                    prop,
+                    drift_key,
+                    chg.get("desired"),
+                    previous.get("desired"),
+                )
+            merged[prop] = chg
+
+        for prop in unchanged:
+            keep(prop)
+
+        if merged:
+            self._changes[key] = merged
+        else:
+            self._changes.pop(key, None)
+        if kept:
+            self._kept[key] = kept
+
+    def add_change_sets(self, change_sets: Iterable[ChangeSet]) -> None:
+        """Add (keyspace name, table name, changes) tuples
+
+        Args:
+            change_sets: Change sets as returned by generator.iter_change_sets
+        """
+        for keyspace_name, table_name, changes in change_sets:
+            self.add(keyspace_name, table_name, changes)
+
+    def add_config(
+        self, current_config: dict, desired_config: dict, workers: Optional[int] = None
+        ) -> None:
+        """Add the changes of a desired configuration
+
+        Unlike add_change_sets, the properties the configuration sets to
+        their current value are recorded too, so a configuration that keeps
+        a value conflicts with another one that changes it.
+
+        Args:
+            current_config: Current properties
+            desired_config: Desired properties
+            workers:        Number of worker processes of the generator
+        """
+        change_sets = OrderedDict(
+            ((ks_name, tbl_name), changes)
+            for ks_name, tbl_name, changes in gen.iter_change_sets(
+                current_config, desired_config, workers
+            )
+        )
+        for ks_name, tbl_name, props in iter_desired_properties(desired_config):
+            changes = change_sets.pop((ks_name, tbl_name), [])
+            changed = {chg.get("property") for chg in changes}
+            self.add(
+                ks_name,
+                tbl_name,
+                changes,
+                [prop for prop in props if prop not in changed],
+            )
+
+    def set_size_estimates(self, sizes: SizeEstimates) -> None:
+        """Order rewriting table changes by estimated table size
+
+        Args:
+            sizes: (keyspace name, table name) to estimated bytes per node
+                   as returned by Db.get_size_estimates
+        """
+        self._sizes = sizes
+
+    def get_size(self, keyspace_name: str, table_name: str) -> Optional[int]:
+        """Estimated bytes per node of a table
+
+        Returns:
+            Size or None without size estimates or for unknown tables
+        """
+        if self._sizes is None:
+            return None
+        return self._sizes.get((keyspace_name, table_name))
+
+    def iter_change_sets(self) -> Iterator[ChangeSet]:
+        """Merged changes in dependency order
+
+        Returns:
+            Iterator of (keyspace name, table name, changes) tuples with all
+            keyspace changes before table changes. With size estimates,
+            rewriting table changes come last, smallest table first and
+            tables of unknown size at the end.
+        """
+        rewrites = []  # type: List[Tuple[Tuple[bool, int, int], ChangeSet]]
+        for is_table_pass in (False, True):
+            for (ks_name, tbl_name), changes in self._changes.items():
+                if (tbl_name is not None) != is_table_pass:
+                    continue
+                change_set = (ks_name, tbl_name, list(changes.values()))
+                if (
+                    self._sizes is not None
+                    and tbl_name is not None
+                    and get_rewrite_properties(change_set[2])
+                ):
+                    size = self.get_size(ks_name, tbl_name)
+                    rewrites.append(
+                        ((size is None, size or 0, len(rewrites)), change_set)
+                    )
+                    continue
+                yield change_set
+
+        for _, change_set in sorted(rewrites, key=lambda item: item[0]):
+            yield change_set
+
+    def rewrites(self) -> List[Dict[str, Any]]:
+        """Table changes that rewrite SSTables in execution order
+
+        Returns:
+            List of dictionaries with keyspace, table, properties (changed
+            properties in REWRITE_PROPERTIES) and estimated_bytes (None if
+            unknown) keys
+        """
+        return [
+            {
+                "keyspace": ks_name,
+                "table": tbl_name,
+                "properties": get_rewrite_properties(changes),
+                "estimated_bytes": self.get_size(ks_name, tbl_name),
+            }
+            for ks_name, tbl_name, changes in self.iter_change_sets()
+            if tbl_name is not None and get_rewrite_properties(changes)
+        ]
+
+    def statements(self) -> List[Tuple[str, Optional[str], str]]:
+        """ALTER statements of the plan
+
+        Returns:
+            List of (keyspace name, table name, CQL statement) tuples
+        """
+        return [
+            (ks_name, tbl_name, gen.format_alter_statement(ks_name, tbl_name, changes))
+            for ks_name, tbl_name, changes in self.iter_change_sets()
+        ]
+
+    def estimate_cost(self) -> Dict[str, Any]:
+        """Estimate the cost of applying the plan
+
+        Every ALTER statement is a schema migration that is propagated to
+        all nodes of the cluster.
+
+        Returns:
+            Dictionary with the number of statements (schema migrations),
+            keyspace and table statements, property changes and the number
+            of changes that were merged or dropped while planning
+        """
+        keyspace_statements = sum(1 for _, tbl_name in self._changes if tbl_name is None)
+        properties = sum(len(changes) for changes in self._changes.values())
+
+        return {
+            "statements": len(self._changes),
+            "keyspace_statements": keyspace_statements,
+            "table_statements": len(self._changes) - keyspace_statements,
+            "properties": properties,
+            "merged_or_dropped": self._added - properties,
+        }
@@ -0,0 +1,147 @@
+""" Per phase profiling of a run
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+import cProfile
+import functools
+import io
+import os
+import pstats
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+# Functions listed per phase in the summary
+DEFAULT_TOP = 20
+SUMMARY_FILENAME = "summary.txt"
+
+
+class PhaseProfiler:
+    """Collect a separate cProfile profile per phase of a run
+
+    Phases may be entered any number of times; their profiles accumulate.
+    A phase entered while another one is active pauses the outer phase,
+    so every call is attributed to exactly one phase.
+    """
+
+    def __init__(self, directory: Optional[str], top: int = DEFAULT_TOP):
+        """Construct profiler
+
+        Args:
+            directory: Output directory. Profiling is disabled if None.
+            top:       Number of functions per phase in the summary
+        """
+        self.directory = directory
+        self._top = top
+        self._profiles = OrderedDict()  # type: Dict[str, cProfile.Profile]
+        self._wall_times = {}  # type: Dict[str, float]
+        self._calls = {}  # type: Dict[str, int]
+        # (phase name, start time) of active phases
+        self._active = []  # type: List[List[Any]]
+
+    @property
+    def enabled(self) -> bool:
+        """ Is profiling enabled """
+        return self.directory is not None
+
+    def _pause_active(self) -> None:
+        if self._active:
+            name, start = self._active[-1]
+            self._profiles[name].disable()
+            self._wall_times[name] += time.perf_counter() - start
+
+    def _resume_active(self) -> None:
+        if self._active:
+            self._active[-1][1] = time.perf_counter()
+            self._profiles[self._active[-1][0]].enable()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Profile the enclosed code as part of a phase
+
+        Args:
+            name: Phase name
+        """
+        if not self.enabled:
+            yield
+            return
+
+        self._pause_active()
+        profile = self._profiles.setdefault(name, cProfile.Profile())
+        self._wall_times.setdefault(name, 0.0)
+        self._calls[name] = self._calls.get(name, 0) + 1
+        self._active.append([name, time.perf_counter()])
+        profile.enable()
+        try:
+            yield
+        finally:
+            self._pause_active()
+            self._active.pop()
+            self._resume_active()
+
+    def instrument(self, obj: Any, phases: Dict[str, str]) -> None:
+        """Profile methods of an object as phases
+
+        Args:
+            obj:    Object whose methods are replaced on the instance
+            phases: Method name to phase name
+        """
+        if not self.enabled:
+            return
+
+        for method_name, phase_name in phases.items():
+            setattr(obj, method_name, self._wrap(getattr(obj, method_name), phase_name))
+
+    def _wrap(self, method, phase_name: str):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            with self.phase(phase_name):
+                return method(*args, **kwargs)
+
+        return wrapper
+
+    def get_summary(self) -> str:
+        """Render the wall time and top functions of every phase
+
+        Returns:
+            Summary text
+        """
+        lines = ["{:<24} {:>6} {:>10}".format("phase", "calls", "wall [s]")]
+        for name in self._profiles:
+            lines.append(
+                "{:<24} {:>6} {:>10.3f}".format(
+                    name, self._calls[name], self._wall_times[name]
+                )
+            )
+
+        for name, profile in self._profiles.items():
+            stream = io.StringIO()
+            stats = pstats.Stats(profile, stream=stream)
+            stats.sort_stats("cumulative").print_stats(self._top)
+            lines.append("")
+            lines.append("=== {} ===".format(name))
+            lines.append(stream.getvalue().strip())
+
+        return "\n".join(lines) + "\n"
+
+    def write(self) -> List[str]:
+        """Write one pstats file per phase and the summary
+
+        Returns:
+            List of written file names
+        """
+        if not self.enabled:
+            return []
+
+        os.makedirs(self.directory, exist_ok=True)
+        filenames = []
+        for name, profile in self._profiles.items():
+            filename = os.path.join(self.directory, "{}.pstats".format(name))
+            profile.dump_stats(filename)
+            filenames.append(filename)
+
+        filename = os.path.join(self.directory, SUMMARY_FILENAME)
+        with open(filename, "w", encoding="utf-8") as summary_file:
+            summary_file.write(self.get_summary())
+        filenames.append(filename)
+
+        return filenames
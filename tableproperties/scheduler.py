@@ -0,0 +1,230 @@
+""" Throttled execution of schema changes
+"""
+import logging
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from tableproperties import db, drift
+
+# Statements per second
+DEFAULT_RATE = 1.0
+# Seconds to wait for all nodes to agree on a schema version
+DEFAULT_AGREEMENT_TIMEOUT = 60.0
+# Seconds between schema agreement checks
+AGREEMENT_POLL_INTERVAL = 0.2
+# Agreement taking longer than this (in seconds) slows down execution
+SLOW_AGREEMENT = 1.0
+# Upper limit for the extra delay between statements in seconds
+MAX_BACKOFF = 60.0
+
+Statement = Tuple[str, Optional[str], str]
+ProgressCallback = Callable[[int, int, Statement, float], None]
+ExecutedCallback = Callable[[Statement], None]
+
+
+class SchemaAgreementError(Exception):
+    """ Nodes did not agree on a schema version in time """
+
+
+class TokenBucket:
+    """Token bucket rate limiter
+
+    Tokens are refilled at rate per second up to capacity. Acquiring a
+    token blocks until one is available.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(
+            self._capacity, self._tokens + (now - self._last) * self._rate
+        )
+        self._last = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens from the bucket, waiting for them if necessary
+
+        Args:
+            tokens: Number of tokens
+
+        Returns:
+            Seconds waited
+        """
+        waited = 0.0
+        self._refill()
+        while self._tokens < tokens:
+            delay = (tokens - self._tokens) / self._rate
+            self._sleep(delay)
+            waited += delay
+            self._refill()
+        self._tokens -= tokens
+        return waited
+
+
+def log_progress(done: int, total: int, stmt: Statement, agreement_time: float) -> None:
+    """ Default progress callback """
+    logging.info(
+        "Applied %d/%d (%s), schema agreement after %.2fs",
+        done,
+        total,
+        drift.get_drift_key(stmt[0], stmt[1]),
+        agreement_time,
+    )
+
+
+class ApplyScheduler:
+    """Execute schema changes one at a time without flooding the cluster
+
+    Statements are started at no more than the configured rate. After
+    each statement the scheduler waits until all nodes agree on the schema
+    version. If agreement is slow, the delay between statements grows and
+    shrinks back once the cluster keeps up again. With a rewrite rate, a
+    statement rewriting the SSTables of a table delays the next rewriting
+    statement until the previous rewrite is expected to be done.
+    """
+
+    def __init__(
+        self,
+        conn: db.Db,
+        rate: float = DEFAULT_RATE,
+        agreement_timeout: float = DEFAULT_AGREEMENT_TIMEOUT,
+        progress: ProgressCallback = log_progress,
+        sleep: Callable[[float], None] = time.sleep,
+        executed: Optional[ExecutedCallback] = None,
+        rewrite_rate: Optional[float] = None,
+        rewrite_sizes: Optional[Dict[Tuple[str, Optional[str]], int]] = None,
+    ):
+        """Construct scheduler
+
+        Args:
+            conn:              Database connection
+            rate:              Statements per second
+            agreement_timeout: Seconds to wait for schema agreement
+            progress:          Called with (done, total, statement, agreement
+                               time) after each statement
+            sleep:             Sleep function
+            executed:          Called with each statement as soon as it was
+                               executed, before waiting for agreement
+            rewrite_rate:      Bytes per second a node rewrites. Default: no
+                               delay between rewriting statements
+            rewrite_sizes:     (keyspace name, table name) to estimated bytes
+                               of the statements that rewrite SSTables
+        """
+        if rewrite_rate is not None and rewrite_rate <= 0:
+            raise ValueError("Rewrite rate must be positive")
+        self._conn = conn
+        self._bucket = TokenBucket(rate, sleep=sleep)
+        self._agreement_timeout = agreement_timeout
+        self._progress = progress
+        self._sleep = sleep
+        self._executed = executed
+        self._rewrite_rate = rewrite_rate
+        self._rewrite_sizes = rewrite_sizes or {}
+        self.backoff = 0.0
+        # Monotonic time the last rewrite is expected to be done
+        self.rewrite_done_at = 0.0
+
+    def wait_for_schema_agreement(self) -> float:
+        """Wait until all nodes report the same schema version
+
+        Returns:
+            Seconds waited
+
+        Raises:
+            SchemaAgreementError if there is no agreement within the timeout
+        """
+        start = time.monotonic()
+        while True:
+            versions = self._conn.get_schema_versions()
+            elapsed = time.monotonic() - start
+            if len(versions) <= 1:
+                return elapsed
+            if elapsed >= self._agreement_timeout:
+                raise SchemaAgreementError(
+                    "No schema agreement after {:.1f}s: {}".format(
+                        elapsed, ", ".join(sorted(versions))
+                    )
+                )
+            self._sleep(AGREEMENT_POLL_INTERVAL)
+
+    def adapt_backoff(self, agreement_time: float) -> None:
+        """Adjust the extra delay between statements
+
+        Args:
+            agreement_time: Seconds the last schema agreement took
+        """
+        if agreement_time > SLOW_AGREEMENT:
+            self.backoff = min(MAX_BACKOFF, max(self.backoff * 2, agreement_time))
+        else:
+            self.backoff = self.backoff / 2 if self.backoff > 0.1 else 0.0
+
+    def wait_for_rewrite(self, stmt: Statement) -> None:
+        """Delay a rewriting statement until the previous rewrite is done
+
+        Args:
+            stmt: Statement to execute next
+        """
+        if self._rewrite_rate is None or (stmt[0], stmt[1]) not in self._rewrite_sizes:
+            return
+        delay = self.rewrite_done_at - time.monotonic()
+        if delay > 0:
+            logging.info(
+                "Waiting %.1fs for the rewrite of the previous table", delay
+            )
+            self._sleep(delay)
+        self.rewrite_done_at = (
+            time.monotonic()
+            + self._rewrite_sizes[(stmt[0], stmt[1])] / self._rewrite_rate
+        )
+
+    def apply(self, statements: Iterable[Statement]) -> List[Statement]:
+        """Execute statements
+
+        Args:
+            statements: (keyspace name, table name, CQL statement) tuples
+
+        Returns:
+            List of executed statements
+
+        Raises:
+            SchemaAgreementError if the cluster does not settle after a
+            statement. Remaining statements are not executed.
+        """
+        statements = list(statements)
+        applied = []  # type: List[Statement]
+
+        # Start from a settled cluster
+        self.wait_for_schema_agreement()
+
+        for stmt in statements:
+            self._bucket.acquire()
+            if self.backoff:
+                logging.info("Schema agreement is slow. Waiting %.1fs", self.backoff)
+                self._sleep(self.backoff)
+            self.wait_for_rewrite(stmt)
+
+            self._conn.execute_statement(stmt[2])
+            applied.append(stmt)
+            if self._executed:
+                self._executed(stmt)
+
+            agreement_time = self.wait_for_schema_agreement()
+            self.adapt_backoff(agreement_time)
+            self._progress(len(applied), len(statements), stmt, agreement_time)
+
+        return applied
@@ -0,0 +1,391 @@
+""" Content-addressed history of schema snapshots
+
+Keyspace and table properties are stored once per distinct content as
+blobs named by their hash. A snapshot is a small manifest mapping every
+keyspace and table of a cluster to the hashes of its properties, so
+unchanged tables of daily snapshots cost no space and two snapshots are
+compared by their hashes, loading only the blobs that differ.
+
+Layout of a store directory:
+
+    objects/<first 2 hex digits>/<remaining hex digits>
+    snapshots/<cluster>/<snapshot id>.json
+"""
+from datetime import datetime, timezone
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+SNAPSHOT_VERSION = 1
+OBJECTS_DIR = "objects"
+SNAPSHOTS_DIR = "snapshots"
+LATEST = "latest"
+
+CHANGE_ADDED = "added"
+CHANGE_REMOVED = "removed"
+CHANGE_CHANGED = "changed"
+
+
+class SnapshotError(Exception):
+    """ Unknown or unreadable snapshot """
+
+
+def check_name(name: str) -> None:
+    """Check that a cluster name or snapshot id is a single path component
+
+    Args:
+        name: Cluster name or snapshot id
+
+    Raises:
+        SnapshotError if the name is empty, contains a path separator or
+        is a relative directory reference
+    """
+    separators = {"/", os.sep} | ({os.altsep} if os.altsep else set())
+    if (
+        not name
+        or name in (os.curdir, os.pardir)
+        or ".." in name
+        or any(sep in name for sep in separators)
+    ):
+        raise SnapshotError(
+            "Invalid name '{}'. Path separators and '..' are not allowed".format(name)
+        )
+
+
+def get_blob(props: Dict[str, Any]) -> bytes:
+    """Serialise properties canonically
+
+    Args:
+        props: Keyspace or table properties
+
+    Returns:
+        JSON with sorted keys and no whitespace
+    """
+    return json.dumps(
+        props, sort_keys=True, separators=(",", ":"), default=str
+    ).encode("utf-8")
+
+
+def get_blob_digest(blob: bytes) -> str:
+    """ Hex digest naming a blob """
+    return hashlib.sha1(blob).hexdigest()
+
+
+def make_manifest(
+    config: Dict[str, Any], cluster: str, created_at: float
+    ) -> Tuple[Dict[str, Any], Dict[str, bytes]]:
+    """Split a configuration into a manifest and property blobs
+
+    Args:
+        config:     Configuration as returned by get_current_config
+        cluster:    Cluster name
+        created_at: UNIX time of the snapshot
+
+    Returns:
+        Tuple of (manifest, dictionary of digest to blob)
+    """
+    blobs = {}  # type: Dict[str, bytes]
+
+    def add_blob(props: Dict[str, Any]) -> str:
+        blob = get_blob({key: val for key, val in props.items() if key != "name"})
+        digest = get_blob_digest(blob)
+        blobs[digest] = blob
+        return digest
+
+    keyspaces = {}
+    for keyspace in config.get("keyspaces", []) if config else []:
+        keyspaces[keyspace["name"]] = {
+            "properties": add_blob(
+                {key: val for key, val in keyspace.items() if key != "tables"}
+            ),
+            "tables": {
+                table["name"]: add_blob(table) for table in keyspace.get("tables", [])
+            },
+        }
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "cluster": cluster,
+        "created_at": created_at,
+        "keyspaces": keyspaces,
+    }
+    return manifest, blobs
+
+
+def iter_property_changes(
+    old_props: Dict[str, Any], new_props: Dict[str, Any]
+    ) -> Iterator[Tuple[str, Any, Any]]:
+    """Compare two property dictionaries
+
+    Args:
+        old_props: Properties of the older snapshot
+        new_props: Properties of the newer snapshot
+
+    Returns:
+        Iterator of (property, old value, new value) of differing properties
+    """
+    for key in sorted(set(old_props) | set(new_props)):
+        if old_props.get(key) != new_props.get(key):
+            yield key, old_props.get(key), new_props.get(key)
+
+
+def write_file(filename: str, data: bytes) -> None:
+    """ Write a file atomically """
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "wb") as out_file:
+        out_file.write(data)
+    os.replace(tmp_filename, filename)
+
+
+class SnapshotStore:
+    """ Directory of deduplicated schema snapshots of any number of clusters """
+
+    def __init__(self, directory: str):
+        """Construct store
+
+        Args:
+            directory: Store directory, created on the first save
+        """
+        self.directory = directory
+
+    def get_blob_filename(self, digest: str) -> str:
+        """ File name of a blob """
+        return os.path.join(self.directory, OBJECTS_DIR, digest[:2], digest[2:])
+
+    def get_manifest_filename(self, cluster: str, snapshot_id: str) -> str:
+        """ File name of a manifest """
+        return os.path.join(
+            self.directory, SNAPSHOTS_DIR, cluster, snapshot_id + ".json"
+        )
+
+    def reserve_snapshot_id(self, cluster: str, timestamp: str) -> str:
+        """Claim an unused snapshot id
+
+        The manifest file is created exclusively, so snapshots taken in the
+        same microsecond get the ids "<timestamp>-1", "<timestamp>-2" and so
+        on instead of overwriting each other.
+
+        Args:
+            cluster:   Cluster name
+            timestamp: Formatted time of the snapshot
+
+        Returns:
+            Snapshot id whose (empty) manifest file now exists
+        """
+        directory = os.path.join(self.directory, SNAPSHOTS_DIR, cluster)
+        os.makedirs(directory, exist_ok=True)
+        snapshot_id = timestamp
+        attempt = 0
+        while True:
+            try:
+                with open(self.get_manifest_filename(cluster, snapshot_id), "x"):
+                    return snapshot_id
+            except FileExistsError:
+                attempt += 1
+                snapshot_id = "{}-{}".format(timestamp, attempt)
+
+    def save(
+        self, cluster: str, config: Dict[str, Any], created_at: float = None
+        ) -> str:
+        """Store a snapshot of a cluster
+
+        Only blobs that are not in the store yet are written.
+
+        Args:
+            cluster:    Cluster name
+            config:     Configuration as returned by get_current_config
+            created_at: UNIX time of the snapshot. Default: now
+
+        Returns:
+            Snapshot reference "<cluster>/<snapshot id>"
+
+        Raises:
+            SnapshotError if the cluster name is not a valid directory name
+        """
+        check_name(cluster)
+        created_at = time.time() if created_at is None else created_at
+        manifest, blobs = make_manifest(config, cluster, created_at)
+
+        for digest, blob in blobs.items():
+            filename = self.get_blob_filename(digest)
+            if not os.path.exists(filename):
+                os.makedirs(os.path.dirname(filename), exist_ok=True)
+                write_file(filename, blob)
+
+        snapshot_id = self.reserve_snapshot_id(
+            cluster,
+            datetime.fromtimestamp(created_at, timezone.utc).strftime(
+                "%Y%m%dT%H%M%S.%fZ"
+            ),
+        )
+        write_file(
+            self.get_manifest_filename(cluster, snapshot_id),
+            json.dumps(manifest, sort_keys=True).encode("utf-8"),
+        )
+
+        return "{}/{}".format(cluster, snapshot_id)
+
+    def list_snapshots(self, cluster: str) -> List[str]:
+        """List the snapshot ids of a cluster
+
+        Args:
+            cluster: Cluster name
+
+        Returns:
+            Snapshot ids from the oldest to the newest
+        """
+        check_name(cluster)
+        directory = os.path.join(self.directory, SNAPSHOTS_DIR, cluster)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            os.path.splitext(name)[0]
+            for name in os.listdir(directory)
+            if name.endswith(".json")
+        )
+
+    def resolve(self, ref: str) -> Tuple[str, str]:
+        """Resolve a snapshot reference
+
+        Args:
+            ref: "<cluster>/<snapshot id>", "<cluster>/latest" or
+                 "<cluster>/latest~<n>" for the n-th snapshot before the
+                 latest one
+
+        Returns:
+            Tuple of (cluster, snapshot id)
+
+        Raises:
+            SnapshotError if the reference is invalid or the snapshot does
+            not exist
+        """
+        cluster, _, snapshot_id = ref.partition("/")
+        if not cluster:
+            raise SnapshotError("Snapshot reference '{}' lacks a cluster".format(ref))
+        check_name(cluster)
+        check_name(snapshot_id)
+
+        if snapshot_id.startswith(LATEST):
+            back = snapshot_id[len(LATEST) + 1 :] if snapshot_id != LATEST else "0"
+            snapshot_ids = self.list_snapshots(cluster)
+            if not back.isdigit() or int(back) >= len(snapshot_ids):
+                raise SnapshotError("Snapshot '{}' not found".format(ref))
+            snapshot_id = snapshot_ids[-1 - int(back)]
+
+        if not os.path.exists(self.get_manifest_filename(cluster, snapshot_id)):
+            raise SnapshotError("Snapshot '{}' not found".format(ref))
+        return cluster, snapshot_id
+
+    def load_manifest(self, ref: str) -> Dict[str, Any]:
+        """Read a manifest
+
+        Args:
+            ref: Snapshot reference, see resolve()
+
+        Returns:
+            Manifest
+        """
+        filename = self.get_manifest_filename(*self.resolve(ref))
+        with open(filename, "r", encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest.get("version") != SNAPSHOT_VERSION:
+            raise SnapshotError("Snapshot '{}' has another version".format(ref))
+        return manifest
+
+    def load_blob(self, digest: str) -> Dict[str, Any]:
+        """ Read the properties of a blob """
+        with open(self.get_blob_filename(digest), "rb") as blob_file:
+            return json.loads(blob_file.read().decode("utf-8"))
+
+    def load_config(self, ref: str) -> Dict[str, Any]:
+        """Rebuild the configuration of a snapshot
+
+        Args:
+            ref: Snapshot reference, see resolve()
+
+        Returns:
+            Configuration in the get_current_config layout
+        """
+        keyspaces = []
+        for ks_name, ks_entry in self.load_manifest(ref)["keyspaces"].items():
+            keyspace = {"name": ks_name}
+            keyspace.update(self.load_blob(ks_entry["properties"]))
+            keyspace["tables"] = []
+            for tbl_name, digest in ks_entry["tables"].items():
+                table = {"name": tbl_name}
+                table.update(self.load_blob(digest))
+                keyspace["tables"].append(table)
+            keyspaces.append(keyspace)
+        return {"keyspaces": keyspaces}
+
+    def diff(self, old_ref: str, new_ref: str) -> List[Dict[str, Any]]:
+        """Compare two snapshots
+
+        Only blobs of keyspaces and tables whose hashes differ are read.
+
+        Args:
+            old_ref: Reference of the older snapshot
+            new_ref: Reference of the newer snapshot
+
+        Returns:
+            List of records with keyspace, table (None for keyspace
+            properties) and change keys. Changed records also have
+            property, old and new keys.
+        """
+        old_keyspaces = self.load_manifest(old_ref)["keyspaces"]
+        new_keyspaces = self.load_manifest(new_ref)["keyspaces"]
+        records = []  # type: List[Dict[str, Any]]
+
+        def compare(
+            ks_name: str,
+            tbl_name: Optional[str],
+            old: Optional[str],
+            new: Optional[str],
+            ) -> None:
+            if old == new:
+                return
+            if old is None or new is None:
+                records.append(
+                    {
+                        "keyspace": ks_name,
+                        "table": tbl_name,
+                        "change": CHANGE_ADDED if old is None else CHANGE_REMOVED,
+                    }
+                )
+                return
+            for prop, old_val, new_val in iter_property_changes(
+                self.load_blob(old), self.load_blob(new)
+            ):
+                records.append(
+                    {
+                        "keyspace": ks_name,
+                        "table": tbl_name,
+                        "change": CHANGE_CHANGED,
+                        "property": prop,
+                        "old": old_val,
+                        "new": new_val,
+                    }
+                )
+
+        for ks_name in sorted(set(old_keyspaces) | set(new_keyspaces)):
+            old_ks = old_keyspaces.get(ks_name)
+            new_ks = new_keyspaces.get(ks_name)
+            compare(
+                ks_name,
+                None,
+                old_ks["properties"] if old_ks else None,
+                new_ks["properties"] if new_ks else None,
+            )
+            if not old_ks or not new_ks:
+                continue
+            for tbl_name in sorted(set(old_ks["tables"]) | set(new_ks["tables"])):
+                compare(
+                    ks_name,
+                    tbl_name,
+                    old_ks["tables"].get(tbl_name),
+                    new_ks["tables"].get(tbl_name),
+                )
+
+        return records
@@ -3,6 +3,7 @@ import pytest
 import yaml
 
 from tableproperties.db import AbstractDb, ConnectionParams
+from tableproperties.tests.mockcassandra import MockCassandraServer, MockSchema
 
 # pylint: disable=invalid-name
 
@@ -42,3 +43,32 @@ def default_database():
     Returns mock configuration data to run tests.
     """
     return MockDb()
+
+
+@pytest.fixture()
+def reference_cassandra():
+    """Start a second mock Cassandra node with changed table comments
+
+    Returns the running MockCassandraServer.
+    """
+    with open("./tableproperties/tests/mocks/excalibur.yaml", "r") as f:
+        config = yaml.safe_load(f)
+    for table in config["keyspaces"][0]["tables"]:
+        table["comment"] = "Reference comment"
+        table["id"] = "00000000-0000-0000-0000-000000000000"
+
+    with MockCassandraServer(MockSchema.from_config(config)) as server:
+        yield server
+
+
+@pytest.fixture()
+def mock_cassandra():
+    """Start a local mock Cassandra node serving the mock configuration
+
+    Returns the running MockCassandraServer.
+    """
+    with open("./tableproperties/tests/mocks/excalibur.yaml", "r") as f:
+        schema = MockSchema.from_config(yaml.safe_load(f))
+
+    with MockCassandraServer(schema) as server:
+        yield server
@@ -0,0 +1,197 @@
+""" Memory benchmark of the dump and diff paths on synthetic schemas
+
+The mock server runs in a separate process, so only allocations of the
+client side are traced. Every stage reports its peak traced memory, the
+allocation hotspots of the memory it retains and the peak RSS of the
+process. Stages exceeding their threshold fail the run.
+"""
+import argparse
+from contextlib import contextmanager
+import copy
+import os
+import subprocess
+import sys
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import yaml
+
+from tableproperties import db, generator as gen
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore
+
+# Peak traced bytes per synthetic table allowed per stage, about twice
+# the measured values (6.5 KiB, 16 KiB and 0.5 KiB per table)
+THRESHOLDS = {
+    "get_current_config": 16 * 1024,
+    "yaml.dump": 32 * 1024,
+    "generate_alter_statements": 2 * 1024,
+}
+TOP_ALLOCATIONS = 5
+# Directory containing the tableproperties package
+SOURCE_ROOT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+)
+
+
+def get_peak_rss() -> int:
+    """Peak resident set size of the process
+
+    Returns:
+        Bytes or 0 if unknown
+    """
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+@contextmanager
+def mock_server_process(keyspaces: int, tables: int) -> Iterator[Tuple[str, int]]:
+    """Run a synthetic mock server in a child process
+
+    Args:
+        keyspaces: Number of keyspaces
+        tables:    Tables per keyspace
+
+    Returns:
+        (host, port) of the server
+    """
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-u",
+            "-m",
+            "tableproperties.tests.mockcassandra",
+            "--port",
+            "0",
+            "--keyspaces",
+            str(keyspaces),
+            "--tables",
+            str(tables),
+        ],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        cwd=SOURCE_ROOT,
+    )
+    try:
+        line = proc.stdout.readline().strip()
+        if not line.startswith("Serving on "):
+            raise RuntimeError("Mock server did not start: {!r}".format(line))
+        host, _, port = line[len("Serving on ") :].rpartition(":")
+        yield host, int(port)
+    finally:
+        proc.terminate()
+        proc.wait()
+        proc.stdout.close()
+
+
+def measure(
+    name: str, func: Callable[[], Any], table_count: int
+    ) -> Tuple[Any, Dict[str, Any]]:
+    """Trace the allocations of a stage
+
+    Args:
+        name:        Stage name
+        func:        Stage function
+        table_count: Number of tables of the schema
+
+    Returns:
+        Tuple of (result of func, stage record)
+    """
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    hotspots = [
+        "{}:{} {} KiB".format(
+            stat.traceback[0].filename, stat.traceback[0].lineno, stat.size // 1024
+        )
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+    ]
+    per_table = peak // max(table_count, 1)
+    record = {
+        "stage": name,
+        "peak_bytes": peak,
+        "peak_bytes_per_table": per_table,
+        "threshold_per_table": THRESHOLDS.get(name),
+        "peak_rss_bytes": get_peak_rss(),
+        "hotspots": hotspots,
+        "ok": per_table <= THRESHOLDS.get(name, per_table),
+    }
+    return result, record
+
+
+def run_benchmark(keyspaces: int, tables: int) -> List[Dict[str, Any]]:
+    """Measure the dump and diff stages
+
+    Args:
+        keyspaces: Number of synthetic keyspaces
+        tables:    Tables per keyspace
+
+    Returns:
+        List of stage records
+    """
+    table_count = keyspaces * tables
+    records = []
+
+    with mock_server_process(keyspaces, tables) as (host, port):
+        with db.Db(db.ConnectionParams(host=host, port=port)) as conn:
+            conn.connect(warm_up=True)
+            current, record = measure(
+                "get_current_config", conn.get_current_config, table_count
+            )
+            records.append(record)
+
+    _, record = measure(
+        "yaml.dump",
+        lambda: yaml.dump(current, default_flow_style=False),
+        table_count,
+    )
+    records.append(record)
+
+    desired = copy.deepcopy(current)
+    for keyspace in desired["keyspaces"]:
+        for table in keyspace["tables"]:
+            table["comment"] = "changed"
+    _, record = measure(
+        "generate_alter_statements",
+        lambda: gen.generate_alter_statements(current, desired),
+        table_count,
+    )
+    records.append(record)
+
+    return records
+
+
+def main():
+    """ Run the benchmark and exit with 1 if a threshold is exceeded """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keyspaces", type=int, default=4, help="Synthetic keyspaces")
+    parser.add_argument("--tables", type=int, default=500, help="Tables per keyspace")
+    args = parser.parse_args()
+
+    records = run_benchmark(args.keyspaces, args.tables)
+    for record in records:
+        print(
+            "{stage:<28} peak {peak_bytes:>12,} B  {peak_bytes_per_table:>8,} B/table "
+            "(limit {threshold_per_table:,})  RSS {peak_rss_bytes:>12,} B  "
+            "{status}".format(status="OK" if record["ok"] else "FAIL", **record)
+        )
+        for hotspot in record["hotspots"]:
+            print("    " + hotspot)
+
+    if not all(record["ok"] for record in records):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
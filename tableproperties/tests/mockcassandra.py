@@ -0,0 +1,1054 @@
+# pylint: disable=too-many-instance-attributes, too-few-public-methods
+""" Local stand-in for a Cassandra node speaking the CQL native protocol
+
+Serves system.local, system.peers, system.size_estimates and synthetic
+system_schema keyspace and table rows of any size, so Db can be exercised end to end, including
+connection handling, prepared statements and paging, without a cluster.
+
+Run it standalone to point the CLI at it:
+
+    python -m tableproperties.tests.mockcassandra --tables 10000 --latency 0.002
+"""
+import argparse
+import ast
+import hashlib
+import re
+import socket
+import socketserver
+import struct
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+
+try:
+    from lz4 import block as lz4_block
+except ImportError:  # pragma: no cover
+    lz4_block = None
+try:
+    import snappy
+except ImportError:  # pragma: no cover
+    snappy = None
+
+DEFAULT_PORT = 9043
+
+
+def lz4_compress(body: bytes) -> bytes:
+    """ Uncompressed length in big endian, then the lz4 block """
+    return struct.pack(">i", len(body)) + lz4_block.compress(body, store_size=False)
+
+
+def lz4_decompress(body: bytes) -> bytes:
+    """ Inverse of lz4_compress """
+    return lz4_block.decompress(
+        body[4:], uncompressed_size=struct.unpack(">i", body[:4])[0]
+    )
+
+
+# Frame compression name to (compress, decompress) of the installed packages
+FRAME_COMPRESSIONS = {}  # type: Dict[str, Tuple[Any, Any]]
+if lz4_block is not None:
+    FRAME_COMPRESSIONS["lz4"] = (lz4_compress, lz4_decompress)
+if snappy is not None:  # pragma: no cover
+    FRAME_COMPRESSIONS["snappy"] = (snappy.compress, snappy.decompress)
+
+# Native protocol versions this server speaks
+SUPPORTED_VERSIONS = (3, 4)
+FLAG_COMPRESSION = 0x01
+
+# Frame opcodes
+OP_ERROR = 0x00
+OP_STARTUP = 0x01
+OP_READY = 0x02
+OP_OPTIONS = 0x05
+OP_SUPPORTED = 0x06
+OP_QUERY = 0x07
+OP_RESULT = 0x08
+OP_PREPARE = 0x09
+OP_EXECUTE = 0x0A
+OP_REGISTER = 0x0B
+
+# Result kinds
+RESULT_VOID = 0x0001
+RESULT_ROWS = 0x0002
+RESULT_PREPARED = 0x0004
+RESULT_SCHEMA_CHANGE = 0x0005
+
+# Error codes
+ERR_SERVER = 0x0000
+ERR_PROTOCOL = 0x000A
+ERR_SYNTAX = 0x2000
+ERR_INVALID = 0x2200
+
+# Query parameter flags
+FLAG_VALUES = 0x01
+FLAG_SKIP_METADATA = 0x02
+FLAG_PAGE_SIZE = 0x04
+FLAG_PAGING_STATE = 0x08
+FLAG_SERIAL_CONSISTENCY = 0x10
+FLAG_TIMESTAMP = 0x20
+
+# Rows metadata flags
+META_GLOBAL_TABLES_SPEC = 0x0001
+META_HAS_MORE_PAGES = 0x0002
+META_NO_METADATA = 0x0004
+
+# CQL type ids
+T_BIGINT = 0x0002
+T_BLOB = 0x0003
+T_BOOLEAN = 0x0004
+T_DOUBLE = 0x0007
+T_INT = 0x0009
+T_UUID = 0x000C
+T_TEXT = 0x000D
+T_INET = 0x0010
+T_LIST = 0x0020
+T_MAP = 0x0021
+T_SET = 0x0022
+
+TEXT = (T_TEXT,)
+TEXT_MAP = (T_MAP, TEXT, TEXT)
+TEXT_SET = (T_SET, TEXT)
+
+SYSTEM_TABLES = {
+    "system.local": [
+        ("key", TEXT),
+        ("bootstrapped", TEXT),
+        ("broadcast_address", (T_INET,)),
+        ("cluster_name", TEXT),
+        ("cql_version", TEXT),
+        ("data_center", TEXT),
+        ("host_id", (T_UUID,)),
+        ("listen_address", (T_INET,)),
+        ("native_protocol_version", TEXT),
+        ("partitioner", TEXT),
+        ("rack", TEXT),
+        ("release_version", TEXT),
+        ("rpc_address", (T_INET,)),
+        ("schema_version", (T_UUID,)),
+        ("tokens", TEXT_SET),
+    ],
+    "system.peers": [
+        ("peer", (T_INET,)),
+        ("data_center", TEXT),
+        ("host_id", (T_UUID,)),
+        ("preferred_ip", (T_INET,)),
+        ("rack", TEXT),
+        ("release_version", TEXT),
+        ("rpc_address", (T_INET,)),
+        ("schema_version", (T_UUID,)),
+        ("tokens", TEXT_SET),
+    ],
+    "system_schema.keyspaces": [
+        ("keyspace_name", TEXT),
+        ("durable_writes", (T_BOOLEAN,)),
+        ("replication", TEXT_MAP),
+    ],
+    "system_schema.tables": [
+        ("keyspace_name", TEXT),
+        ("table_name", TEXT),
+        ("bloom_filter_fp_chance", (T_DOUBLE,)),
+        ("caching", TEXT_MAP),
+        ("cdc", (T_BOOLEAN,)),
+        ("comment", TEXT),
+        ("compaction", TEXT_MAP),
+        ("compression", TEXT_MAP),
+        ("crc_check_chance", (T_DOUBLE,)),
+        ("dclocal_read_repair_chance", (T_DOUBLE,)),
+        ("default_time_to_live", (T_INT,)),
+        ("extensions", (T_MAP, TEXT, (T_BLOB,))),
+        ("flags", TEXT_SET),
+        ("gc_grace_seconds", (T_INT,)),
+        ("id", (T_UUID,)),
+        ("max_index_interval", (T_INT,)),
+        ("memtable_flush_period_in_ms", (T_INT,)),
+        ("min_index_interval", (T_INT,)),
+        ("read_repair_chance", (T_DOUBLE,)),
+        ("speculative_retry", TEXT),
+    ],
+    "system.size_estimates": [
+        ("keyspace_name", TEXT),
+        ("table_name", TEXT),
+        ("range_start", TEXT),
+        ("range_end", TEXT),
+        ("mean_partition_size", (T_BIGINT,)),
+        ("partitions_count", (T_BIGINT,)),
+    ],
+}
+
+SELECT_RE = re.compile(
+    r"^\s*SELECT\s+(?P<columns>.+?)\s+FROM\s+(?P<table>[\w.\"]+)"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+CONDITION_RE = re.compile(
+    r"^\s*(?P<column>\w+)\s*(?P<op>=|IN)\s*(?P<value>.+?)\s*$", re.IGNORECASE
+)
+LITERAL_RE = re.compile(r"'((?:[^']|'')*)'")
+ALTER_RE = re.compile(
+    r"^\s*ALTER\s+(?P<target>TABLE|KEYSPACE)\s+(?P<name>[\w.\"]+)\s+WITH\s+"
+    r"(?P<assignments>.+?)\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+ASSIGNMENT_SPLIT_RE = re.compile(r"\s+AND\s+(?=\w+\s*=)", re.IGNORECASE)
+
+
+class CqlError(Exception):
+    """ Error returned to the client as ERROR frame """
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class MockSchema:
+    """ Keyspace and table rows served from system_schema """
+
+    def __init__(self):
+        self.keyspaces = []  # type: List[Dict[str, Any]]
+        self.tables = {}  # type: Dict[str, List[Dict[str, Any]]]
+        self.size_estimates = []  # type: List[Dict[str, Any]]
+        self.schema_version = uuid.uuid4()
+        self.previous_schema_version = self.schema_version
+        self.changed_at = 0.0
+        self.alter_count = 0
+
+    def add_keyspace(self, name: str, replication: dict, durable_writes=True):
+        """ Add a keyspace row """
+        self.keyspaces.append(
+            {
+                "keyspace_name": name,
+                "durable_writes": durable_writes,
+                "replication": {k: str(v) for k, v in replication.items()},
+            }
+        )
+        self.tables.setdefault(name, [])
+
+    def add_table(self, keyspace_name: str, properties: dict):
+        """ Add a table row using the property names of a config dump """
+        row = {"keyspace_name": keyspace_name, "id": uuid.uuid4()}
+        for key, val in properties.items():
+            key = "table_name" if key == "name" else key
+            if isinstance(val, dict):
+                val = {k: str(v) for k, v in val.items()}
+            elif key == "id":
+                val = uuid.UUID(str(val))
+            row[key] = val
+        self.tables.setdefault(keyspace_name, []).append(row)
+
+    def drop_table(self, keyspace_name: str, table_name: str) -> None:
+        """ Remove a table row and change the schema version """
+        self.tables[keyspace_name] = [
+            row
+            for row in self.tables.get(keyspace_name, [])
+            if row["table_name"] != table_name
+        ]
+        self.previous_schema_version = self.schema_version
+        self.schema_version = uuid.uuid4()
+        self.changed_at = time.monotonic()
+
+    def add_size_estimate(
+        self, keyspace_name: str, table_name: str, size: int, ranges: int = 4
+    ) -> None:
+        """Add system.size_estimates rows of a table
+
+        Args:
+            keyspace_name: Keyspace name
+            table_name:    Table name
+            size:          Estimated bytes, split evenly over the token ranges
+            ranges:        Number of token ranges
+        """
+        step = 2 ** 64 // ranges
+        for idx in range(ranges):
+            self.size_estimates.append(
+                {
+                    "keyspace_name": keyspace_name,
+                    "table_name": table_name,
+                    "range_start": str(-(2 ** 63) + idx * step),
+                    "range_end": str(-(2 ** 63) + (idx + 1) * step),
+                    "mean_partition_size": size // ranges // 100,
+                    "partitions_count": 100,
+                }
+            )
+
+    @staticmethod
+    def from_config(config: dict) -> "MockSchema":
+        """Build schema rows from a configuration as written by --dump
+
+        Args:
+            config: Keyspace and table properties
+
+        Returns:
+            MockSchema
+        """
+        schema = MockSchema()
+        for keyspace in config.get("keyspaces", []):
+            schema.add_keyspace(
+                keyspace["name"],
+                keyspace.get("replication", {}),
+                keyspace.get("durable_writes", True),
+            )
+            for table in keyspace.get("tables", []):
+                schema.add_table(keyspace["name"], table)
+        return schema
+
+    @staticmethod
+    def synthetic(keyspace_count: int, table_count: int) -> "MockSchema":
+        """Build a schema with table_count tables in each keyspace
+
+        Args:
+            keyspace_count: Number of keyspaces
+            table_count:    Number of tables per keyspace
+
+        Returns:
+            MockSchema
+        """
+        schema = MockSchema()
+        for ks_idx in range(keyspace_count):
+            ks_name = "keyspace{}".format(ks_idx)
+            schema.add_keyspace(
+                ks_name,
+                {
+                    "class": "org.apache.cassandra.locator.NetworkTopologyStrategy",
+                    "datacenter1": 3,
+                },
+            )
+            for tbl_idx in range(table_count):
+                schema.add_table(ks_name, synthetic_table("table{}".format(tbl_idx)))
+        return schema
+
+    def alter(self, table: str, keyspace_name: str, table_name: Optional[str],
+              properties: Dict[str, Any]) -> None:
+        """Change keyspace or table properties and the schema version
+
+        Args:
+            table:         system_schema table of the changed row
+            keyspace_name: Keyspace name
+            table_name:    Table name or None for keyspaces
+            properties:    Column name to value
+        """
+        conditions = {"keyspace_name": keyspace_name}
+        if table_name is not None:
+            conditions["table_name"] = table_name
+        rows = self.get_rows(table, conditions)
+        if not rows:
+            raise CqlError(ERR_INVALID, "unconfigured table {}".format(table_name))
+
+        column_types = dict(SYSTEM_TABLES[table])
+        for key, val in properties.items():
+            if key not in column_types:
+                raise CqlError(ERR_SYNTAX, "Unknown property '{}'".format(key))
+            rows[0][key] = coerce_value(column_types[key], val)
+
+        self.alter_count += 1
+        self.previous_schema_version = self.schema_version
+        self.schema_version = uuid.uuid4()
+        self.changed_at = time.monotonic()
+
+    def get_rows(self, table: str, conditions: Dict[str, Any]) -> List[dict]:
+        """Select rows of a system table
+
+        Args:
+            table:      Fully qualified table name
+            conditions: Column name to value or list of values
+
+        Returns:
+            List of rows
+        """
+        if table == "system_schema.keyspaces":
+            system_keyspaces = [
+                {"keyspace_name": name, "durable_writes": True,
+                 "replication": {"class": "org.apache.cassandra.locator.LocalStrategy"}}
+                for name in ("system", "system_schema")
+            ]
+            rows = system_keyspaces + self.keyspaces
+        elif table == "system_schema.tables":
+            ks_name = conditions.get("keyspace_name")
+            if ks_name is None:
+                rows = [row for tables in self.tables.values() for row in tables]
+            else:
+                rows = self.tables.get(ks_name, [])
+        elif table == "system.size_estimates":
+            rows = self.size_estimates
+        else:
+            rows = []
+
+        for column, value in conditions.items():
+            values = value if isinstance(value, list) else [value]
+            rows = [row for row in rows if row.get(column) in values]
+
+        return rows
+
+
+def synthetic_table(name: str) -> dict:
+    """ Table properties with the defaults of Cassandra 3.11 """
+    return {
+        "name": name,
+        "bloom_filter_fp_chance": 0.01,
+        "caching": {"keys": "ALL", "rows_per_partition": "NONE"},
+        "cdc": None,
+        "comment": "",
+        "compaction": {
+            "class": "org.apache.cassandra.db.compaction.SizeTieredCompactionStrategy",
+            "max_threshold": 32,
+            "min_threshold": 4,
+        },
+        "compression": {
+            "chunk_length_in_kb": 64,
+            "class": "org.apache.cassandra.io.compress.LZ4Compressor",
+        },
+        "crc_check_chance": 1.0,
+        "dclocal_read_repair_chance": 0.1,
+        "default_time_to_live": 0,
+        "extensions": {},
+        "flags": ["compound"],
+        "gc_grace_seconds": 864000,
+        "max_index_interval": 2048,
+        "memtable_flush_period_in_ms": 0,
+        "min_index_interval": 128,
+        "read_repair_chance": 0.0,
+        "speculative_retry": "99PERCENTILE",
+    }
+
+
+def coerce_value(cql_type: tuple, val: Any) -> Any:
+    """ Convert a value of an ALTER statement to the column type """
+    if val is None:
+        return None
+    type_id = cql_type[0]
+    if type_id == T_DOUBLE:
+        return float(val)
+    if type_id == T_INT:
+        return int(val)
+    if type_id == T_BOOLEAN:
+        return val if isinstance(val, bool) else str(val).lower() == "true"
+    if type_id == T_MAP:
+        return {str(k): str(v) for k, v in dict(val).items()}
+    return str(val)
+
+
+def parse_assignments(assignments: str) -> Dict[str, Any]:
+    """ Parse the property assignments of an ALTER statement """
+    properties = {}
+    for assignment in ASSIGNMENT_SPLIT_RE.split(assignments):
+        key, _, value = assignment.partition("=")
+        value = value.strip()
+        if value.lower() in ("true", "false"):
+            properties[key.strip()] = value.lower() == "true"
+            continue
+        try:
+            properties[key.strip()] = ast.literal_eval(value)
+        except (SyntaxError, ValueError):
+            raise CqlError(ERR_SYNTAX, "Invalid value: {}".format(value))
+    return properties
+
+
+# Encoding helpers
+
+
+def enc_short(val: int) -> bytes:
+    """ Unsigned 16 bit integer """
+    return struct.pack(">H", val)
+
+
+def enc_int(val: int) -> bytes:
+    """ Signed 32 bit integer """
+    return struct.pack(">i", val)
+
+
+def enc_string(val: str) -> bytes:
+    """ UTF-8 string with a short length """
+    data = val.encode("utf-8")
+    return enc_short(len(data)) + data
+
+
+def enc_bytes(val: Optional[bytes]) -> bytes:
+    """ Bytes with an int length, a negative length for None """
+    if val is None:
+        return enc_int(-1)
+    return enc_int(len(val)) + val
+
+
+def enc_type(cql_type: tuple) -> bytes:
+    """ Type option of a result metadata column, including sub types """
+    data = enc_short(cql_type[0])
+    for sub_type in cql_type[1:]:
+        data += enc_type(sub_type)
+    return data
+
+
+def enc_value(cql_type: tuple, val: Any) -> Optional[bytes]:
+    """ Serialize a value of a CQL type, None for null """
+    if val is None:
+        return None
+
+    type_id = cql_type[0]
+    if type_id == T_TEXT:
+        return str(val).encode("utf-8")
+    if type_id == T_BLOB:
+        return val if isinstance(val, bytes) else str(val).encode("utf-8")
+    if type_id == T_BOOLEAN:
+        return b"\x01" if val else b"\x00"
+    if type_id == T_INT:
+        return struct.pack(">i", int(val))
+    if type_id == T_BIGINT:
+        return struct.pack(">q", int(val))
+    if type_id == T_DOUBLE:
+        return struct.pack(">d", float(val))
+    if type_id == T_UUID:
+        return (val if isinstance(val, uuid.UUID) else uuid.UUID(str(val))).bytes
+    if type_id == T_INET:
+        return socket.inet_aton(val)
+    if type_id in (T_LIST, T_SET):
+        items = list(val)
+        return enc_int(len(items)) + b"".join(
+            enc_bytes(enc_value(cql_type[1], item)) for item in items
+        )
+    if type_id == T_MAP:
+        return enc_int(len(val)) + b"".join(
+            enc_bytes(enc_value(cql_type[1], k)) + enc_bytes(enc_value(cql_type[2], v))
+            for k, v in val.items()
+        )
+    raise CqlError(ERR_SERVER, "Unsupported type {}".format(type_id))
+
+
+class Reader:
+    """ Sequential reader for request bodies """
+
+    def __init__(self, data: bytes):
+        self._data = data
+        self._pos = 0
+
+    def read(self, size: int) -> bytes:
+        """ Next size bytes """
+        data = self._data[self._pos:self._pos + size]
+        self._pos += size
+        return data
+
+    def read_short(self) -> int:
+        """ Unsigned 16 bit integer """
+        return struct.unpack(">H", self.read(2))[0]
+
+    def read_int(self) -> int:
+        """ Signed 32 bit integer """
+        return struct.unpack(">i", self.read(4))[0]
+
+    def read_byte(self) -> int:
+        """ Unsigned 8 bit integer """
+        return self.read(1)[0]
+
+    def read_string(self) -> str:
+        """ UTF-8 string with a short length """
+        return self.read(self.read_short()).decode("utf-8")
+
+    def read_long_string(self) -> str:
+        """ UTF-8 string with an int length """
+        return self.read(self.read_int()).decode("utf-8")
+
+    def read_bytes(self) -> Optional[bytes]:
+        """ Bytes with an int length, None for a negative length """
+        size = self.read_int()
+        return None if size < 0 else self.read(size)
+
+    def read_short_bytes(self) -> bytes:
+        """ Bytes with a short length """
+        return self.read(self.read_short())
+
+    def read_string_map(self) -> Dict[str, str]:
+        """ Map of strings with a short number of entries """
+        return {
+            self.read_string(): self.read_string() for _ in range(self.read_short())
+        }
+
+    def read_string_list(self) -> List[str]:
+        """ List of strings with a short number of entries """
+        return [self.read_string() for _ in range(self.read_short())]
+
+
+def dec_value(cql_type: tuple, data: Optional[bytes]) -> Any:
+    """ Deserialize a bound value """
+    if data is None:
+        return None
+    if cql_type[0] == T_TEXT:
+        return data.decode("utf-8")
+    if cql_type[0] in (T_LIST, T_SET):
+        reader = Reader(data)
+        return [
+            dec_value(cql_type[1], reader.read_bytes())
+            for _ in range(reader.read_int())
+        ]
+    raise CqlError(ERR_SERVER, "Unsupported bind type {}".format(cql_type[0]))
+
+
+class ParsedQuery:
+    """ SELECT statement understood by the server """
+
+    def __init__(self, query_stmt: str):
+        match = SELECT_RE.match(query_stmt)
+        if not match:
+            raise CqlError(ERR_SYNTAX, "Unsupported statement: {}".format(query_stmt))
+
+        self.table = match.group("table").replace('"', "").lower()
+        if self.table == "system.peers_v2":
+            raise CqlError(ERR_INVALID, "unconfigured table peers_v2")
+
+        # Other tables are served empty
+        all_columns = SYSTEM_TABLES.get(self.table, [("keyspace_name", TEXT)])
+        column_types = dict(all_columns)
+        names = match.group("columns").strip()
+        if names == "*":
+            self.columns = all_columns
+        else:
+            self.columns = [
+                (name, column_types.get(name, TEXT))
+                for name in (col.strip() for col in names.split(","))
+            ]
+
+        # (column, type of bind marker or None, literal value) per condition
+        self.conditions = []  # type: List[Tuple[str, Optional[tuple], Any]]
+        where = match.group("where")
+        for condition in re.split(r"\s+AND\s+", where, flags=re.I) if where else []:
+            cond_match = CONDITION_RE.match(condition)
+            if not cond_match:
+                raise CqlError(ERR_SYNTAX, "Unsupported condition: {}".format(condition))
+            column = cond_match.group("column")
+            is_in = cond_match.group("op").upper() == "IN"
+            value = cond_match.group("value")
+            if value == "?":
+                col_type = column_types.get(column, TEXT)
+                self.conditions.append((column, (T_LIST, col_type) if is_in else col_type,
+                                        None))
+            else:
+                literals = [lit.replace("''", "'") for lit in LITERAL_RE.findall(value)]
+                self.conditions.append((column, None, literals if is_in else literals[0]))
+
+    @property
+    def bind_types(self) -> List[Tuple[str, tuple]]:
+        """ (column, type) of the bind markers in statement order """
+        return [(column, typ) for column, typ, _ in self.conditions if typ is not None]
+
+    def resolve_conditions(self, values: List[Optional[bytes]]) -> Dict[str, Any]:
+        """ Column to value of the conditions with the bound values filled in """
+        bound = iter(values)
+        conditions = {}
+        for column, typ, literal in self.conditions:
+            conditions[column] = literal if typ is None else dec_value(typ, next(bound))
+        # The local node is the only row of system.local
+        conditions.pop("key", None)
+        return conditions
+
+
+class MockCassandraServer:
+    """ Threaded CQL native protocol server backed by a MockSchema """
+
+    def __init__(
+        self,
+        schema: MockSchema = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        peer_count: int = 0,
+        agreement_delay: float = 0.0,
+        compressions: Tuple[str, ...] = (),
+        bandwidth: float = 0.0,
+    ):
+        """Construct server. Call start() to accept connections.
+
+        Args:
+            schema:          Served keyspaces and tables
+            host:            Listen address
+            port:            Listen port. 0 picks a free port
+            latency:         Seconds to delay every QUERY, PREPARE and
+                             EXECUTE response
+            peer_count:      Number of (unreachable) peers in system.peers
+            agreement_delay: Seconds until peers report the schema version
+                             of the last ALTER
+            compressions:    Offered frame compressions: lz4 and snappy,
+                             if their package is installed
+            bandwidth:       Bytes per second of every connection. Unlimited
+                             if 0.
+        """
+        for compression in compressions:
+            if compression not in FRAME_COMPRESSIONS:
+                raise ValueError(
+                    "{} compression requires its package".format(compression)
+                )
+        self.schema = schema if schema else MockSchema()
+        self.latency = latency
+        self.peer_count = peer_count
+        self.agreement_delay = agreement_delay
+        self.compressions = compressions
+        self.bandwidth = bandwidth
+        self.host_id = uuid.uuid4()
+        self.stats = {
+            "connections": 0,
+            "queries": 0,
+            "prepares": 0,
+            "executes": 0,
+            "bytes_received": 0,
+            "bytes_sent": 0,
+        }
+        self._lock = threading.Lock()
+        self._prepared = {}  # type: Dict[bytes, ParsedQuery]
+        self._server = socketserver.ThreadingTCPServer(
+            (host, port), self._make_handler(), bind_and_activate=False
+        )
+        self._server.daemon_threads = True
+        self._server.allow_reuse_address = True
+        self._server.server_bind()
+        self._server.server_activate()
+        self._thread = None  # type: Optional[threading.Thread]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def host(self) -> str:
+        """ Listening address """
+        return self._server.server_address[0]
+
+    @property
+    def port(self) -> int:
+        """ Listening port """
+        return self._server.server_address[1]
+
+    def start(self) -> None:
+        """ Serve connections in a background thread """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """ Stop serving and close the listening socket """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, stat: str, increment: int = 1) -> None:
+        """ Increment a statistics counter """
+        with self._lock:
+            self.stats[stat] = self.stats.get(stat, 0) + increment
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            """ Serves a connection with a ConnectionHandler """
+
+            def handle(self):
+                server.count("connections")
+                ConnectionHandler(server, self.request).run()
+
+        return Handler
+
+    # Request processing
+
+    def process(self, opcode: int, body: bytes) -> Tuple[int, bytes]:
+        """Process a request frame
+
+        Args:
+            opcode: Request opcode
+            body:   Request body
+
+        Returns:
+            Tuple of (response opcode, response body)
+        """
+        try:
+            reader = Reader(body)
+            if opcode == OP_OPTIONS:
+                return OP_SUPPORTED, self._supported()
+            if opcode in (OP_STARTUP, OP_REGISTER):
+                return OP_READY, b""
+            if opcode == OP_QUERY:
+                self.count("queries")
+                query_stmt = reader.read_long_string()
+                if ALTER_RE.match(query_stmt):
+                    return OP_RESULT, self._alter(query_stmt)
+                parsed = ParsedQuery(query_stmt)
+                return OP_RESULT, self._rows(parsed, reader)
+            if opcode == OP_PREPARE:
+                self.count("prepares")
+                return OP_RESULT, self._prepare(reader.read_long_string())
+            if opcode == OP_EXECUTE:
+                self.count("executes")
+                query_id = reader.read_short_bytes()
+                parsed_query = self._prepared.get(query_id)
+                if parsed_query is None:
+                    raise CqlError(ERR_INVALID, "Unknown prepared statement")
+                return OP_RESULT, self._rows(parsed_query, reader)
+            raise CqlError(ERR_PROTOCOL, "Unsupported opcode {}".format(opcode))
+        except CqlError as err:
+            return OP_ERROR, enc_int(err.code) + enc_string(err.message)
+
+    def _supported(self) -> bytes:
+        options = {
+            "CQL_VERSION": ["3.4.4"],
+            "COMPRESSION": list(self.compressions),
+            "PROTOCOL_VERSIONS": ["{0}/v{0}".format(ver) for ver in SUPPORTED_VERSIONS],
+        }
+        body = enc_short(len(options))
+        for key, values in options.items():
+            body += enc_string(key) + enc_short(len(values))
+            body += b"".join(enc_string(val) for val in values)
+        return body
+
+    def _prepare(self, query_stmt: str) -> bytes:
+        parsed = ParsedQuery(query_stmt)
+        query_id = hashlib.md5(query_stmt.encode("utf-8")).digest()
+        with self._lock:
+            self._prepared[query_id] = parsed
+
+        bind_types = parsed.bind_types
+        keyspace, table = parsed.table.split(".")
+        body = enc_int(RESULT_PREPARED) + enc_short(len(query_id)) + query_id
+        # Bind variable metadata
+        body += enc_int(META_GLOBAL_TABLES_SPEC) + enc_int(len(bind_types)) + enc_int(0)
+        body += enc_string(keyspace) + enc_string(table)
+        for name, cql_type in bind_types:
+            body += enc_string(name) + enc_type(cql_type)
+        # Result metadata
+        body += self._rows_metadata(parsed, META_GLOBAL_TABLES_SPEC, b"")
+        return body
+
+    @staticmethod
+    def _rows_metadata(parsed: ParsedQuery, flags: int, paging_state: bytes) -> bytes:
+        keyspace, table = parsed.table.split(".")
+        body = enc_int(flags) + enc_int(len(parsed.columns))
+        if flags & META_HAS_MORE_PAGES:
+            body += enc_bytes(paging_state)
+        if not flags & META_NO_METADATA:
+            body += enc_string(keyspace) + enc_string(table)
+            for name, cql_type in parsed.columns:
+                body += enc_string(name) + enc_type(cql_type)
+        return body
+
+    def _alter(self, query_stmt: str) -> bytes:
+        match = ALTER_RE.match(query_stmt)
+        target = match.group("target").upper()
+        names = [name.strip('"') for name in match.group("name").split(".")]
+        properties = parse_assignments(match.group("assignments"))
+        with self._lock:
+            if target == "KEYSPACE":
+                self.schema.alter("system_schema.keyspaces", names[0], None, properties)
+            else:
+                self.schema.alter("system_schema.tables", names[0], names[1], properties)
+
+        body = enc_int(RESULT_SCHEMA_CHANGE) + enc_string("UPDATED")
+        body += enc_string(target) + enc_string(names[0])
+        if target == "TABLE":
+            body += enc_string(names[1])
+        return body
+
+    def _peer_rows(self) -> List[dict]:
+        agreed = time.monotonic() - self.schema.changed_at >= self.agreement_delay
+        schema_version = (
+            self.schema.schema_version if agreed else self.schema.previous_schema_version
+        )
+        return [
+            {
+                "peer": "127.0.1.{}".format(idx + 1),
+                "data_center": "datacenter1",
+                "host_id": uuid.UUID(int=idx + 1),
+                "preferred_ip": None,
+                "rack": "rack1",
+                "release_version": "3.11.4",
+                "rpc_address": "127.0.1.{}".format(idx + 1),
+                "schema_version": schema_version,
+                "tokens": [str(idx + 1)],
+            }
+            for idx in range(self.peer_count)
+        ]
+
+    def _local_rows(self) -> List[dict]:
+        return [
+            {
+                "key": "local",
+                "bootstrapped": "COMPLETED",
+                "broadcast_address": self.host,
+                "cluster_name": "Mock Cluster",
+                "cql_version": "3.4.4",
+                "data_center": "datacenter1",
+                "host_id": self.host_id,
+                "listen_address": self.host,
+                "native_protocol_version": str(max(SUPPORTED_VERSIONS)),
+                "partitioner": "org.apache.cassandra.dht.Murmur3Partitioner",
+                "rack": "rack1",
+                "release_version": "3.11.4",
+                "rpc_address": self.host,
+                "schema_version": self.schema.schema_version,
+                "tokens": ["0"],
+            }
+        ]
+
+    def _rows(self, parsed: ParsedQuery, reader: Reader) -> bytes:
+        reader.read_short()  # consistency
+        flags = reader.read_byte()
+        values = []  # type: List[Optional[bytes]]
+        if flags & FLAG_VALUES:
+            values = [reader.read_bytes() for _ in range(reader.read_short())]
+        page_size = reader.read_int() if flags & FLAG_PAGE_SIZE else 0
+        paging_state = reader.read_bytes() if flags & FLAG_PAGING_STATE else None
+
+        conditions = parsed.resolve_conditions(values)
+        if parsed.table == "system.local":
+            rows = self._local_rows()
+        elif parsed.table == "system.peers":
+            rows = self._peer_rows()
+        else:
+            rows = self.schema.get_rows(parsed.table, conditions)
+
+        start = struct.unpack(">i", paging_state)[0] if paging_state else 0
+        end = start + page_size if page_size > 0 else len(rows)
+        page = rows[start:end]
+
+        meta_flags = META_GLOBAL_TABLES_SPEC
+        if flags & FLAG_SKIP_METADATA:
+            meta_flags |= META_NO_METADATA
+        if end < len(rows):
+            meta_flags |= META_HAS_MORE_PAGES
+
+        body = [enc_int(RESULT_ROWS), self._rows_metadata(parsed, meta_flags, enc_int(end))]
+        body.append(enc_int(len(page)))
+        for row in page:
+            for name, cql_type in parsed.columns:
+                body.append(enc_bytes(enc_value(cql_type, row.get(name))))
+        return b"".join(body)
+
+
+class ConnectionHandler:
+    """ Reads request frames from a client connection and answers them """
+
+    HEADER = struct.Struct(">BBhBi")
+
+    def __init__(self, server: MockCassandraServer, sock: socket.socket):
+        self._server = server
+        self._sock = sock
+        self._write_lock = threading.Lock()
+        # Frame compression negotiated by STARTUP
+        self._compression = None  # type: Optional[str]
+
+    def _recv_exactly(self, size: int) -> Optional[bytes]:
+        data = b""
+        while len(data) < size:
+            chunk = self._sock.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def _send(self, version: int, stream: int, opcode: int, body: bytes) -> None:
+        flags = 0
+        if self._compression and body:
+            body = FRAME_COMPRESSIONS[self._compression][0](body)
+            flags = FLAG_COMPRESSION
+        frame = self.HEADER.pack(0x80 | version, flags, stream, opcode, len(body)) + body
+        with self._write_lock:
+            if self._server.bandwidth:
+                time.sleep(len(frame) / self._server.bandwidth)
+            self._sock.sendall(frame)
+        self._server.count("bytes_sent", len(frame))
+
+    def _respond(self, version: int, stream: int, opcode: int, body: bytes) -> None:
+        resp_opcode, resp_body = self._server.process(opcode, body)
+        if self._server.latency and opcode in (OP_QUERY, OP_PREPARE, OP_EXECUTE):
+            time.sleep(self._server.latency)
+        try:
+            self._send(version, stream, resp_opcode, resp_body)
+        except OSError:
+            pass  # client went away
+
+    def run(self) -> None:
+        """ Process frames until the client disconnects """
+        while True:
+            try:
+                header = self._recv_exactly(self.HEADER.size)
+                if header is None:
+                    return
+                version, flags, stream, opcode, length = self.HEADER.unpack(header)
+                body = self._recv_exactly(length) if length else b""
+                if body is None:
+                    return
+            except OSError:
+                return
+            self._server.count("bytes_received", len(header) + length)
+
+            if flags & FLAG_COMPRESSION and self._compression:
+                body = FRAME_COMPRESSIONS[self._compression][1](body)
+
+            version &= 0x7F
+            if version not in SUPPORTED_VERSIONS:
+                message = (
+                    "Invalid or unsupported protocol version ({}); supported "
+                    "versions are ({})".format(
+                        version, ",".join("{0}/v{0}".format(v) for v in SUPPORTED_VERSIONS)
+                    )
+                )
+                self._send(
+                    max(SUPPORTED_VERSIONS),
+                    stream,
+                    OP_ERROR,
+                    enc_int(ERR_PROTOCOL) + enc_string(message),
+                )
+                continue
+
+            if self._server.latency and opcode in (OP_QUERY, OP_PREPARE, OP_EXECUTE):
+                # Answer concurrently like a real node would
+                threading.Thread(
+                    target=self._respond, args=(version, stream, opcode, body), daemon=True
+                ).start()
+            else:
+                self._respond(version, stream, opcode, body)
+
+            if opcode == OP_STARTUP:
+                # Frames after READY are compressed
+                compression = Reader(body).read_string_map().get("COMPRESSION")
+                if compression in self._server.compressions:
+                    self._compression = compression
+
+
+def main():
+    """ Run a mock server until interrupted """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1", help="Listen address")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Listen port")
+    parser.add_argument("--config", help="Serve keyspaces from a --dump YAML file")
+    parser.add_argument("--keyspaces", type=int, default=1, help="Synthetic keyspaces")
+    parser.add_argument("--tables", type=int, default=100, help="Tables per keyspace")
+    parser.add_argument("--latency", type=float, default=0.0, help="Response delay in s")
+    parser.add_argument(
+        "--bandwidth", type=float, default=0.0, help="Bytes per s per connection"
+    )
+    parser.add_argument(
+        "--compression", action="store_true", help="Offer lz4 frame compression"
+    )
+    args = parser.parse_args()
+
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as conf_file:
+            schema = MockSchema.from_config(yaml.safe_load(conf_file))
+    else:
+        schema = MockSchema.synthetic(args.keyspaces, args.tables)
+
+    with MockCassandraServer(
+        schema,
+        args.host,
+        args.port,
+        args.latency,
+        compressions=("lz4",) if args.compression else (),
+        bandwidth=args.bandwidth,
+    ) as server:
+        print("Serving on {}:{}".format(server.host, server.port))
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
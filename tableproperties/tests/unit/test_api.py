@@ -0,0 +1,75 @@
+# pylint: disable=missing-docstring, no-self-use
+import os
+
+import pytest
+import yaml
+
+from tableproperties import api, tests
+
+
+def load_config(filename: str) -> dict:
+    with open(os.path.join(tests.TEST_ROOT, "configs", filename), "r") as conf:
+        return yaml.safe_load(conf)
+
+
+class TestApi:
+    def test_diff_in_process(self, capsys, mock_cassandra):
+        desired = load_config("excalibur_change_comments.yaml")
+        unchanged = load_config("excalibur_unchanged.yaml")
+
+        with api.connect(mock_cassandra.host, mock_cassandra.port) as conn:
+            connections = mock_cassandra.stats["connections"]
+            for _ in range(3):
+                changes = api.get_changes(conn, desired)
+                assert {rec["table"] for rec in changes} == {
+                    "monkeyspecies",
+                    "monkeyspecies2",
+                }
+                assert all(rec["property"] == "comment" for rec in changes)
+
+            statements = api.get_alter_statements(conn, desired)
+            assert len(statements) == 2
+            assert statements[0].startswith('ALTER TABLE "excalibur"')
+
+            assert not api.is_converged(conn, desired)
+            assert api.is_converged(conn, unchanged)
+
+            current = api.get_current_config(conn, {"keyspaces": [{"name": "excalibur"}]})
+            assert current["keyspaces"][0]["tables"] == []
+            assert len(api.get_current_config(conn)["keyspaces"][0]["tables"]) == 2
+
+            # All calls share the session and its connections
+            assert mock_cassandra.stats["connections"] == connections
+
+        out, _ = capsys.readouterr()
+        assert out == ""
+
+    def test_unknown_keyspace(self, mock_cassandra):
+        with api.connect(mock_cassandra.host, mock_cassandra.port) as conn:
+            assert api.get_changes(conn, {"keyspaces": [{"name": "missing"}]}) == []
+
+    def test_missing_names(self, mock_cassandra):
+        with api.connect(mock_cassandra.host, mock_cassandra.port) as conn:
+            with pytest.raises(KeyError, match="Missing keyspace name"):
+                api.get_changes(conn, {"keyspaces": [{"name": "excalibur"}, {}]})
+            with pytest.raises(KeyError, match="Missing table name in keyspace"):
+                api.get_changes(
+                    conn,
+                    {"keyspaces": [{"name": "excalibur", "tables": [{"comment": "x"}]}]},
+                )
+
+    def test_compare_clusters(self, mock_cassandra, reference_cassandra):
+        with api.connect(mock_cassandra.host, mock_cassandra.port) as conn:
+            with api.connect(
+                reference_cassandra.host, reference_cassandra.port
+            ) as reference_conn:
+                change_sets = api.compare_clusters(conn, reference_conn)
+                assert [(ks, tbl) for ks, tbl, _ in change_sets] == [
+                    ("excalibur", "monkeyspecies"),
+                    ("excalibur", "monkeyspecies2"),
+                ]
+                for _, _, changes in change_sets:
+                    assert [chg["property"] for chg in changes] == ["comment"]
+                    assert changes[0]["desired"] == "Reference comment"
+
+                assert api.compare_clusters(conn, conn) == []
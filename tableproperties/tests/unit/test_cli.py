@@ -1,10 +1,14 @@
 # pylint: disable=missing-docstring, no-self-use
 import argparse
+import io
+import json
 import os
+import shutil
 
 import pytest
 
-from tableproperties import cli, tests, PROG_NAME
+from tableproperties import cli, db, journal, tests, PROG_NAME
+from tableproperties.tests.mockcassandra import MockCassandraServer
 
 
 # pylint: disable=too-few-public-methods
@@ -44,6 +48,465 @@ class TestTablePropertiesCli:
         out, _ = capsys.readouterr()
         assert out.strip() != ""
 
+    def test_invoke_mock_cassandra(self, capsys, mock_cassandra):
+        conn_args = ["-i", mock_cassandra.host, "-p", str(mock_cassandra.port)]
+        cmd = cli.TablePropertiesCli()
+        cmd.execute(conn_args + ["-d"])
+        out, _ = capsys.readouterr()
+        assert "name: monkeyspecies2" in out
+
+        cmd = cli.TablePropertiesCli()
+        cmd.execute(
+            conn_args + [os.path.join(tests.TEST_ROOT, "configs/excalibur_unchanged.yaml")]
+        )
+        out, _ = capsys.readouterr()
+        assert out.strip() == ""
+
+    def test_invoke_multiple_configs(self, capsys, caplog, mock_cassandra):
+        conn_args = ["-i", mock_cassandra.host, "-p", str(mock_cassandra.port)]
+        configs = [
+            os.path.join(tests.TEST_ROOT, "configs/excalibur_change_comments.yaml"),
+            os.path.join(tests.TEST_ROOT, "configs/excalibur_incr_dcs.yaml"),
+        ]
+        cmd = cli.TablePropertiesCli()
+        cmd.execute(conn_args + configs)
+        out, _ = capsys.readouterr()
+        assert out.startswith('ALTER KEYSPACE "excalibur"')
+        # The later file keeps the current comments
+        assert out.count("ALTER TABLE") == 0
+        assert caplog.text.count("Keeping the current value instead of 'Test") == 2
+
+        cmd = cli.TablePropertiesCli()
+        cmd.execute(conn_args + configs[::-1])
+        out, _ = capsys.readouterr()
+        # Now the later file keeps the current replication
+        assert out.count("ALTER KEYSPACE") == 0
+        assert out.count("ALTER TABLE") == 2
+
+    def test_invoke_apply(self, capsys, mock_cassandra):
+        conn_args = ["-i", mock_cassandra.host, "-p", str(mock_cassandra.port)]
+        config = os.path.join(tests.TEST_ROOT, "configs/excalibur_change_comments.yaml")
+        cmd = cli.TablePropertiesCli()
+        cmd.execute(conn_args + ["--apply", "--rate", "100", config])
+        out, err = capsys.readouterr()
+        assert out.count("ALTER TABLE") == 2
+        assert "[2/2] Applied excalibur.monkeyspecies2" in err
+        assert mock_cassandra.schema.alter_count == 2
+
+        cmd = cli.TablePropertiesCli()
+        cmd.execute(conn_args + [config])
+        out, _ = capsys.readouterr()
+        assert out.strip() == ""
+
+    def test_invoke_apply_size_order(self, capsys, mock_cassandra):
+        mock_cassandra.schema.add_size_estimate("excalibur", "monkeyspecies", 10 ** 10)
+        mock_cassandra.schema.add_size_estimate("excalibur", "monkeyspecies2", 10 ** 9)
+        conn_args = ["-i", mock_cassandra.host, "-p", str(mock_cassandra.port)]
+        config = os.path.join(tests.TEST_ROOT, "configs/excalibur_change_compaction.yaml")
+
+        cmd = cli.TablePropertiesCli()
+        cmd.execute(conn_args + [config])
+        out, _ = capsys.readouterr()
+        assert out.index('"monkeyspecies"') < out.index('"monkeyspecies2"')
+
+        # The smaller table is rewritten first
+        cmd = cli.TablePropertiesCli()
+        cmd.execute(conn_args + ["--apply", "--rate", "100", "--size-order", config])
+        out, err = capsys.readouterr()
+        assert out.index('"monkeyspecies2"') < out.index('"monkeyspecies"')
+        assert "[2/2] Applied excalibur.monkeyspecies," in err
+        assert mock_cassandra.schema.alter_count == 2
+
+    def test_invoke_apply_unknown_size_last(self, capsys, caplog, mock_cassandra):
+        mock_cassandra.schema.add_size_estimate("excalibur", "monkeyspecies", 10 ** 10)
+        conn_args = ["-i", mock_cassandra.host, "-p", str(mock_cassandra.port)]
+        config = os.path.join(tests.TEST_ROOT, "configs/excalibur_change_compaction.yaml")
+
+        cmd = cli.TablePropertiesCli()
+        cmd.execute(conn_args + ["--apply", "--rate", "100", "--size-order", config])
+        out, _ = capsys.readouterr()
+        assert out.index('"monkeyspecies"') < out.index('"monkeyspecies2"')
+        assert "No size estimate of excalibur.monkeyspecies2" in caplog.text
+
+    def test_invoke_estimate(self, capsys, mock_cassandra):
+        mock_cassandra.schema.add_size_estimate("excalibur", "monkeyspecies", 2 << 30)
+        conn_args = ["-i", mock_cassandra.host, "-p", str(mock_cassandra.port)]
+        config = os.path.join(tests.TEST_ROOT, "configs/excalibur_change_compaction.yaml")
+
+        cmd = cli.TablePropertiesCli()
+        cmd.execute(conn_args + ["--estimate", config])
+        out, _ = capsys.readouterr()
+        assert (
+            "excalibur.monkeyspecies (compaction) in datacenter1: estimated 2.0 GiB, "
+            "rewrite 2.0 GiB, temporary 1.7 GiB per node" in out
+        )
+        assert "excalibur.monkeyspecies2 (compression) in datacenter1: estimated " \
+            "unknown, rewrite 0 B" in out
+        assert "datacenter1 (1 nodes): rewrite 2.0 GiB" in out
+
+        cmd = cli.TablePropertiesCli()
+        cmd.execute(conn_args + ["--estimate", "-f", "json", config])
+        out, _ = capsys.readouterr()
+        costs = json.loads(out)
+        assert [rec["table"] for rec in costs["tables"]] == [
+            "monkeyspecies",
+            "monkeyspecies2",
+        ]
+        # One node holding all replicas
+        assert costs["data_centers"][0]["cluster_rewrite_bytes"] == costs["tables"][0][
+            "estimated_bytes"
+        ]
+        assert mock_cassandra.schema.alter_count == 0
+
+    def test_invoke_rewrite_rate_without_size_order(self, capsys):
+        cmd = cli.TablePropertiesCli()
+        with pytest.raises(SystemExit):
+            cmd.execute(["--apply", "--rewrite-rate", "1000", "config.yaml"])
+        out, _ = capsys.readouterr()
+        assert "--rewrite-rate requires --apply and --size-order" in out
+
+        with pytest.raises(SystemExit):
+            cmd.execute(["--rewrite-rate", "0", "config.yaml"])
+        _, err = capsys.readouterr()
+        assert "'0' is not a positive number" in err
+
+    @pytest.mark.parametrize(
+        "option", [["--since", "state.json"], ["-q"], ["-f", "json"]]
+    )
+    def test_invoke_apply_excludes_output_options(self, capsys, option):
+        cmd = cli.TablePropertiesCli()
+        with pytest.raises(SystemExit):
+            cmd.execute(["--apply"] + option + ["config.yaml"])
+        out, _ = capsys.readouterr()
+        assert "--apply excludes --since, --quiet and --format" in out
+
+    @pytest.mark.parametrize(
+        "option",
+        [
+            ["--apply"],
+            ["-d"],
+            ["--reference", "10.0.0.1"],
+            ["--exporter", "9500"],
+            ["--snapshot", "store", "--snapshot-diff", "prod/1", "prod/2"],
+            ["--since", "state.json"],
+            ["-q"],
+            ["-d", "--stream"],
+        ],
+    )
+    def test_invoke_estimate_excludes_modes(self, capsys, option):
+        cmd = cli.TablePropertiesCli()
+        with pytest.raises(SystemExit):
+            cmd.execute(["--estimate"] + option + ["config.yaml"])
+        out, _ = capsys.readouterr()
+        assert "--estimate excludes --apply, --dump, --reference" in out
+
+    @pytest.mark.parametrize(
+        "args",
+        [
+            ["--exporter", "9500"],
+            ["--exporter", "9500", "-d"],
+            ["--exporter", "9500", "--apply", "config.yaml"],
+        ],
+    )
+    def test_invoke_exporter_excludes_modes(self, capsys, args):
+        with pytest.raises(SystemExit) as ex:
+            cli.TablePropertiesCli().execute(args)
+        assert ex.value.code == 1
+        out, _ = capsys.readouterr()
+        assert "--exporter requires <filename> and excludes --apply" in out
+
+    def test_invoke_stream_requires_dump(self, capsys):
+        with pytest.raises(SystemExit):
+            cli.TablePropertiesCli().execute(["--stream", "config.yaml"])
+        out, _ = capsys.readouterr()
+        assert "--stream requires --dump" in out
+
+    def test_listen_address(self):
+        assert cli.listen_address("9500") == ("127.0.0.1", 9500)
+        assert cli.listen_address("0.0.0.0:9500") == ("0.0.0.0", 9500)
+        for value in ("host:", "foo", "host:-1", "host:65536"):
+            with pytest.raises(argparse.ArgumentTypeError):
+                cli.listen_address(value)
+        with pytest.raises(SystemExit):
+            cli.TablePropertiesCli.get_arg_parser().parse_args(["--exporter", "foo"])
+
+    def test_get_option_error(self):
+        def error(args):
+            parser = cli.TablePropertiesCli.get_arg_parser()
+            return cli.get_option_error(parser.parse_args(args))
+
+        assert error(["config.yaml"]) is None
+        assert error(["--apply", "--size-order", "--rewrite-rate", "1", "a.yaml"]) is None
+        assert error(["--dump", "--stream"]) is None
+        assert error(["--apply", "-q", "a.yaml"]) == (
+            "--apply excludes --since, --quiet and --format."
+        )
+        assert error(["--snapshot", "store", "--cluster-name", ".."]).startswith(
+            "Invalid name '..'"
+        )
+        # The first invalid combination is reported
+        assert error(["--resume", "--stream"]) == (
+            "--resume requires --apply and --journal."
+        )
+
+    def test_invoke_apply_resume(self, capsys, mock_cassandra, tmpdir):
+        conn_args = ["-i", mock_cassandra.host, "-p", str(mock_cassandra.port)]
+        config = os.path.join(tests.TEST_ROOT, "configs/excalibur_change_comments.yaml")
+        journal_file = os.path.join(str(tmpdir), "apply.journal")
+        apply_args = ["--apply", "--rate", "100", "--journal", journal_file]
+
+        # An interrupted run that applied the first table only
+        with open(journal_file, "w", encoding="utf-8") as out:
+            out.write(
+                json.dumps({"keyspace": "excalibur", "table": "monkeyspecies"}) + "\n"
+            )
+
+        cmd = cli.TablePropertiesCli()
+        cmd.execute(conn_args + apply_args + ["--resume", config])
+        out, err = capsys.readouterr()
+        assert out.count("ALTER TABLE") == 1
+        assert "[1/1] Applied excalibur.monkeyspecies2" in err
+        assert mock_cassandra.schema.alter_count == 1
+
+        with open(journal_file, "r", encoding="utf-8") as journal_in:
+            entries = [json.loads(line) for line in journal_in]
+        assert [entry["table"] for entry in entries] == [
+            "monkeyspecies",
+            "monkeyspecies2",
+        ]
+        assert entries[1]["pre_change_digest"]
+
+        # Nothing left to apply
+        cmd = cli.TablePropertiesCli()
+        cmd.execute(conn_args + apply_args + ["--resume", config])
+        out, _ = capsys.readouterr()
+        assert out.strip() == ""
+        assert mock_cassandra.schema.alter_count == 1
+
+    def test_invoke_apply_resume_changed_since(self, capsys, mock_cassandra, tmpdir):
+        conn_args = ["-i", mock_cassandra.host, "-p", str(mock_cassandra.port)]
+        config = os.path.join(tests.TEST_ROOT, "configs/excalibur_change_comments.yaml")
+        journal_file = os.path.join(str(tmpdir), "apply.journal")
+        apply_args = ["--apply", "--rate", "100", "--journal", journal_file]
+
+        # The recorded statement of the first table did not take effect
+        journal.ApplyJournal(journal_file).record(
+            "excalibur",
+            "monkeyspecies",
+            "ALTER TABLE ...;",
+            [
+                {
+                    "property": "comment",
+                    "current": "Important biological records",
+                    "desired": "Test comment",
+                }
+            ],
+        )
+
+        cmd = cli.TablePropertiesCli()
+        cmd.execute(conn_args + apply_args + ["--resume", config])
+        out, err = capsys.readouterr()
+        assert out.count("ALTER TABLE") == 2
+        assert "[2/2] Applied" in err
+        assert mock_cassandra.schema.alter_count == 2
+
+    def test_invoke_resume_without_journal(self, capsys):
+        cmd = cli.TablePropertiesCli()
+        with pytest.raises(SystemExit):
+            cmd.execute(["--apply", "--resume", "config.yaml"])
+        out, _ = capsys.readouterr()
+        assert out.strip() == "--resume requires --apply and --journal."
+
+    def test_invalid_config_fails_before_connecting(self, capsys, tmpdir):
+        config = os.path.join(str(tmpdir), "broken.yaml")
+        with open(config, "w", encoding="utf-8") as out:
+            out.write("keyspaces:\n- name: ks\n  durable_writes: maybe\n")
+
+        cmd = cli.TablePropertiesCli()
+        # Nothing listens on the port, so connecting would fail differently
+        with pytest.raises(SystemExit) as ex:
+            cmd.execute(["-p", "1", config])
+        assert ex.value.code == 1
+        _, err = capsys.readouterr()
+        assert err.strip() == (
+            "{}:3:19: Property 'durable_writes' must be a boolean".format(config)
+        )
+
+    def test_invoke_config_dir_changed_only(self, capsys, mock_cassandra, tmpdir):
+        directory = str(tmpdir.mkdir("conf.d"))
+        shutil.copy(
+            os.path.join(tests.TEST_ROOT, "configs/excalibur_change_comments.yaml"),
+            directory,
+        )
+        args = [
+            "-i",
+            mock_cassandra.host,
+            "-p",
+            str(mock_cassandra.port),
+            "--parse-cache",
+            os.path.join(str(tmpdir), "parse.cache"),
+            "--changed-only",
+            directory,
+        ]
+
+        cli.TablePropertiesCli().execute(args)
+        out, _ = capsys.readouterr()
+        assert out.count("ALTER TABLE") == 2
+
+        # The file did not change since the last run
+        cli.TablePropertiesCli().execute(args)
+        out, _ = capsys.readouterr()
+        assert out == ""
+
+    def test_invoke_changed_only_after_failed_run(self, capsys, mock_cassandra, tmpdir):
+        directory = str(tmpdir.mkdir("conf.d"))
+        shutil.copy(
+            os.path.join(tests.TEST_ROOT, "configs/excalibur_change_comments.yaml"),
+            directory,
+        )
+        cache_args = [
+            "--parse-cache",
+            os.path.join(str(tmpdir), "parse.cache"),
+            "--changed-only",
+            directory,
+        ]
+
+        # Nothing listens on the port of a stopped server
+        with MockCassandraServer() as stopped:
+            stopped_port = stopped.port
+        with pytest.raises(Exception):
+            cli.TablePropertiesCli().execute(
+                ["-i", "127.0.0.1", "-p", str(stopped_port)] + cache_args
+            )
+        capsys.readouterr()
+
+        # The change is still reported by the next run
+        cli.TablePropertiesCli().execute(
+            ["-i", mock_cassandra.host, "-p", str(mock_cassandra.port)] + cache_args
+        )
+        out, _ = capsys.readouterr()
+        assert out.count("ALTER TABLE") == 2
+
+    def test_invoke_reference_cluster(self, capsys, mock_cassandra, reference_cassandra):
+        reference = "{}:{}".format(reference_cassandra.host, reference_cassandra.port)
+        cmd = cli.TablePropertiesCli()
+        cmd.execute(
+            ["-i", mock_cassandra.host, "-p", str(mock_cassandra.port), "-f", "ndjson"]
+            + ["--reference", reference]
+        )
+        out, _ = capsys.readouterr()
+        records = [json.loads(line) for line in out.splitlines()]
+        assert [rec["table"] for rec in records] == ["monkeyspecies", "monkeyspecies2"]
+        assert {rec["desired"] for rec in records} == {"Reference comment"}
+
+    def test_reference_params(self):
+        params = db.ConnectionParams(host="10.0.0.1", port=9000, username="user")
+        params.password = "secret"
+        reference = cli.TablePropertiesCli.get_reference_params(params, "10.0.0.2:9001")
+        assert (reference.host, reference.port) == ("10.0.0.2", 9001)
+        assert reference.auth_provider is not None
+        assert params.host == "10.0.0.1"
+
+        reference = cli.TablePropertiesCli.get_reference_params(params, "10.0.0.3")
+        assert (reference.host, reference.port) == ("10.0.0.3", 9000)
+        assert reference.load_balancing_policy is not params.load_balancing_policy
+
+    def test_invoke_fast_connect(self, capsys, mock_cassandra):
+        config = os.path.join(tests.TEST_ROOT, "configs/excalibur_change_comments.yaml")
+        cmd = cli.TablePropertiesCli()
+        cmd.execute(
+            ["-i", mock_cassandra.host, "-p", str(mock_cassandra.port)]
+            + ["--fast-connect", "--protocol-version", "4", config]
+            + ["--compression", "none", "--fetch-size", "1"]
+        )
+        out, _ = capsys.readouterr()
+        assert out.count("ALTER TABLE") == 2
+        assert mock_cassandra.stats["connections"] == 2
+
+    def test_invoke_snapshot(self, capsys, mock_cassandra, tmpdir):
+        conn_args = ["-i", mock_cassandra.host, "-p", str(mock_cassandra.port)]
+        store_args = ["--snapshot", str(tmpdir), "--cluster-name", "prod"]
+        cmd = cli.TablePropertiesCli()
+        cmd.execute(conn_args + store_args + ["--dump"])
+        mock_cassandra.schema.alter(
+            "system_schema.tables", "excalibur", "monkeyspecies", {"comment": "changed"}
+        )
+        cmd.execute(conn_args + store_args + ["--dump"])
+        out, _ = capsys.readouterr()
+        assert out.count("prod/") == 2
+
+        cmd.execute(store_args + ["--snapshot-diff", "prod/latest~1", "prod/latest"])
+        out, _ = capsys.readouterr()
+        assert out == (
+            "excalibur.monkeyspecies comment: "
+            "'Important biological records' -> 'changed'\n"
+        )
+
+        with pytest.raises(SystemExit):
+            cmd.execute(store_args + ["--snapshot-diff", "prod/latest~2", "prod/latest"])
+        _, err = capsys.readouterr()
+        assert "not found" in err
+
+    def test_invoke_snapshot_invalid_cluster_name(self, capsys, tmpdir):
+        store = os.path.join(str(tmpdir), "store")
+        with pytest.raises(SystemExit):
+            cli.TablePropertiesCli().execute(
+                ["-d", "--snapshot", store, "--cluster-name", "../prod"]
+            )
+        out, _ = capsys.readouterr()
+        assert "Invalid name '../prod'" in out
+        assert not os.path.exists(store)
+
+    def test_invoke_inventory(self, capsys, mock_cassandra, tmpdir):
+        database = os.path.join(str(tmpdir), "fleet.db")
+        cluster = "prod={}:{}".format(mock_cassandra.host, mock_cassandra.port)
+        cmd = cli.TablePropertiesCli()
+        cmd.execute(["inventory", database, "--refresh", cluster])
+        cmd.execute(["inventory", database, "--refresh", cluster])
+        _, err = capsys.readouterr()
+        assert err == "prod: refreshed\nprod: unchanged\n"
+
+        cmd.execute(["inventory", database, "--where", "gc_grace_seconds>=864000"])
+        out, _ = capsys.readouterr()
+        assert out == "prod excalibur.monkeyspecies\nprod excalibur.monkeyspecies2\n"
+
+        with pytest.raises(SystemExit):
+            cmd.execute(["inventory", database, "--where", "comment<abc"])
+
+    def test_invoke_inventory_failed(self, capsys, mock_cassandra, tmpdir):
+        database = os.path.join(str(tmpdir), "fleet.db")
+        with MockCassandraServer() as stopped:
+            stopped_port = stopped.port
+        with pytest.raises(SystemExit) as ex:
+            cli.TablePropertiesCli().execute(
+                ["inventory", database]
+                + ["--refresh", "down=127.0.0.1:{}".format(stopped_port)]
+                + ["--refresh", "prod={}:{}".format(mock_cassandra.host,
+                                                   mock_cassandra.port)]
+            )
+        assert ex.value.code == 1
+        _, err = capsys.readouterr()
+        assert err.endswith("down: failed\nprod: refreshed\n")
+
+    def test_invoke_profile(self, capsys, mock_cassandra, tmpdir):
+        profile_dir = os.path.join(str(tmpdir), "profile")
+        config = os.path.join(tests.TEST_ROOT, "configs/excalibur_change_comments.yaml")
+        cmd = cli.TablePropertiesCli()
+        cmd.execute(
+            ["-i", mock_cassandra.host, "-p", str(mock_cassandra.port)]
+            + ["--profile", profile_dir, config]
+        )
+        out, _ = capsys.readouterr()
+        assert out.count("ALTER TABLE") == 2
+        assert sorted(os.listdir(profile_dir)) == [
+            "connect.pstats",
+            "generator.pstats",
+            "get_keyspace_configs.pstats",
+            "get_table_configs.pstats",
+            "summary.txt",
+            "yaml.pstats",
+        ]
+
     def test_invoke_load_rc_nonexisting(self, capsys):
         test_file = os.path.join(tests.TEST_ROOT, "setup/cqlshrc12345")
         cmd = cli.TablePropertiesCli()
@@ -56,3 +519,80 @@ class TestTablePropertiesCli:
         parser = cli.TablePropertiesCli.get_arg_parser()
         assert parser is not None
         assert isinstance(parser, argparse.ArgumentParser)
+
+    def test_connection_args(self):
+        args = ["--cqlshrc", "rc", "-s", "-u", "user", "--fetch-size", "10", "db"]
+        tpc = cli.TablePropertiesCli
+        main_args = tpc.get_arg_parser().parse_args(args[:-1])
+        inventory_args = tpc.get_inventory_arg_parser().parse_args(args)
+        for parsed in (main_args, inventory_args):
+            assert (parsed.rc_file, parsed.use_ssl, parsed.username) == (
+                "rc", True, "user"
+            )
+            assert parsed.fetch_size == 10
+        cmd = cli.TablePropertiesCli()
+        # pylint: disable=protected-access
+        cmd._args = tpc.get_arg_parser().parse_args(["-s", "--tls-min-version", "1.1"])
+        assert cmd.get_connection_params(None).tls_min_version == "1.1"
+        for fetch_size in ("0", "-1", "x"):
+            with pytest.raises(SystemExit):
+                tpc.get_arg_parser().parse_args(["--fetch-size", fetch_size])
+        for option in ("--rate", "--agreement-timeout", "--rewrite-rate"):
+            for value in ("0", "-1", "nan", "x"):
+                with pytest.raises(SystemExit):
+                    tpc.get_arg_parser().parse_args([option, value])
+            assert getattr(
+                tpc.get_arg_parser().parse_args([option, "0.5"]),
+                option[2:].replace("-", "_"),
+            ) == 0.5
+        # Misspelt switch of earlier versions
+        assert tpc.get_arg_parser().parse_args(["--cqlsgrc", "rc"]).rc_file == "rc"
+
+    def test_incremental_output(self, tmpdir):
+        state_file = os.path.join(str(tmpdir), "state.json")
+        change_sets = [
+            ("ks", "a", [{"property": "comment", "current": "", "desired": "a"}]),
+            ("ks", "b", [{"property": "comment", "current": "", "desired": "b"}]),
+        ]
+        tpc = cli.TablePropertiesCli
+        assert tpc.filter_incremental(change_sets, state_file) == (change_sets, [])
+        # Unchanged drift is not reported again
+        assert tpc.filter_incremental(change_sets, state_file) == ([], [])
+        assert tpc.filter_incremental(change_sets[1:], state_file) == ([], ["ks.a"])
+
+    def test_write_changes(self):
+        change_sets = [
+            ("ks", None, [{"property": "durable_writes", "current": True,
+                           "desired": False}]),
+            ("ks", "a", [{"property": "comment", "current": "", "desired": "a"},
+                         {"property": "gc_grace_seconds", "current": 864000,
+                          "desired": 3600}]),
+        ]
+        tpc = cli.TablePropertiesCli
+
+        out = io.StringIO()
+        assert tpc.write_changes(change_sets, cli.OUTPUT_FORMAT_CQL, ["ks.b"], out)
+        assert out.getvalue() == (
+            'ALTER KEYSPACE "ks" WITH durable_writes = False;'
+            '\nALTER TABLE "ks"."a"\nWITH comment = \'a\'\n'
+            "AND gc_grace_seconds = '3600';\n-- Resolved: ks.b\n"
+        )
+
+        out = io.StringIO()
+        assert tpc.write_changes(change_sets, cli.OUTPUT_FORMAT_NDJSON, ["ks.b"], out)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert len(records) == 4
+        assert records[0] == {"keyspace": "ks", "table": None,
+                              "property": "durable_writes", "current": True,
+                              "desired": False}
+        assert records[-1] == {"keyspace": "ks", "table": "b", "resolved": True}
+
+        out = io.StringIO()
+        assert tpc.write_changes(change_sets, cli.OUTPUT_FORMAT_JSON, [], out)
+        assert [rec["property"] for rec in json.loads(out.getvalue())] == [
+            "durable_writes", "comment", "gc_grace_seconds"
+        ]
+
+        out = io.StringIO()
+        assert not tpc.write_changes([], cli.OUTPUT_FORMAT_JSON, [], out)
+        assert json.loads(out.getvalue()) == []
@@ -0,0 +1,128 @@
+# pylint: disable=missing-docstring, no-self-use
+import os
+
+import pytest
+
+import tableproperties.configdir as configdir
+
+KEYSPACE_CONFIG = """keyspaces:
+- name: {name}
+  durable_writes: true
+  tables:
+  - name: tbl
+    comment: {comment}
+"""
+
+
+def write_config(directory: str, name: str, comment: str = "a") -> str:
+    filename = os.path.join(directory, name + ".yaml")
+    with open(filename, "w", encoding="utf-8") as out:
+        out.write(KEYSPACE_CONFIG.format(name=name, comment=comment))
+    return filename
+
+
+class TestConfigDir:
+    def test_merge_configs(self):
+        merged = configdir.merge_configs(
+            [
+                {"keyspaces": [{"name": "a", "durable_writes": True, "tables": [1]}]},
+                {"keyspaces": [{"name": "b", "tables": []}]},
+                {"keyspaces": [{"name": "a", "durable_writes": False, "tables": [2]}]},
+            ]
+        )
+        assert merged == {
+            "keyspaces": [
+                {"name": "a", "durable_writes": False, "tables": [1, 2]},
+                {"name": "b", "tables": []},
+            ]
+        }
+
+    def test_load_with_parse_cache(self, tmpdir):
+        directory = str(tmpdir.mkdir("conf.d"))
+        cache = os.path.join(str(tmpdir), "parse.cache")
+        for name in ("ks1", "ks2", "ks3"):
+            write_config(directory, name)
+        with open(os.path.join(directory, "README"), "w") as out:
+            out.write("not a config")
+
+        config, changed, entries = configdir.load_config_dir(
+            directory, cache, workers=2
+        )
+        assert [ks["name"] for ks in config["keyspaces"]] == ["ks1", "ks2", "ks3"]
+        assert changed == {"ks1", "ks2", "ks3"}
+
+        # The cache is only written by the caller
+        assert not os.path.exists(cache)
+        _, changed, _ = configdir.load_config_dir(directory, cache)
+        assert changed == {"ks1", "ks2", "ks3"}
+        configdir.save_parse_cache(cache, entries)
+
+        # Nothing changed
+        config, changed, entries = configdir.load_config_dir(directory, cache)
+        assert len(config["keyspaces"]) == 3
+        assert changed == set()
+
+        # Touched without changing the content
+        filename = write_config(directory, "ks2")
+        stat = os.stat(filename)
+        os.utime(filename, (stat.st_atime, stat.st_mtime + 10))
+        _, changed, entries = configdir.load_config_dir(directory, cache)
+        assert changed == set()
+        configdir.save_parse_cache(cache, entries)
+
+        filename = write_config(directory, "ks3", comment="changed")
+        os.utime(filename, (stat.st_atime, stat.st_mtime + 20))
+        config, changed, _ = configdir.load_config_dir(directory, cache)
+        assert changed == {"ks3"}
+        assert config["keyspaces"][2]["tables"][0]["comment"] == "changed"
+
+    def test_invalid_files(self, tmpdir):
+        directory = str(tmpdir)
+        write_config(directory, "ks1")
+        for name in ("bad1.yaml", "bad2.yaml"):
+            with open(os.path.join(directory, name), "w") as out:
+                out.write("keyspaces:\n- durable_writes: 1\n")
+
+        with pytest.raises(configdir.ConfigDirError) as ex:
+            configdir.load_config_dir(directory)
+        assert [err.filename for err in ex.value.file_errors] == [
+            os.path.join(directory, "bad1.yaml"),
+            os.path.join(directory, "bad2.yaml"),
+        ]
+        assert "bad2.yaml:2:19: Property 'durable_writes' must be a boolean" in str(
+            ex.value
+        )
+
+    def test_duplicate_tables(self, tmpdir):
+        directory = str(tmpdir)
+        write_config(directory, "ks1")
+        with open(os.path.join(directory, "ks2.yaml"), "w") as out:
+            out.write(KEYSPACE_CONFIG.format(name="ks1", comment="b"))
+
+        with pytest.raises(configdir.ConfigDirError) as ex:
+            configdir.load_config_dir(directory)
+        assert str(ex.value) == (
+            "{}:5:11: Duplicate table 'ks1.tbl', already defined in '{}'".format(
+                os.path.join(directory, "ks2.yaml"), os.path.join(directory, "ks1.yaml")
+            )
+        )
+
+    def test_uncacheable_values(self, tmpdir):
+        directory = str(tmpdir.mkdir("conf.d"))
+        cache = os.path.join(str(tmpdir), "parse.cache")
+        write_config(directory, "ks1")
+        with open(os.path.join(directory, "ks2.yaml"), "w") as out:
+            out.write(
+                KEYSPACE_CONFIG.format(name="ks2", comment="a")
+                + "    extensions:\n      key: !!binary AAE=\n"
+            )
+
+        _, _, entries = configdir.load_config_dir(directory, cache)
+        configdir.save_parse_cache(cache, entries)
+        assert list(configdir.load_parse_cache(cache)) == [
+            os.path.join(directory, "ks1.yaml")
+        ]
+        # The binary value is parsed again instead of being read back as a string
+        config, changed, _ = configdir.load_config_dir(directory, cache)
+        assert changed == {"ks2"}
+        assert config["keyspaces"][1]["tables"][0]["extensions"] == {"key": b"\x00\x01"}
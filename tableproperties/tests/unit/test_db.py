@@ -1,9 +1,20 @@
 # pylint: disable=missing-docstring, invalid-name, no-self-use
+import socket
+import ssl
+import threading
+import time
+import uuid
+
 import pytest
+import yaml
 
-from cassandra import policies
+from cassandra import cqltypes, policies, util
 
 import tableproperties.db as db
+from tableproperties.tests.mockcassandra import MockCassandraServer, MockSchema
+
+TLS_CERT = "tableproperties/tests/setup/tls.crt"
+TLS_KEY = "tableproperties/tests/setup/tls.key"
 
 
 # pylint: disable=too-few-public-methods
@@ -23,12 +34,208 @@ class TestDb:
         assert d.convert_value("test") == "test"
         assert d.convert_value([1, 2]) == [1, 2]
 
+    def test_prepare_once_per_session(self):
+        class Session:
+            def __init__(self):
+                self.prepared = []
+
+            def prepare(self, query_stmt):
+                self.prepared.append(query_stmt)
+                return query_stmt
+
+        d = db.Db()
+        d._session = Session()  # pylint: disable=protected-access
+        assert d.prepare(db.TABLES_QUERY) == db.TABLES_QUERY
+        assert d.prepare(db.TABLES_QUERY) == db.TABLES_QUERY
+        assert d.session.prepared == [db.TABLES_QUERY]
+
+    def test_session_created_once(self):
+        class Cluster:
+            def __init__(self):
+                self.sessions = []
+
+            def connect(self):
+                time.sleep(0.05)
+                session = Cluster()
+                self.sessions.append(session)
+                return session
+
+        d = db.Db()
+        d.cluster = Cluster()
+        threads = [
+            threading.Thread(target=lambda: d.session) for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(d.cluster.sessions) == 1
+        assert d.session is d.cluster.sessions[0]
+
     def test_bad_host(self):
         with pytest.raises(Exception):
             d = db.Db(db.ConnectionParams(host="127.0.0.2"))
             d.check_connection()
 
 
+class TestDbMockCassandra:
+    @staticmethod
+    def connect(server) -> db.Db:
+        return db.Db(db.ConnectionParams(host=server.host, port=server.port))
+
+    def test_current_config(self, mock_cassandra):
+        with open("./tableproperties/tests/mocks/excalibur.yaml", "r") as f:
+            expected = yaml.safe_load(f)
+
+        with self.connect(mock_cassandra) as d:
+            assert d.check_connection()
+            assert d.get_current_config(drop_ids=True) == expected
+
+    def test_fast_connect(self, mock_cassandra):
+        with open("./tableproperties/tests/mocks/excalibur.yaml", "r") as f:
+            expected = yaml.safe_load(f)
+
+        params = db.ConnectionParams(
+            host=mock_cassandra.host, port=mock_cassandra.port, fast_connect=True
+        )
+        with db.Db(params) as d:
+            d.connect()
+            # No protocol downgrade and no schema metadata queries
+            assert mock_cassandra.stats["connections"] == 2
+            assert not d.cluster.metadata.keyspaces
+            assert d.get_current_config(drop_ids=True) == expected
+
+    @pytest.mark.skipif(
+        not db.is_compression_available("lz4"), reason="lz4 is not installed"
+    )
+    def test_compression_and_fetch_size(self):
+        with open("./tableproperties/tests/mocks/excalibur.yaml", "r") as f:
+            expected = yaml.safe_load(f)
+
+        with MockCassandraServer(
+            MockSchema.from_config(expected), compressions=("lz4",)
+        ) as server:
+            params = db.ConnectionParams(
+                host=server.host, port=server.port, compression="lz4", fetch_size=1
+            )
+            with db.Db(params) as d:
+                d.connect()
+                executes = server.stats["executes"]
+                assert d.get_current_config(drop_ids=True) == expected
+                # One page per row plus the last empty page
+                assert server.stats["executes"] - executes > 4
+
+    def test_paging_and_prepared_statements(self, mock_cassandra):
+        with self.connect(mock_cassandra) as d:
+            d.connect(warm_up=True)
+            prepares = mock_cassandra.stats["prepares"]
+            executes = mock_cassandra.stats["executes"]
+
+            rows = list(d.iter_query(db.TABLES_QUERY, ("excalibur",), fetch_size=1))
+            assert [row["table_name"] for row in rows] == [
+                "monkeyspecies",
+                "monkeyspecies2",
+            ]
+            d.get_table_configs("excalibur", True)
+
+            # One page per row and no re-preparing on the shared session
+            assert mock_cassandra.stats["executes"] - executes == 3
+            assert mock_cassandra.stats["prepares"] == prepares
+
+    def test_size_estimates(self, mock_cassandra):
+        mock_cassandra.schema.add_size_estimate("excalibur", "monkeyspecies", 4000)
+        mock_cassandra.schema.add_size_estimate("excalibur", "monkeyspecies2", 800, 2)
+        with self.connect(mock_cassandra) as d:
+            assert d.get_size_estimates() == {
+                ("excalibur", "monkeyspecies"): 4000,
+                ("excalibur", "monkeyspecies2"): 800,
+            }
+
+    def test_data_center_nodes(self, mock_cassandra):
+        mock_cassandra.peer_count = 2
+        with self.connect(mock_cassandra) as d:
+            assert d.get_data_center_nodes() == {"datacenter1": 3}
+
+    def test_partial_config(self, mock_cassandra):
+        with self.connect(mock_cassandra) as d:
+            d.connect()
+            queries = mock_cassandra.stats["queries"] + mock_cassandra.stats["executes"]
+            config = d.get_partial_config(
+                [("excalibur", "monkeyspecies2"), ("excalibur", "missing")],
+                drop_ids=True,
+            )
+            keyspace = config["keyspaces"][0]
+            assert keyspace["name"] == "excalibur"
+            assert [tbl["name"] for tbl in keyspace["tables"]] == ["monkeyspecies2"]
+            assert d.get_table_config("excalibur", "missing", True) is None
+            # One keyspace, one batched table and one single table query
+            assert (
+                mock_cassandra.stats["queries"]
+                + mock_cassandra.stats["executes"]
+                - queries
+                == 3
+            )
+
+    def test_synthetic_schema_with_latency(self):
+        schema = MockSchema.synthetic(keyspace_count=2, table_count=1500)
+        with MockCassandraServer(schema, latency=0.01) as server:
+            with self.connect(server) as d:
+                d.connect()
+                start = time.time()
+                config = d.get_current_config()
+                assert time.time() - start >= 0.03
+                assert [len(ks["tables"]) for ks in config["keyspaces"]] == [1500, 1500]
+
+
+class TestRowNormalizer:
+    COLUMN_NAMES = ["keyspace_name", "table_name", "caching", "flags", "id", "comment"]
+    COLUMN_TYPES = [
+        cqltypes.UTF8Type,
+        cqltypes.UTF8Type,
+        cqltypes.MapType.apply_parameters([cqltypes.UTF8Type, cqltypes.UTF8Type]),
+        cqltypes.SetType.apply_parameters([cqltypes.UTF8Type]),
+        cqltypes.UUIDType,
+        cqltypes.UTF8Type,
+    ]
+
+    def test_normalize(self):
+        table_id = uuid.uuid4()
+        row = (
+            "excalibur",
+            "monkeyspecies",
+            {"keys": "ALL", "rows_per_partition": "10"},
+            util.SortedSet(["compound"]),
+            table_id,
+            None,
+        )
+        normalize = db.RowNormalizer(
+            self.COLUMN_NAMES, self.COLUMN_TYPES, db.get_skipped_table_columns(False)
+        )
+        assert normalize(row) == {
+            "name": "monkeyspecies",
+            "caching": {"keys": "ALL", "rows_per_partition": 10},
+            "flags": ["compound"],
+            "id": str(table_id),
+            "comment": None,
+        }
+        assert list(normalize(row)) == ["name", "caching", "flags", "id", "comment"]
+
+        normalize = db.RowNormalizer(
+            self.COLUMN_NAMES, self.COLUMN_TYPES, db.get_skipped_table_columns(True)
+        )
+        null_row = ("excalibur", "monkeyspecies", None, None, table_id, "")
+        assert normalize(null_row) == {
+            "name": "monkeyspecies",
+            "caching": None,
+            "flags": None,
+            "comment": "",
+        }
+
+    def test_single_column(self):
+        normalize = db.RowNormalizer(["table_name"], [cqltypes.UTF8Type])
+        assert normalize(("monkeyspecies",)) == {"name": "monkeyspecies"}
+
+
 class TestConnectionParams:
     def test_defaults(self):
         cp = db.ConnectionParams()
@@ -69,6 +276,89 @@ class TestConnectionParams:
         cp.is_ssl_required = True
         assert cp.ssl_context is not None
 
+    def test_security_context_cached(self):
+        cp = db.ConnectionParams(
+            client_cert_filename=TLS_CERT, client_key_filename=TLS_KEY
+        )
+        other = db.ConnectionParams(ssl_required=True)
+        other.client_cert_file = TLS_CERT
+        other.client_key_file = TLS_KEY
+        assert cp.ssl_context is other.ssl_context
+        assert cp.ssl_context is not db.ConnectionParams(ssl_required=True).ssl_context
+        assert cp.ssl_context.minimum_version == ssl.TLSVersion.TLSv1_2
+        assert cp.ssl_options["ssl_version"] != ssl.PROTOCOL_TLSv1
+        cp.client_cert_file = None
+        assert cp.ssl_context is None
+
+    def test_tls_min_version(self):
+        cp = db.ConnectionParams(ssl_required=True, tls_min_version="1.0")
+        assert cp.tls_min_version == "1.0"
+        assert cp.ssl_context.minimum_version == ssl.TLSVersion.TLSv1
+        assert cp.ssl_context is not db.ConnectionParams(ssl_required=True).ssl_context
+        cp.tls_min_version = None
+        assert cp.ssl_context.minimum_version == ssl.TLSVersion.TLSv1_2
+        with pytest.raises(ValueError):
+            db.create_ssl_context(None, None, tls_min_version="2.0")
+
+    @pytest.mark.skipif(
+        not db.SESSION_RESUMPTION_SUPPORTED, reason="requires Python 3.7"
+    )
+    def test_session_resumption(self):
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(certfile=TLS_CERT, keyfile=TLS_KEY)
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(2)
+
+        def serve():
+            for _ in range(2):
+                conn, _ = listener.accept()
+                with server_context.wrap_socket(conn, server_side=True) as tls_conn:
+                    tls_conn.sendall(b"x")
+                    tls_conn.recv(1)
+
+        thread = threading.Thread(target=serve, daemon=True)
+        thread.start()
+
+        context = db.create_ssl_context(None, None)
+        reused = []
+        for _ in range(2):
+            with context.wrap_socket(socket.socket()) as tls_sock:
+                tls_sock.connect(listener.getsockname())
+                tls_sock.recv(1)
+                reused.append(tls_sock.session_reused)
+                tls_sock.sendall(b"x")
+        thread.join(5)
+        listener.close()
+        assert reused == [False, True]
+
+    def test_fast_connect_options(self):
+        cp = db.ConnectionParams()
+        assert cp.cluster_options == {}
+        cp.fast_connect = True
+        assert cp.cluster_options == {
+            "protocol_version": db.FAST_CONNECT_PROTOCOL_VERSION,
+            "connect_timeout": db.FAST_CONNECT_TIMEOUT,
+            "control_connection_timeout": db.FAST_CONNECT_TIMEOUT,
+            "schema_metadata_enabled": False,
+            "token_metadata_enabled": False,
+        }
+        cp = db.ConnectionParams(protocol_version=3, connect_timeout=10.0)
+        assert cp.cluster_options == {
+            "protocol_version": 3,
+            "connect_timeout": 10.0,
+            "control_connection_timeout": 10.0,
+        }
+
+    def test_compression_options(self):
+        cp = db.ConnectionParams(compression=db.COMPRESSION_NONE, fetch_size=100)
+        assert cp.cluster_options == {"compression": False}
+        assert cp.fetch_size == 100
+        cp.compression = "lz4"
+        assert cp.cluster_options == {"compression": "lz4"}
+        assert db.is_compression_available(db.COMPRESSION_NONE)
+        assert not db.is_compression_available("zstd")
+
     def test_load_rc(self):
         cp = db.ConnectionParams.load_from_rcfile("tableproperties/tests/setup/cqlshrc")
         assert cp is not None
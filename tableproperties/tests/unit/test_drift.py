@@ -0,0 +1,41 @@
+# pylint: disable=missing-docstring, no-self-use
+import os
+
+import tableproperties.drift as drift
+
+STATEMENTS = [
+    ("excalibur", None, "ALTER KEYSPACE \"excalibur\" WITH durable_writes = False;"),
+    ("excalibur", "monkeyspecies", "\nALTER TABLE ... WITH comment = 'a';"),
+    ("excalibur", "monkeyspecies2", "\nALTER TABLE ... WITH comment = 'b';"),
+]
+
+
+class TestDriftState:
+    def test_drift_keys(self):
+        assert drift.get_drift_key("ks") == "ks"
+        assert drift.get_drift_key("ks", "tbl") == "ks.tbl"
+
+    def test_get_drift_state(self):
+        state = drift.get_drift_state(STATEMENTS)
+        assert sorted(state.keys()) == [
+            "excalibur",
+            "excalibur.monkeyspecies",
+            "excalibur.monkeyspecies2",
+        ]
+        assert state["excalibur.monkeyspecies"] == drift.get_digest(STATEMENTS[1][2])
+
+    def test_diff_drift_states(self):
+        previous = drift.get_drift_state(STATEMENTS[:2])
+        current = drift.get_drift_state(
+            [STATEMENTS[0], ("excalibur", "monkeyspecies2", "changed")]
+        )
+        new_keys, resolved_keys = drift.diff_drift_states(previous, current)
+        assert new_keys == ["excalibur.monkeyspecies2"]
+        assert resolved_keys == ["excalibur.monkeyspecies"]
+
+    def test_save_and_load(self, tmpdir):
+        filename = os.path.join(str(tmpdir), "state.json")
+        assert drift.load_drift_state(filename) == {}
+        state = drift.get_drift_state(STATEMENTS)
+        drift.save_drift_state(filename, state)
+        assert drift.load_drift_state(filename) == state
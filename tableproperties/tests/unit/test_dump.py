@@ -0,0 +1,49 @@
+# pylint: disable=missing-docstring, no-self-use
+import io
+import json
+
+import yaml
+
+import tableproperties.dump as dump
+import tableproperties.validation as validation
+
+
+def iter_keyspaces(config: dict):
+    for keyspace in config["keyspaces"]:
+        props = {k: v for k, v in keyspace.items() if k != "tables"}
+        yield props, iter(keyspace.get("tables", []))
+
+
+class TestDump:
+    def test_yaml_stream(self, default_database):
+        config = default_database.get_current_config()
+        config["keyspaces"].append({"name": "empty", "durable_writes": True})
+        out = io.StringIO()
+
+        assert dump.write_yaml_stream(iter_keyspaces(config), out) == 2
+
+        # Same layout as the regular dump
+        assert yaml.safe_load(out.getvalue()) == {
+            "keyspaces": [
+                config["keyspaces"][0],
+                {"name": "empty", "durable_writes": True, "tables": []},
+            ]
+        }
+        assert validation.load_config(out.getvalue())["keyspaces"][1]["name"] == "empty"
+
+    def test_ndjson_stream(self, default_database):
+        config = default_database.get_current_config()
+        out = io.StringIO()
+
+        assert dump.write_ndjson_stream(iter_keyspaces(config), out) == 1
+
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [rec["type"] for rec in records] == ["keyspace", "table", "table"]
+        assert records[0]["name"] == "excalibur"
+        assert records[1]["keyspace"] == "excalibur"
+        assert records[1]["name"] == "monkeyspecies"
+
+    def test_empty_stream(self):
+        out = io.StringIO()
+        assert dump.write_yaml_stream([], out) == 0
+        assert out.getvalue() == ""
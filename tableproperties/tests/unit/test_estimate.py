@@ -0,0 +1,150 @@
+# pylint: disable=missing-docstring, no-self-use
+import tableproperties.estimate as estimate
+import tableproperties.plan as plan
+
+STCS = {"class": "org.apache.cassandra.db.compaction.SizeTieredCompactionStrategy"}
+LCS = {"class": "LeveledCompactionStrategy", "sstable_size_in_mb": 1}
+GIB = 1 << 30
+
+
+def change(prop: str, current, desired) -> dict:
+    return {"property": prop, "current": current, "desired": desired}
+
+
+class TestEstimate:
+    def test_replication_factor(self):
+        simple = {"class": "SimpleStrategy", "replication_factor": "3"}
+        assert estimate.get_replication_factor(simple, "dc1") == 3
+        assert estimate.get_replication_factor(simple, "dc2") == 3
+        nts = {"class": "NetworkTopologyStrategy", "dc1": "3/1"}
+        assert estimate.get_replication_factor(nts, "dc1") == 3
+        assert estimate.get_replication_factor(nts, "dc2") == 0
+
+    def test_node_bytes_simple_strategy(self):
+        simple = {"class": "org.apache.cassandra.locator.SimpleStrategy",
+                  "replication_factor": "3"}
+        nodes = {"dc1": 6, "dc2": 2}
+        # 3 replicas spread over all 8 nodes, whichever data center
+        assert estimate.get_node_bytes(simple, "dc1", nodes, 800 * GIB) == 300 * GIB
+        assert estimate.get_node_bytes(simple, "dc2", nodes, 800 * GIB) == 300 * GIB
+        # More replicas than nodes
+        assert estimate.get_node_bytes(simple, "dc1", {"dc1": 2}, GIB) == GIB
+
+        nts = {"class": "NetworkTopologyStrategy", "dc1": "3", "dc2": "1"}
+        assert estimate.get_node_bytes(nts, "dc1", nodes, 800 * GIB) == 400 * GIB
+        assert estimate.get_node_bytes(nts, "dc2", nodes, 800 * GIB) == 400 * GIB
+        assert estimate.get_node_bytes(nts, "dc3", nodes, 800 * GIB) == 0
+
+    def test_node_cost(self):
+        switch_to_lcs = [change("compaction", STCS, LCS)]
+        assert estimate.estimate_node_cost(switch_to_lcs, LCS, GIB) == (GIB, 11 << 20)
+        switch_to_stcs = [change("compaction", LCS, STCS)]
+        assert estimate.estimate_node_cost(switch_to_stcs, STCS, GIB) == (GIB, GIB)
+        # Options of the same strategy only affect future compactions
+        options = [change("compaction", STCS, dict(STCS, min_threshold=8))]
+        assert estimate.estimate_node_cost(options, STCS, GIB) == (0, 0)
+
+        chunk = [change("compression", {"chunk_length_in_kb": 64},
+                        {"chunk_length_in_kb": 16})]
+        assert estimate.estimate_node_cost(chunk, STCS, GIB) == (GIB, GIB // 2)
+        assert estimate.estimate_node_cost(chunk, LCS, GIB) == (GIB, 1 << 20)
+        bloom = [change("bloom_filter_fp_chance", 0.01, 0.1)]
+        assert estimate.estimate_node_cost(bloom, STCS, GIB) == (GIB, GIB // 2)
+        # The compaction switch rewrites with the new compression as well
+        assert estimate.estimate_node_cost(chunk + switch_to_stcs, STCS, GIB) == (
+            GIB,
+            GIB,
+        )
+        assert estimate.estimate_node_cost(chunk, STCS, 0) == (0, 0)
+
+    def test_estimate_plan(self):
+        current_config = {
+            "keyspaces": [
+                {
+                    "name": "ks",
+                    "replication": {"class": "NetworkTopologyStrategy", "dc1": "3",
+                                    "dc2": "1"},
+                    "tables": [
+                        {"name": "a", "compaction": STCS},
+                        {"name": "b", "compaction": LCS},
+                    ],
+                }
+            ]
+        }
+        change_plan = plan.ChangePlan()
+        change_plan.add("ks", None, [change("durable_writes", True, False)])
+        change_plan.add("ks", "a", [change("compaction", STCS, LCS)])
+        change_plan.add("ks", "b", [change("bloom_filter_fp_chance", 0.01, 0.1),
+                                    change("comment", "", "x")])
+        change_plan.add("ks", "c", [change("comment", "", "x")])
+
+        costs = estimate.estimate_plan(
+            change_plan,
+            current_config,
+            {("ks", "a"): 100 * GIB},
+            {"dc1": 6, "dc2": 2},
+        )
+
+        # 800 GiB in the ring, 3 replicas on 6 nodes and 1 replica on 2 nodes
+        assert [
+            (rec["table"], rec["data_center"], rec["properties"], rec["rewrite_bytes"])
+            for rec in costs["tables"]
+        ] == [
+            ("a", "dc1", ["compaction"], 400 * GIB),
+            ("a", "dc2", ["compaction"], 400 * GIB),
+            ("b", "dc1", ["bloom_filter_fp_chance"], 0),
+            ("b", "dc2", ["bloom_filter_fp_chance"], 0),
+        ]
+        assert costs["tables"][0]["estimated_bytes"] == 100 * GIB
+        assert costs["tables"][2]["estimated_bytes"] is None
+        assert costs["data_centers"] == [
+            {
+                "data_center": "dc1",
+                "nodes": 6,
+                "rewrite_bytes": 400 * GIB,
+                "temp_bytes_peak": 11 << 20,
+                "temp_bytes_total": 11 << 20,
+                "cluster_rewrite_bytes": 2400 * GIB,
+            },
+            {
+                "data_center": "dc2",
+                "nodes": 2,
+                "rewrite_bytes": 400 * GIB,
+                "temp_bytes_peak": 11 << 20,
+                "temp_bytes_total": 11 << 20,
+                "cluster_rewrite_bytes": 800 * GIB,
+            },
+        ]
+
+    def test_estimate_plan_simple_strategy(self):
+        current_config = {
+            "keyspaces": [
+                {
+                    "name": "ks",
+                    "replication": {"class": "SimpleStrategy",
+                                    "replication_factor": "2"},
+                    "tables": [{"name": "a", "compaction": STCS}],
+                }
+            ]
+        }
+        change_plan = plan.ChangePlan()
+        change_plan.add("ks", "a", [change("compaction", STCS, LCS)])
+
+        costs = estimate.estimate_plan(
+            change_plan, current_config, {("ks", "a"): 100 * GIB}, {"dc1": 6, "dc2": 2}
+        )
+
+        # 800 GiB in the ring, 2 replicas on 8 nodes
+        assert [
+            (rec["data_center"], rec["rewrite_bytes"]) for rec in costs["tables"]
+        ] == [("dc1", 200 * GIB), ("dc2", 200 * GIB)]
+        assert [
+            dc["cluster_rewrite_bytes"] for dc in costs["data_centers"]
+        ] == [1200 * GIB, 400 * GIB]
+
+    def test_format_bytes(self):
+        assert estimate.format_bytes(None) == "unknown"
+        assert estimate.format_bytes(512) == "512 B"
+        assert estimate.format_bytes(1536) == "1.5 KiB"
+        assert estimate.format_bytes(3 * GIB) == "3.0 GiB"
+        assert estimate.format_bytes(2048 << 40) == "2048.0 TiB"
@@ -0,0 +1,109 @@
+# pylint: disable=missing-docstring, no-self-use
+import os
+from urllib.request import urlopen
+
+import pytest
+import yaml
+
+import tableproperties.db as db
+import tableproperties.exporter as exporter
+from tableproperties import tests
+
+PREFIX = exporter.METRIC_PREFIX
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture()
+def desired_configs():
+    filename = os.path.join(tests.TEST_ROOT, "configs/excalibur_change_comments.yaml")
+    with open(filename, "r") as conf:
+        return [yaml.safe_load(conf)]
+
+
+class TestExporter:
+    def test_format_labels(self):
+        assert exporter.format_labels(()) == ""
+        assert (
+            exporter.format_labels((("keyspace", "ks"), ("table", 'a"b')))
+            == '{keyspace="ks",table="a\\"b"}'
+        )
+
+    def test_histogram(self):
+        histogram = exporter.Histogram((0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        assert histogram.render("fetch") == [
+            'fetch_bucket{le="0.1"} 1',
+            'fetch_bucket{le="1.0"} 2',
+            'fetch_bucket{le="+Inf"} 2',
+            "fetch_sum 0.55",
+            "fetch_count 2",
+        ]
+
+    def test_refresh_on_schedule_and_schema_change(self, mock_cassandra, desired_configs):
+        clock = FakeClock()
+        params = db.ConnectionParams(host=mock_cassandra.host, port=mock_cassandra.port)
+        with db.Db(params) as conn:
+            drift_exporter = exporter.DriftExporter(
+                conn, desired_configs, refresh_interval=60, clock=clock
+            )
+            assert drift_exporter.poll() == "startup"
+            metrics = drift_exporter.render()
+            assert (
+                PREFIX + 'drift_properties{keyspace="excalibur",table="monkeyspecies"} 1'
+                in metrics
+            )
+            assert PREFIX + 'keyspace_drift_objects{keyspace="excalibur"} 2' in metrics
+            assert PREFIX + "drift_objects 2" in metrics
+            assert PREFIX + "fetch_duration_seconds_count 1" in metrics
+
+            clock.now = 30
+            assert drift_exporter.poll() is None
+
+            conn.execute_statement(
+                "ALTER TABLE excalibur.monkeyspecies WITH comment = 'Test comment';"
+            )
+            assert drift_exporter.poll() == "schema_change"
+            metrics = drift_exporter.render()
+            assert PREFIX + "drift_objects 1" in metrics
+            assert PREFIX + 'refreshes_total{reason="schema_change"} 1' in metrics
+
+            clock.now = 90
+            assert drift_exporter.poll() == "schedule"
+
+    def test_refresh_errors_are_counted(self, desired_configs):
+        class BrokenDb:
+            query_count = 0
+
+            def get_schema_versions(self):
+                raise RuntimeError("connection lost")
+
+        drift_exporter = exporter.DriftExporter(BrokenDb(), desired_configs)
+        assert drift_exporter.poll() is None
+        assert PREFIX + "refresh_errors_total 1" in drift_exporter.render()
+
+    def test_metrics_endpoint(self, mock_cassandra, desired_configs):
+        params = db.ConnectionParams(host=mock_cassandra.host, port=mock_cassandra.port)
+        with db.Db(params) as conn:
+            drift_exporter = exporter.DriftExporter(conn, desired_configs)
+            drift_exporter.poll()
+            server = exporter.MetricsServer(("127.0.0.1", 0), drift_exporter)
+            server.start()
+            try:
+                url = "http://127.0.0.1:{}/metrics".format(server.server_address[1])
+                with urlopen(url) as response:
+                    body = response.read().decode("utf-8")
+                    assert response.headers["Content-Type"].startswith("text/plain")
+            finally:
+                server.shutdown()
+                server.server_close()
+
+        assert PREFIX + "drift_objects 2" in body
+        assert PREFIX + "queries_total " in body
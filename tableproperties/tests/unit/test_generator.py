@@ -79,6 +79,70 @@ class TestGenerator:
         assert stmt != ""
         compare_statments(stmt, expected_stmt)
 
+    def test_excalibur_change_records(self, default_database):
+        desired_config = load_yaml(
+            "./tableproperties/tests/configs/excalibur_change_comments.yaml"
+        )
+
+        current_config = default_database.get_current_config(True)
+
+        changes = list(gen.generate_changes(current_config, desired_config))
+
+        assert changes == [
+            {
+                "keyspace": "excalibur",
+                "table": "monkeyspecies",
+                "property": "comment",
+                "current": "Important biological records",
+                "desired": "Test comment",
+            },
+            {
+                "keyspace": "excalibur",
+                "table": "monkeyspecies2",
+                "property": "comment",
+                "current": "Important biological records",
+                "desired": "Test comment 2",
+            },
+        ]
+        # Neither config is modified while comparing
+        assert current_config == default_database.get_current_config(True)
+        assert desired_config == load_yaml(
+            "./tableproperties/tests/configs/excalibur_change_comments.yaml"
+        )
+
+    def test_parallel_diff_matches_serial(self):
+        def make_config(comment: str):
+            return {
+                "keyspaces": [
+                    {
+                        "name": "ks{}".format(ks_idx),
+                        "durable_writes": ks_idx % 2 == 0,
+                        "tables": [
+                            {"name": "tbl{}".format(tbl_idx), "comment": comment}
+                            for tbl_idx in range(50)
+                        ],
+                    }
+                    for ks_idx in range(4)
+                ]
+            }
+
+        current_config = make_config("old")
+        desired_config = make_config("new")
+        desired_config["keyspaces"][1]["durable_writes"] = True
+
+        serial = list(gen.iter_change_sets(current_config, desired_config))
+        parallel = list(
+            gen.iter_change_sets(current_config, desired_config, 2, chunk_size=7)
+        )
+
+        assert len(serial) == 201
+        assert serial[50] == (
+            "ks1",
+            None,
+            [{"property": "durable_writes", "current": False, "desired": True}],
+        )
+        assert parallel == serial
+
     def test_class_name_comparision(self):
         assert gen.do_class_names_match("SimpleStrategy", "SimpleStrategy")
         assert gen.do_class_names_match(
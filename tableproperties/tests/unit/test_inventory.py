@@ -0,0 +1,99 @@
+# pylint: disable=missing-docstring, no-self-use
+import os
+
+import pytest
+import yaml
+
+from tableproperties import db, inventory
+from tableproperties.tests.mockcassandra import MockCassandraServer, MockSchema
+
+
+def load_config() -> dict:
+    with open("./tableproperties/tests/mocks/excalibur.yaml", "r") as f:
+        return yaml.safe_load(f)
+
+
+class TestInventory:
+    def test_property_rows(self):
+        rows = list(inventory.iter_property_rows("prod", load_config()))
+        keys = {(row[2], row[3]): row[4:] for row in rows}
+        assert keys[("", "replication.class")][0].endswith("SimpleStrategy")
+        assert keys[("monkeyspecies", "gc_grace_seconds")] == ("864000", 864000.0)
+        assert ("monkeyspecies", "name") not in keys
+
+    def test_query(self, tmpdir):
+        config = load_config()
+        config["keyspaces"][0]["tables"][1]["gc_grace_seconds"] = 3600
+        with inventory.Inventory(os.path.join(str(tmpdir), "fleet.db")) as fleet:
+            fleet.replace_cluster("prod", "v1", config)
+            fleet.replace_cluster("test", "v1", load_config())
+
+            matches = fleet.query(
+                [
+                    "compaction.class~%SizeTieredCompactionStrategy",
+                    "gc_grace_seconds > 86400",
+                ]
+            )
+            assert matches == [
+                {"cluster": "prod", "keyspace": "excalibur", "table": "monkeyspecies"},
+                {"cluster": "test", "keyspace": "excalibur", "table": "monkeyspecies"},
+                {"cluster": "test", "keyspace": "excalibur", "table": "monkeyspecies2"},
+            ]
+            assert fleet.query(["gc_grace_seconds=3600"]) == [
+                {"cluster": "prod", "keyspace": "excalibur", "table": "monkeyspecies2"}
+            ]
+            assert fleet.query(["durable_writes=true"]) == [
+                {"cluster": "prod", "keyspace": "excalibur", "table": None},
+                {"cluster": "test", "keyspace": "excalibur", "table": None},
+            ]
+
+            fleet.replace_cluster("test", "v2", None)
+            assert [cluster["properties"] for cluster in fleet.get_clusters()] == [
+                len(list(inventory.iter_property_rows("prod", config))),
+                0,
+            ]
+
+    def test_invalid_condition(self):
+        for condition in ("comment", "comment > abc", "a b=1"):
+            with pytest.raises(inventory.InventoryError):
+                inventory.parse_condition(condition)
+
+    def test_refresh(self, mock_cassandra, tmpdir):
+        clusters = {
+            "prod": db.ConnectionParams(
+                host=mock_cassandra.host, port=mock_cassandra.port
+            )
+        }
+        with inventory.Inventory(os.path.join(str(tmpdir), "fleet.db")) as fleet:
+            assert inventory.refresh(fleet, clusters) == {"prod": "refreshed"}
+            assert inventory.refresh(fleet, clusters) == {"prod": "unchanged"}
+
+            mock_cassandra.schema.alter(
+                "system_schema.tables", "excalibur", "monkeyspecies", {"comment": "new"}
+            )
+            assert inventory.refresh(fleet, clusters) == {"prod": "refreshed"}
+            assert fleet.query(["comment=new"]) == [
+                {"cluster": "prod", "keyspace": "excalibur", "table": "monkeyspecies"}
+            ]
+
+    def test_refresh_failed(self, mock_cassandra, tmpdir):
+        with MockCassandraServer() as stopped:
+            stopped_port = stopped.port
+        clusters = {
+            "down": db.ConnectionParams(host="127.0.0.1", port=stopped_port),
+            "prod": db.ConnectionParams(
+                host=mock_cassandra.host, port=mock_cassandra.port
+            ),
+        }
+        with inventory.Inventory(os.path.join(str(tmpdir), "fleet.db")) as fleet:
+            assert inventory.refresh(fleet, clusters) == {
+                "down": "failed",
+                "prod": "refreshed",
+            }
+            assert [cluster["name"] for cluster in fleet.get_clusters()] == ["prod"]
+
+    def test_empty_cluster(self, tmpdir):
+        with MockCassandraServer(MockSchema()) as server:
+            clusters = {"empty": db.ConnectionParams(host=server.host, port=server.port)}
+            with inventory.Inventory(os.path.join(str(tmpdir), "fleet.db")) as fleet:
+                assert inventory.refresh(fleet, clusters) == {"empty": "refreshed"}
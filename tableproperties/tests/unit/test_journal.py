@@ -0,0 +1,106 @@
+# pylint: disable=missing-docstring, no-self-use
+import json
+import os
+
+import tableproperties.db as db
+import tableproperties.journal as journal
+
+CHANGES = [{"property": "comment", "current": "a", "desired": "b"}]
+
+CONFIG = {
+    "keyspaces": [
+        {
+            "name": "excalibur",
+            "durable_writes": False,
+            "tables": [{"name": "monkeyspecies"}, {"name": "monkeyspecies2"}],
+        }
+    ]
+}
+
+
+class TestApplyJournal:
+    def test_record_and_load(self, tmpdir):
+        filename = os.path.join(str(tmpdir), "apply.journal")
+        apply_journal = journal.ApplyJournal(filename)
+        assert apply_journal.load() == []
+        assert apply_journal.applied_keys() == set()
+
+        apply_journal.record("excalibur", None, "ALTER KEYSPACE ...;", CHANGES)
+        apply_journal.record("excalibur", "monkeyspecies", "ALTER TABLE ...;", CHANGES)
+
+        entries = apply_journal.load()
+        assert [entry["table"] for entry in entries] == [None, "monkeyspecies"]
+        assert entries[1]["statement"] == "ALTER TABLE ...;"
+        assert entries[1]["pre_change_digest"] == journal.get_pre_change_digest(
+            CHANGES
+        )
+        assert apply_journal.applied_keys() == {"excalibur", "excalibur.monkeyspecies"}
+
+        with open(filename, "r", encoding="utf-8") as journal_file:
+            assert len([json.loads(line) for line in journal_file]) == 2
+
+    def test_pre_change_digest(self):
+        changed = [dict(CHANGES[0], current="c")]
+        assert journal.get_pre_change_digest(CHANGES) != journal.get_pre_change_digest(
+            changed
+        )
+        assert journal.get_pre_change_digest(CHANGES) == journal.get_pre_change_digest(
+            [dict(CHANGES[0], desired="d")]
+        )
+
+    def test_filter_applied(self):
+        filtered = journal.filter_applied(CONFIG, {"excalibur.monkeyspecies"})
+        keyspace = filtered["keyspaces"][0]
+        assert keyspace["durable_writes"] is False
+        assert [tbl["name"] for tbl in keyspace["tables"]] == ["monkeyspecies2"]
+        assert len(CONFIG["keyspaces"][0]["tables"]) == 2
+
+        filtered = journal.filter_applied(CONFIG, {"excalibur"})
+        keyspace = filtered["keyspaces"][0]
+        assert "durable_writes" not in keyspace
+        assert len(keyspace["tables"]) == 2
+
+        assert journal.filter_applied(None, set()) == {"keyspaces": []}
+
+
+class TestDivergedKeys:
+    @staticmethod
+    def record(apply_journal: journal.ApplyJournal, table: str, current: str,
+               desired: str) -> None:
+        apply_journal.record(
+            "excalibur",
+            table,
+            "ALTER TABLE ...;",
+            [{"property": "comment", "current": current, "desired": desired}],
+        )
+
+    def test_diverged_keys(self, mock_cassandra, tmpdir, caplog):
+        apply_journal = journal.ApplyJournal(os.path.join(str(tmpdir), "apply.journal"))
+        current = "Important biological records"
+        # Applied and unchanged since
+        self.record(apply_journal, "monkeyspecies", "old", current)
+        # Recorded, but the table still has its old value
+        self.record(apply_journal, "monkeyspecies2", current, "new")
+        # Older journal entry without changes
+        with open(apply_journal.filename, "a", encoding="utf-8") as out:
+            out.write(json.dumps({"keyspace": "excalibur", "table": None}) + "\n")
+
+        with db.Db(
+            db.ConnectionParams(host=mock_cassandra.host, port=mock_cassandra.port)
+        ) as conn:
+            assert journal.get_diverged_keys(conn, apply_journal.load()) == {
+                "excalibur.monkeyspecies2"
+            }
+            assert "did not take effect" in caplog.text
+
+            # Changed by someone else after the statement was recorded
+            mock_cassandra.schema.alter(
+                "system_schema.tables", "excalibur", "monkeyspecies", {"comment": "x"}
+            )
+            assert journal.get_diverged_keys(conn, apply_journal.load()) == {
+                "excalibur.monkeyspecies",
+                "excalibur.monkeyspecies2",
+            }
+            assert "excalibur.monkeyspecies changed since" in caplog.text
+
+            assert journal.get_diverged_keys(conn, []) == set()
@@ -0,0 +1,22 @@
+# pylint: disable=missing-docstring, no-self-use
+from tableproperties.tests import membench
+
+
+class TestMemoryBenchmark:
+    def test_measure(self):
+        result, record = membench.measure("stage", lambda: [0] * 100000, 10)
+        assert len(result) == 100000
+        assert record["peak_bytes"] >= 800000
+        assert record["peak_bytes_per_table"] == record["peak_bytes"] // 10
+        assert record["ok"]
+        assert record["hotspots"][0].startswith(__file__)
+
+    def test_thresholds(self):
+        records = membench.run_benchmark(keyspaces=2, tables=100)
+        assert [record["stage"] for record in records] == [
+            "get_current_config",
+            "yaml.dump",
+            "generate_alter_statements",
+        ]
+        for record in records:
+            assert record["ok"], record
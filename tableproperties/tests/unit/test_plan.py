@@ -0,0 +1,104 @@
+# pylint: disable=missing-docstring, no-self-use
+import tableproperties.plan as plan
+
+
+def change(prop: str, current, desired) -> dict:
+    return {"property": prop, "current": current, "desired": desired}
+
+
+class TestChangePlan:
+    def test_merge_and_order(self):
+        change_plan = plan.ChangePlan()
+        change_plan.add_change_sets(
+            [
+                ("ks", "a", [change("comment", "", "x")]),
+                ("ks", "b", [change("comment", "", "y")]),
+            ]
+        )
+        change_plan.add_change_sets(
+            [
+                ("ks", None, [change("durable_writes", True, False)]),
+                ("ks", "a", [change("gc_grace_seconds", 864000, 3600),
+                             change("comment", "", "x")]),
+            ]
+        )
+
+        assert list(change_plan) == [
+            ("ks", None, [change("durable_writes", True, False)]),
+            ("ks", "a", [change("comment", "", "x"),
+                         change("gc_grace_seconds", 864000, 3600)]),
+            ("ks", "b", [change("comment", "", "y")]),
+        ]
+        assert [tbl for _, tbl, _ in change_plan.statements()] == [None, "a", "b"]
+        assert change_plan.estimate_cost() == {
+            "statements": 3,
+            "keyspace_statements": 1,
+            "table_statements": 2,
+            "properties": 4,
+            "merged_or_dropped": 1,
+        }
+
+    def test_conflicts_and_noops(self):
+        change_plan = plan.ChangePlan()
+        change_plan.add("ks", "a", [change("comment", "", "x")])
+        change_plan.add("ks", "a", [change("comment", "", "z")])
+        change_plan.add("ks", "b", [change("comment", "same", "same")])
+
+        assert list(change_plan) == [("ks", "a", [change("comment", "", "z")])]
+        assert len(change_plan) == 1
+
+    def test_conflicts_with_current_values(self, caplog):
+        change_plan = plan.ChangePlan()
+        change_plan.add("ks", "a", [change("comment", "", "x")])
+        change_plan.add("ks", "a", [], unchanged=["comment"])
+        assert not list(change_plan)
+
+        change_plan.add("ks", "b", [change("comment", "same", "same")])
+        change_plan.add("ks", "b", [change("comment", "same", "y")])
+        assert list(change_plan) == [("ks", "b", [change("comment", "same", "y")])]
+        assert caplog.text.count("Conflicting changes of 'comment'") == 2
+
+    def test_add_config(self, caplog):
+        def config(comment: str, gc_grace_seconds: int) -> dict:
+            table = {
+                "name": "a",
+                "comment": comment,
+                "gc_grace_seconds": gc_grace_seconds,
+            }
+            return {"keyspaces": [{"name": "ks", "tables": [table]}]}
+
+        current = config("old", 864000)
+        change_plan = plan.ChangePlan()
+        change_plan.add_config(current, config("new", 864000))
+        change_plan.add_config(current, config("old", 3600))
+
+        # The later file keeps the comment and changes gc_grace_seconds
+        assert list(change_plan) == [
+            ("ks", "a", [change("gc_grace_seconds", 864000, 3600)])
+        ]
+        assert "Keeping the current value instead of 'new'" in caplog.text
+        assert "Using 3600 instead of the current value" in caplog.text
+
+    def test_size_order(self):
+        change_plan = plan.ChangePlan()
+        change_plan.add("ks", "big", [change("compaction", {"class": "A"}, {"class": "B"})])
+        change_plan.add("ks", "small", [change("compression", {"a": "1"}, {"a": "2"})])
+        change_plan.add("ks", "cheap", [change("comment", "", "x")])
+        change_plan.add("ks", "new", [change("compaction", {"class": "A"}, {"class": "B"})])
+        change_plan.add("ks", None, [change("durable_writes", True, False)])
+
+        # Insertion order without size estimates
+        assert [tbl for _, tbl, _ in change_plan] == [None, "big", "small", "cheap", "new"]
+        assert change_plan.get_size("ks", "big") is None
+
+        change_plan.set_size_estimates({("ks", "big"): 1000, ("ks", "small"): 10})
+        # Tables of unknown size last
+        assert [tbl for _, tbl, _ in change_plan] == [None, "cheap", "small", "big", "new"]
+        assert change_plan.rewrites() == [
+            {"keyspace": "ks", "table": "small", "properties": ["compression"],
+             "estimated_bytes": 10},
+            {"keyspace": "ks", "table": "big", "properties": ["compaction"],
+             "estimated_bytes": 1000},
+            {"keyspace": "ks", "table": "new", "properties": ["compaction"],
+             "estimated_bytes": None},
+        ]
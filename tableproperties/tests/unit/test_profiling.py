@@ -0,0 +1,62 @@
+# pylint: disable=missing-docstring, no-self-use
+import os
+import pstats
+
+import tableproperties.profiling as profiling
+
+
+def busy(count: int) -> int:
+    return sum(range(count))
+
+
+class Worker:
+    def outer(self) -> int:
+        return busy(1000) + self.inner()
+
+    def inner(self) -> int:
+        return busy(2000)
+
+
+class TestPhaseProfiler:
+    def test_disabled(self, tmpdir):
+        profiler = profiling.PhaseProfiler(None)
+        worker = Worker()
+        profiler.instrument(worker, {"inner": "inner"})
+        assert "inner" not in vars(worker)
+        with profiler.phase("test"):
+            busy(10)
+        assert profiler.write() == []
+        assert os.listdir(str(tmpdir)) == []
+
+    def test_nested_phases(self, tmpdir):
+        directory = os.path.join(str(tmpdir), "profile")
+        profiler = profiling.PhaseProfiler(directory, top=5)
+        worker = Worker()
+        profiler.instrument(worker, {"outer": "outer", "inner": "inner"})
+
+        for _ in range(2):
+            assert worker.outer() == busy(1000) + busy(2000)
+
+        filenames = profiler.write()
+        assert sorted(os.listdir(directory)) == [
+            "inner.pstats",
+            "outer.pstats",
+            profiling.SUMMARY_FILENAME,
+        ]
+        assert len(filenames) == 3
+
+        # Calls of the inner phase are not attributed to the outer phase
+        inner_funcs = {
+            func[2] for func in pstats.Stats(os.path.join(directory, "inner.pstats")).stats
+        }
+        outer_stats = pstats.Stats(os.path.join(directory, "outer.pstats")).stats
+        assert "inner" in inner_funcs
+        assert [
+            stat[0] for func, stat in outer_stats.items() if func[2] == "busy"
+        ] == [2]
+
+        with open(os.path.join(directory, profiling.SUMMARY_FILENAME)) as summary:
+            text = summary.read()
+        assert "=== outer ===" in text
+        assert "=== inner ===" in text
+        assert text.splitlines()[1].split()[:2] == ["outer", "2"]
@@ -0,0 +1,124 @@
+# pylint: disable=missing-docstring, no-self-use
+import pytest
+
+import tableproperties.db as db
+import tableproperties.scheduler as scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class FakeDb:
+    def __init__(self, versions=None):
+        self.executed = []
+        self.versions = versions if versions else {"v1"}
+
+    def execute_statement(self, stmt: str) -> None:
+        self.executed.append(stmt)
+
+    def get_schema_versions(self) -> set:
+        return self.versions
+
+
+class TestTokenBucket:
+    def test_rate(self):
+        clock = FakeClock()
+        bucket = scheduler.TokenBucket(2.0, clock=clock, sleep=clock.sleep)
+        assert bucket.acquire() == 0.0
+        assert bucket.acquire() == pytest.approx(0.5)
+        clock.now += 10.0
+        # Capacity limits the burst after an idle period
+        assert bucket.acquire() == 0.0
+        assert bucket.acquire() == pytest.approx(0.5)
+
+    def test_invalid_rate(self):
+        with pytest.raises(ValueError):
+            scheduler.TokenBucket(0)
+
+
+class TestApplyScheduler:
+    def test_apply(self):
+        clock = FakeClock()
+        conn = FakeDb()
+        progress = []
+        applier = scheduler.ApplyScheduler(
+            conn,
+            rate=100.0,
+            progress=lambda *args: progress.append(args),
+            sleep=clock.sleep,
+        )
+        stmts = [("ks", None, "ALTER KEYSPACE 1"), ("ks", "a", "ALTER TABLE 2")]
+
+        assert applier.apply(stmts) == stmts
+        assert conn.executed == ["ALTER KEYSPACE 1", "ALTER TABLE 2"]
+        assert [(done, total) for done, total, _, _ in progress] == [(1, 2), (2, 2)]
+
+    def test_no_schema_agreement(self):
+        conn = FakeDb({"v1", "v2"})
+        applier = scheduler.ApplyScheduler(conn, agreement_timeout=0)
+        with pytest.raises(scheduler.SchemaAgreementError):
+            applier.apply([("ks", "a", "ALTER TABLE 1")])
+        assert conn.executed == []
+
+    def test_adaptive_backoff(self):
+        applier = scheduler.ApplyScheduler(FakeDb())
+        applier.adapt_backoff(3.0)
+        assert applier.backoff == 3.0
+        applier.adapt_backoff(2.0)
+        assert applier.backoff == 6.0
+        applier.adapt_backoff(0.1)
+        assert applier.backoff == 3.0
+        for _ in range(10):
+            applier.adapt_backoff(0.1)
+        assert applier.backoff == 0.0
+
+    def test_rewrite_rate(self):
+        sleeps = []
+        conn = FakeDb()
+        applier = scheduler.ApplyScheduler(
+            conn,
+            rate=1000.0,
+            progress=lambda *args: None,
+            sleep=sleeps.append,
+            rewrite_rate=100.0,
+            rewrite_sizes={("ks", "a"): 500, ("ks", "b"): 1000},
+        )
+        applier.apply(
+            [
+                ("ks", "a", "ALTER TABLE 1"),
+                ("ks", "c", "ALTER TABLE 2"),
+                ("ks", "b", "ALTER TABLE 3"),
+            ]
+        )
+        assert len(conn.executed) == 3
+        # The rewrite of the second table waits for the first one only
+        assert [delay for delay in sleeps if delay > 1.0] == [
+            pytest.approx(5.0, abs=0.5)
+        ]
+
+    def test_invalid_rewrite_rate(self):
+        with pytest.raises(ValueError):
+            scheduler.ApplyScheduler(FakeDb(), rewrite_rate=0.0)
+
+    def test_apply_mock_cassandra(self, mock_cassandra):
+        mock_cassandra.peer_count = 2
+        mock_cassandra.agreement_delay = 0.2
+        stmt = '\nALTER TABLE "excalibur"."monkeyspecies"\nWITH comment = \'x\';'
+        with db.Db(
+            db.ConnectionParams(host=mock_cassandra.host, port=mock_cassandra.port)
+        ) as conn:
+            applier = scheduler.ApplyScheduler(conn, rate=10.0)
+            applier.apply([("excalibur", "monkeyspecies", stmt)])
+            assert len(conn.get_schema_versions()) == 1
+            tables = conn.get_table_configs("excalibur", True)
+
+        assert mock_cassandra.schema.alter_count == 1
+        assert tables[0]["comment"] == "x"
@@ -0,0 +1,104 @@
+# pylint: disable=missing-docstring, no-self-use
+import copy
+import os
+
+import pytest
+import yaml
+
+from tableproperties import snapshots
+
+
+def load_config() -> dict:
+    with open("./tableproperties/tests/mocks/excalibur.yaml", "r") as f:
+        return yaml.safe_load(f)
+
+
+def count_blobs(directory: str) -> int:
+    return sum(
+        len(files)
+        for _, _, files in os.walk(os.path.join(directory, snapshots.OBJECTS_DIR))
+    )
+
+
+class TestSnapshotStore:
+    def test_save_and_load(self, tmpdir):
+        store = snapshots.SnapshotStore(str(tmpdir))
+        config = load_config()
+        ref = store.save("prod", config, created_at=0.0)
+        assert ref == "prod/19700101T000000.000000Z"
+        assert store.load_config(ref) == config
+        # Both tables have the same properties and share a blob
+        assert count_blobs(str(tmpdir)) == 2
+
+    def test_same_timestamp(self, tmpdir):
+        store = snapshots.SnapshotStore(str(tmpdir))
+        config = load_config()
+        changed = copy.deepcopy(config)
+        changed["keyspaces"][0]["tables"][0]["comment"] = "changed"
+
+        first = store.save("prod", config, created_at=0.0)
+        second = store.save("prod", changed, created_at=0.0)
+        assert second == "prod/19700101T000000.000000Z-1"
+        assert store.resolve("prod/latest") == ("prod", "19700101T000000.000000Z-1")
+        assert store.load_config(first) == config
+        assert store.load_config(second) == changed
+
+    def test_deduplication_and_diff(self, tmpdir):
+        store = snapshots.SnapshotStore(str(tmpdir))
+        config = load_config()
+        store.save("prod", config, created_at=0.0)
+
+        changed = copy.deepcopy(config)
+        tables = changed["keyspaces"][0]["tables"]
+        tables[0]["comment"] = "changed"
+        new_table = dict(tables[1], name="monkeyspecies3")
+        tables.pop(1)
+        tables.append(new_table)
+        store.save("prod", changed, created_at=86400.0)
+        store.save("prod", changed, created_at=2 * 86400.0)
+
+        # Only the changed table is stored again
+        assert count_blobs(str(tmpdir)) == 3
+        assert len(store.list_snapshots("prod")) == 3
+        assert store.resolve("prod/latest~2") == ("prod", "19700101T000000.000000Z")
+
+        assert store.diff("prod/latest~1", "prod/latest") == []
+        assert store.diff("prod/latest~2", "prod/latest") == [
+            {
+                "keyspace": "excalibur",
+                "table": tables[0]["name"],
+                "change": snapshots.CHANGE_CHANGED,
+                "property": "comment",
+                "old": config["keyspaces"][0]["tables"][0]["comment"],
+                "new": "changed",
+            },
+            {
+                "keyspace": "excalibur",
+                "table": "monkeyspecies2",
+                "change": snapshots.CHANGE_REMOVED,
+            },
+            {
+                "keyspace": "excalibur",
+                "table": "monkeyspecies3",
+                "change": snapshots.CHANGE_ADDED,
+            },
+        ]
+
+    def test_unknown_snapshot(self, tmpdir):
+        store = snapshots.SnapshotStore(str(tmpdir))
+        store.save("prod", load_config())
+        for ref in ("prod/latest~1", "test/latest", "latest", "prod/20200101"):
+            with pytest.raises(snapshots.SnapshotError):
+                store.load_manifest(ref)
+
+    def test_invalid_names(self, tmpdir):
+        store = snapshots.SnapshotStore(str(tmpdir))
+        for cluster in ("", "..", ".", "../prod", "a/b", "a" + os.sep + "b"):
+            with pytest.raises(snapshots.SnapshotError):
+                store.save(cluster, load_config())
+        store.save("prod", load_config())
+        for ref in ("../prod/latest", "prod/../prod/latest", "prod/..", "/latest"):
+            with pytest.raises(snapshots.SnapshotError):
+                store.resolve(ref)
+        # Nothing was written outside the cluster directory
+        assert os.listdir(os.path.join(str(tmpdir), snapshots.SNAPSHOTS_DIR)) == ["prod"]
@@ -21,3 +21,18 @@ class TestFindByValue:
         assert utils.find_by_value(l, "d", 4) == {"c": 3, "d": 4}
         assert utils.find_by_value(l, "e", 1) == {"e": 1}
         assert utils.find_by_value(l, "e", None) is None
+
+
+class TestIndexByValue:
+    def test_index(self):
+        l = [{"name": "a", "v": 1}, {"name": "b"}, {"name": "a", "v": 2}, {}, 3]
+        index = utils.index_by_value(l, "name")
+        assert sorted(index.keys()) == ["a", "b"]
+        assert index["a"] == {"name": "a", "v": 1}
+        assert utils.index_by_value(None, "name") == {}
+
+
+class TestChunked:
+    def test_chunks(self):
+        assert list(utils.chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+        assert list(utils.chunked([], 2)) == []
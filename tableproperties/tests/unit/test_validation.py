@@ -0,0 +1,83 @@
+# pylint: disable=missing-docstring, no-self-use
+import glob
+import os
+
+import pytest
+
+import tableproperties.validation as validation
+from tableproperties import tests
+
+INVALID_CONFIG = """keyspaces:
+- name: excalibur
+  durable_writes: maybe
+  replication:
+    class: org.apache.cassandra.locator.MoonStrategy
+  tables:
+  - name: monkeyspecies
+    gc_grace_seconds: 1.5
+    compaction:
+      class: FooCompactionStrategy
+    compression:
+      class: com.example.CustomCompressor
+    bogus: 1
+  - name: monkeyspecies
+  - comment: no name
+"""
+
+
+class TestValidation:
+    def test_valid_configs(self):
+        filenames = glob.glob(os.path.join(tests.TEST_ROOT, "configs", "*.yaml"))
+        filenames.append(os.path.join(tests.TEST_ROOT, "mocks", "excalibur.yaml"))
+        for filename in filenames:
+            if filename.endswith("excalibur_change_ks_and_tbl.yaml"):
+                continue
+            config = validation.load_config_file(filename)
+            assert config["keyspaces"][0]["name"] == "excalibur"
+
+    def test_error_locations(self):
+        with pytest.raises(validation.ValidationError) as ex:
+            validation.load_config(INVALID_CONFIG, "desired.yaml")
+
+        assert ex.value.filename == "desired.yaml"
+        assert ex.value.errors == [
+            ((3, 19), "Property 'durable_writes' must be a boolean"),
+            (
+                (5, 12),
+                "Unknown replication class 'org.apache.cassandra.locator.MoonStrategy'",
+            ),
+            ((8, 23), "Property 'gc_grace_seconds' must be an integer"),
+            ((10, 14), "Unknown compaction class 'FooCompactionStrategy'"),
+            ((13, 5), "Unknown table property 'bogus'"),
+            ((14, 11), "Duplicate table 'monkeyspecies'"),
+            ((15, 5), "Missing table name"),
+        ]
+        assert str(ex.value).startswith(
+            "desired.yaml:3:19: Property 'durable_writes' must be a boolean\n"
+        )
+
+    def test_unknown_compressor(self):
+        filename = os.path.join(
+            tests.TEST_ROOT, "configs", "excalibur_change_ks_and_tbl.yaml"
+        )
+        with pytest.raises(validation.ValidationError) as ex:
+            validation.load_config_file(filename)
+        assert ex.value.errors == [
+            ((47, 14), "Unknown compression class 'LZ5Compressor'")
+        ]
+
+    def test_syntax_errors(self):
+        with pytest.raises(validation.ValidationError) as ex:
+            validation.load_config("keyspaces: [\n  {name: a\n")
+        assert ex.value.errors[0][0] == (3, 1)
+
+        for text in ("", "- a\n", "tables: []\n", "keyspaces: {}\n"):
+            with pytest.raises(validation.ValidationError):
+                validation.load_config(text)
+
+    def test_nulls_and_numbers(self):
+        config = validation.load_config(
+            "keyspaces:\n- name: ks\n  tables:\n"
+            "  - name: t\n    cdc: null\n    crc_check_chance: 1\n"
+        )
+        assert config["keyspaces"][0]["tables"][0]["crc_check_chance"] == 1
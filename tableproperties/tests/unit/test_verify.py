@@ -0,0 +1,66 @@
+# pylint: disable=missing-docstring, no-self-use
+import tableproperties.db as db
+import tableproperties.verify as verify
+
+CHANGE_SETS = [
+    ("excalibur", None, [{"property": "durable_writes", "desired": True}]),
+    (
+        "excalibur",
+        "monkeyspecies",
+        [{"property": "comment", "current": "", "desired": "Monkeys"}],
+    ),
+]
+
+
+class TestVerify:
+    def test_get_desired_config(self):
+        assert verify.get_desired_config(CHANGE_SETS) == {
+            "keyspaces": [
+                {
+                    "name": "excalibur",
+                    "durable_writes": True,
+                    "tables": [{"name": "monkeyspecies", "comment": "Monkeys"}],
+                }
+            ]
+        }
+
+    def test_verify_change_sets(self, mock_cassandra):
+        with db.Db(db.ConnectionParams(mock_cassandra.host, mock_cassandra.port)) as d:
+            d.connect()
+            queries = mock_cassandra.stats["queries"] + mock_cassandra.stats["executes"]
+
+            records = verify.verify_change_sets(d, CHANGE_SETS)
+            assert [(rec["table"], rec["property"]) for rec in records] == [
+                ("monkeyspecies", "comment")
+            ]
+            assert records[0]["desired"] == "Monkeys"
+
+            # One keyspace and one table query
+            assert (
+                mock_cassandra.stats["queries"]
+                + mock_cassandra.stats["executes"]
+                - queries
+                == 2
+            )
+
+            d.execute_statement(
+                "ALTER TABLE excalibur.monkeyspecies WITH comment = 'Monkeys';"
+            )
+            assert verify.verify_change_sets(d, CHANGE_SETS) == []
+
+    def test_verify_dropped(self, mock_cassandra):
+        mock_cassandra.schema.drop_table("excalibur", "monkeyspecies")
+        with db.Db(db.ConnectionParams(mock_cassandra.host, mock_cassandra.port)) as d:
+            records = verify.verify_change_sets(d, CHANGE_SETS)
+            assert [
+                (rec["table"], rec["property"], rec["current"]) for rec in records
+            ] == [("monkeyspecies", "comment", None)]
+
+            missing_keyspace = [
+                ("gone", None, [{"property": "durable_writes", "desired": True}]),
+                ("gone", "t", [{"property": "comment", "desired": "x"}]),
+            ]
+            assert [
+                (rec["keyspace"], rec["table"], rec["property"])
+                for rec in verify.verify_change_sets(d, missing_keyspace)
+            ] == [("gone", None, "durable_writes"), ("gone", "t", "comment")]
@@ -0,0 +1,21 @@
+# pylint: disable=missing-docstring, no-self-use
+from tableproperties import db
+from tableproperties.tests import wirebench
+
+
+class TestWireBenchmark:
+    def test_run_benchmark(self):
+        records = wirebench.run_benchmark(
+            keyspaces=1, tables=200, fetch_sizes=(50, 500), latency=0.0, bandwidth=0.0
+        )
+        by_settings = {
+            (record["compression"], record["fetch_size"]): record for record in records
+        }
+        assert by_settings[(db.COMPRESSION_NONE, 50)]["pages"] > by_settings[
+            (db.COMPRESSION_NONE, 500)
+        ]["pages"]
+        for compression in wirebench.get_compressions()[1:]:
+            assert (
+                by_settings[(compression, 500)]["bytes_sent"]
+                < by_settings[(db.COMPRESSION_NONE, 500)]["bytes_sent"]
+            )
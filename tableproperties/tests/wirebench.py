@@ -0,0 +1,166 @@
+""" Wire benchmark of schema reads with protocol compression and page sizes
+
+The mock server runs in the same process and counts the bytes of every
+frame. A per connection bandwidth and response latency stand in for a
+cross-region link. Every combination of compression and fetch size reads
+the full schema and reports the bytes transferred, the number of pages
+and the median duration.
+"""
+import argparse
+import statistics
+import time
+from typing import Any, Dict, List, Sequence
+
+from tableproperties import db
+from tableproperties.tests.mockcassandra import (
+    FRAME_COMPRESSIONS,
+    MockCassandraServer,
+    MockSchema,
+)
+
+DEFAULT_FETCH_SIZES = (100, 1000, db.DEFAULT_FETCH_SIZE)
+# 10 MiB/s and 20ms per request
+DEFAULT_BANDWIDTH = 10.0 * 1024 * 1024
+DEFAULT_LATENCY = 0.02
+
+
+def get_compressions() -> List[str]:
+    """List the compressions to compare
+
+    Returns:
+        none and every compression of db.COMPRESSIONS, lz4 and snappy,
+        whose package is installed for the driver and the mock server
+    """
+    return [db.COMPRESSION_NONE] + [
+        compression
+        for compression in db.COMPRESSIONS
+        if db.is_compression_available(compression)
+        and compression in FRAME_COMPRESSIONS
+    ]
+
+
+def measure(
+    server: MockCassandraServer, compression: str, fetch_size: int, repeat: int
+    ) -> Dict[str, Any]:
+    """Read the current config with one combination of settings
+
+    Args:
+        server:      Running mock server
+        compression: Protocol compression
+        fetch_size:  Rows per page
+        repeat:      Number of reads
+
+    Returns:
+        Record of the median read
+    """
+    params = db.ConnectionParams(
+        host=server.host,
+        port=server.port,
+        fast_connect=True,
+        compression=compression,
+        fetch_size=fetch_size,
+    )
+    durations = []
+    with db.Db(params) as conn:
+        conn.connect(warm_up=True)
+        start_stats = dict(server.stats)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.get_current_config()
+            durations.append(time.perf_counter() - start)
+        end_stats = dict(server.stats)
+
+    def per_read(stat: str) -> int:
+        return (end_stats[stat] - start_stats[stat]) // repeat
+
+    return {
+        "compression": compression,
+        "fetch_size": fetch_size,
+        "pages": per_read("executes"),
+        "bytes_sent": per_read("bytes_sent"),
+        "bytes_received": per_read("bytes_received"),
+        "seconds": statistics.median(durations),
+    }
+
+
+def run_benchmark(
+    keyspaces: int,
+    tables: int,
+    fetch_sizes: Sequence[int] = DEFAULT_FETCH_SIZES,
+    latency: float = DEFAULT_LATENCY,
+    bandwidth: float = DEFAULT_BANDWIDTH,
+    repeat: int = 3,
+    ) -> List[Dict[str, Any]]:
+    """Measure every combination of compression and fetch size
+
+    Args:
+        keyspaces:   Number of synthetic keyspaces
+        tables:      Tables per keyspace
+        fetch_sizes: Rows per page to compare
+        latency:     Seconds to delay every response
+        bandwidth:   Bytes per second per connection
+        repeat:      Reads per combination
+
+    Returns:
+        List of records
+    """
+    schema = MockSchema.synthetic(keyspaces, tables)
+    records = []
+    with MockCassandraServer(
+        schema,
+        latency=latency,
+        compressions=tuple(get_compressions()[1:]),
+        bandwidth=bandwidth,
+    ) as server:
+        for compression in get_compressions():
+            for fetch_size in fetch_sizes:
+                records.append(measure(server, compression, fetch_size, repeat))
+    return records
+
+
+def main():
+    """ Run the benchmark and print one line per combination """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keyspaces", type=int, default=2, help="Synthetic keyspaces")
+    parser.add_argument("--tables", type=int, default=2000, help="Tables per keyspace")
+    parser.add_argument(
+        "--fetch-sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_FETCH_SIZES,
+        help="Rows per page to compare",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=DEFAULT_LATENCY, help="Response delay in s"
+    )
+    parser.add_argument(
+        "--bandwidth",
+        type=float,
+        default=DEFAULT_BANDWIDTH,
+        help="Bytes per s per connection",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Reads per combination")
+    args = parser.parse_args()
+
+    records = run_benchmark(
+        args.keyspaces,
+        args.tables,
+        args.fetch_sizes,
+        args.latency,
+        args.bandwidth,
+        args.repeat,
+    )
+    print(
+        "{:<12} {:>10} {:>6} {:>14} {:>14} {:>10}".format(
+            "compression", "fetch_size", "pages", "bytes sent", "bytes received", "seconds"
+        )
+    )
+    for record in records:
+        print(
+            "{compression:<12} {fetch_size:>10} {pages:>6} {bytes_sent:>14,} "
+            "{bytes_received:>14,} {seconds:>10.3f}".format(**record)
+        )
+
+
+if __name__ == "__main__":
+    main()
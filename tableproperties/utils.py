@@ -1,8 +1,9 @@
 # pylint: disable = missing-docstring
 """ Helper functions
 """
+import itertools
 import logging
-from typing import Any
+from typing import Any, Dict, Iterable, Iterator, List
 import sys
 
 DEFAULT_LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -39,3 +40,33 @@ def find_by_value(dict_list: list, key: str, value, default_value=None) -> Any:
     )
 
     return matches[0] if matches else default_value
+
+
+def index_by_value(dict_list: list, key: str) -> Dict[Any, dict]:
+    """Index list of dictionaries by value
+
+    Returns:
+        Dictionary mapping each value to the first dictionary containing it
+    """
+    index = {}  # type: Dict[Any, dict]
+    if not isinstance(dict_list, list) or not key:
+        return index
+
+    for item in dict_list:
+        if isinstance(item, dict) and item.get(key) and item[key] not in index:
+            index[item[key]] = item
+
+    return index
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[List[Any]]:
+    """Split iterable into lists of up to size items
+
+    Returns:
+        Iterator of lists
+    """
+    iterator = iter(iterable)
+    chunk = list(itertools.islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(itertools.islice(iterator, size))
@@ -0,0 +1,360 @@
+""" Desired configuration validation
+"""
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple, Union
+
+import yaml
+
+STR = "tag:yaml.org,2002:str"
+INT = "tag:yaml.org,2002:int"
+FLOAT = "tag:yaml.org,2002:float"
+BOOL = "tag:yaml.org,2002:bool"
+NULL = "tag:yaml.org,2002:null"
+MAP = "map"
+LIST = "list"
+
+TYPE_NAMES = {
+    STR: "a string",
+    INT: "an integer",
+    FLOAT: "a number",
+    BOOL: "a boolean",
+    MAP: "a mapping",
+    LIST: "a list",
+}
+
+# Accepted YAML tags per expected type
+ACCEPTED_TAGS = {STR: {STR}, INT: {INT}, FLOAT: {INT, FLOAT}, BOOL: {BOOL}}
+
+KEYSPACE_PROPERTIES = {
+    "name": STR,
+    "durable_writes": BOOL,
+    "replication": MAP,
+    "tables": LIST,
+}
+
+TABLE_PROPERTIES = {
+    "name": STR,
+    "id": STR,
+    "additional_write_policy": STR,
+    "allow_auto_snapshot": BOOL,
+    "bloom_filter_fp_chance": FLOAT,
+    "caching": MAP,
+    "cdc": BOOL,
+    "comment": STR,
+    "compaction": MAP,
+    "compression": MAP,
+    "crc_check_chance": FLOAT,
+    "dclocal_read_repair_chance": FLOAT,
+    "default_time_to_live": INT,
+    "extensions": MAP,
+    "flags": LIST,
+    "gc_grace_seconds": INT,
+    "incremental_backups": BOOL,
+    "max_index_interval": INT,
+    "memtable": STR,
+    "memtable_flush_period_in_ms": INT,
+    "min_index_interval": INT,
+    "read_repair": STR,
+    "read_repair_chance": FLOAT,
+    "speculative_retry": STR,
+}
+
+# Known classes of class properties. Fully qualified names of these
+# classes are accepted as well as any other fully qualified custom class.
+CLASS_NAMES = {
+    ("keyspace", "replication"): (
+        "org.apache.cassandra.locator.",
+        {
+            "SimpleStrategy",
+            "NetworkTopologyStrategy",
+            "LocalStrategy",
+            "EverywhereStrategy",
+        },
+    ),
+    ("table", "compaction"): (
+        "org.apache.cassandra.db.compaction.",
+        {
+            "SizeTieredCompactionStrategy",
+            "LeveledCompactionStrategy",
+            "TimeWindowCompactionStrategy",
+            "DateTieredCompactionStrategy",
+            "UnifiedCompactionStrategy",
+        },
+    ),
+    ("table", "compression"): (
+        "org.apache.cassandra.io.compress.",
+        {
+            "LZ4Compressor",
+            "SnappyCompressor",
+            "DeflateCompressor",
+            "ZstdCompressor",
+            "NoopCompressor",
+        },
+    ),
+}
+
+Location = Tuple[int, int]
+
+
+class ValidationError(Exception):
+    """Invalid desired configuration
+
+    Attributes:
+        filename: Name of the configuration file
+        errors:   List of ((line, column), message) tuples. Lines and
+                  columns start at 1.
+    """
+
+    def __init__(self, filename: str, errors: List[Tuple[Location, str]]):
+        self.filename = filename
+        self.errors = errors
+        super().__init__(
+            "\n".join(
+                "{}:{}:{}: {}".format(filename, line, column, msg)
+                for (line, column), msg in errors
+            )
+        )
+
+
+def get_location(node: yaml.Node) -> Location:
+    """ Line and column of a node starting at 1 """
+    return node.start_mark.line + 1, node.start_mark.column + 1
+
+
+def get_mapping(node: yaml.MappingNode) -> Dict[str, yaml.Node]:
+    """ Value nodes of a mapping node by key """
+    return {key_node.value: val_node for key_node, val_node in node.value}
+
+
+def is_type(node: yaml.Node, expected: str) -> bool:
+    """Check the type of a node
+
+    Args:
+        node:     YAML node
+        expected: One of the type constants
+
+    Returns:
+        True if the node has the expected type or is null
+    """
+    if isinstance(node, yaml.ScalarNode) and node.tag == NULL:
+        return True
+    if expected == MAP:
+        return isinstance(node, yaml.MappingNode)
+    if expected == LIST:
+        return isinstance(node, yaml.SequenceNode)
+    return isinstance(node, yaml.ScalarNode) and node.tag in ACCEPTED_TAGS[expected]
+
+
+def iter_class_errors(
+    kind: str, prop: str, node: yaml.MappingNode
+    ) -> Iterator[Tuple[Location, str]]:
+    """Check the class name of a class property
+
+    Args:
+        kind: "keyspace" or "table"
+        prop: Property name
+        node: Mapping of the property
+
+    Returns:
+        Iterator of (location, message) tuples
+    """
+    prefix, known = CLASS_NAMES[(kind, prop)]
+    for key_node, val_node in node.value:
+        if not isinstance(val_node, yaml.ScalarNode):
+            yield get_location(val_node), "Value of '{}.{}' must be a scalar".format(
+                prop, key_node.value
+            )
+        elif key_node.value == "class":
+            name = val_node.value
+            short_name = name[len(prefix) :] if name.startswith(prefix) else name
+            if short_name not in known and (
+                "." not in short_name or name.startswith(prefix)
+            ):
+                yield get_location(val_node), "Unknown {} class '{}'".format(prop, name)
+
+
+def iter_entity_errors(
+    kind: str, node: yaml.Node, schema: Dict[str, str]
+    ) -> Iterator[Tuple[Location, str]]:
+    """Check the properties of a keyspace or table
+
+    Args:
+        kind:   "keyspace" or "table"
+        node:   Mapping node of the keyspace or table
+        schema: Property name to expected type
+
+    Returns:
+        Iterator of (location, message) tuples
+    """
+    if not isinstance(node, yaml.MappingNode):
+        yield get_location(node), "A {} must be a mapping".format(kind)
+        return
+
+    names = set()
+    for key_node, val_node in node.value:
+        prop = key_node.value
+        names.add(prop)
+        expected = schema.get(prop)
+        if expected is None:
+            yield get_location(key_node), "Unknown {} property '{}'".format(kind, prop)
+        elif not is_type(val_node, expected):
+            yield get_location(val_node), "Property '{}' must be {}".format(
+                prop, TYPE_NAMES[expected]
+            )
+        elif (kind, prop) in CLASS_NAMES and isinstance(val_node, yaml.MappingNode):
+            yield from iter_class_errors(kind, prop, val_node)
+
+    if "name" not in names:
+        yield get_location(node), "Missing {} name".format(kind)
+
+
+def iter_duplicate_errors(
+    kind: str, name_node: yaml.Node, seen: set
+    ) -> Iterator[Tuple[Location, str]]:
+    """Report a keyspace or table name that was already used
+
+    Args:
+        kind:      "keyspace" or "table"
+        name_node: Node of the name or None
+        seen:      Names seen so far. The name is added.
+
+    Returns:
+        Iterator of (location, message) tuples
+    """
+    if isinstance(name_node, yaml.ScalarNode):
+        if name_node.value in seen:
+            yield get_location(name_node), "Duplicate {} '{}'".format(
+                kind, name_node.value
+            )
+        seen.add(name_node.value)
+
+
+def iter_errors(node: yaml.Node) -> Iterator[Tuple[Location, str]]:
+    """Check a desired configuration
+
+    Args:
+        node: Root node of the configuration
+
+    Returns:
+        Iterator of (location, message) tuples
+    """
+    if not isinstance(node, yaml.MappingNode):
+        yield get_location(node), "Configuration must be a mapping with 'keyspaces'"
+        return
+
+    keyspaces_node = None
+    for key_node, val_node in node.value:
+        if key_node.value == "keyspaces":
+            keyspaces_node = val_node
+        else:
+            yield get_location(key_node), "Unknown key '{}'".format(key_node.value)
+
+    if keyspaces_node is None:
+        yield get_location(node), "Missing 'keyspaces'"
+        return
+    if not isinstance(keyspaces_node, yaml.SequenceNode):
+        yield get_location(keyspaces_node), "'keyspaces' must be a list"
+        return
+
+    keyspace_names = set()  # type: set
+    for ks_node in keyspaces_node.value:
+        yield from iter_entity_errors("keyspace", ks_node, KEYSPACE_PROPERTIES)
+        if not isinstance(ks_node, yaml.MappingNode):
+            continue
+
+        props = get_mapping(ks_node)
+        yield from iter_duplicate_errors("keyspace", props.get("name"), keyspace_names)
+
+        tables_node = props.get("tables")
+        if not isinstance(tables_node, yaml.SequenceNode):
+            continue
+        table_names = set()  # type: set
+        for tbl_node in tables_node.value:
+            yield from iter_entity_errors("table", tbl_node, TABLE_PROPERTIES)
+            if isinstance(tbl_node, yaml.MappingNode):
+                name_node = get_mapping(tbl_node).get("name")
+                yield from iter_duplicate_errors("table", name_node, table_names)
+
+
+def get_table_locations(node: yaml.Node) -> Dict[str, Location]:
+    """Find the name of every table of a valid configuration
+
+    Args:
+        node: Root node
+
+    Returns:
+        Dictionary of "<keyspace>.<table>" to the location of the table name
+    """
+    locations = {}  # type: Dict[str, Location]
+    for ks_node in get_mapping(node)["keyspaces"].value:
+        props = get_mapping(ks_node)
+        tables_node = props.get("tables")
+        if not isinstance(tables_node, yaml.SequenceNode):
+            continue
+        for tbl_node in tables_node.value:
+            name_node = get_mapping(tbl_node)["name"]
+            key = "{}.{}".format(props["name"].value, name_node.value)
+            locations[key] = get_location(name_node)
+    return locations
+
+
+def load_config(
+    stream: Union[str, TextIO],
+    filename: str = "<string>",
+    table_locations: Optional[Dict[str, Location]] = None,
+    ) -> Dict[str, Any]:
+    """Parse and validate a desired configuration
+
+    The document is composed once. The node tree is checked and only
+    turned into Python objects if it is valid.
+
+    Args:
+        stream:          YAML text or stream
+        filename:        Name used in error messages
+        table_locations: Filled with the locations of the table names as
+                         returned by get_table_locations if not None
+
+    Returns:
+        Configuration dictionary
+
+    Raises:
+        ValidationError with the location of every problem
+    """
+    loader = yaml.SafeLoader(stream)
+    try:
+        try:
+            node = loader.get_single_node()
+        except yaml.MarkedYAMLError as ex:
+            mark = ex.problem_mark if ex.problem_mark else ex.context_mark
+            raise ValidationError(
+                filename,
+                [((mark.line + 1, mark.column + 1), "{}".format(ex.problem))],
+            ) from ex
+
+        if node is None:
+            raise ValidationError(filename, [((1, 1), "Empty configuration")])
+
+        errors = list(iter_errors(node))
+        if errors:
+            raise ValidationError(filename, errors)
+
+        if table_locations is not None:
+            table_locations.update(get_table_locations(node))
+        return loader.construct_document(node)
+    finally:
+        loader.dispose()
+
+
+def load_config_file(filename: str) -> Dict[str, Any]:
+    """Parse and validate a desired configuration file
+
+    Args:
+        filename: YAML file name
+
+    Returns:
+        Configuration dictionary
+
+    Raises:
+        ValidationError with the location of every problem
+    """
+    with open(filename, "r", encoding="utf-8") as conf_file:
+        return load_config(conf_file, filename)
@@ -0,0 +1,89 @@
+""" Re-verification of applied changes
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from tableproperties import db, generator as gen
+
+ChangeSet = Tuple[str, Optional[str], list]
+
+
+def get_desired_config(change_sets: Iterable[ChangeSet]) -> Dict[str, Any]:
+    """Build a desired configuration holding only the changed properties
+
+    Args:
+        change_sets: (keyspace name, table name, changes) tuples
+
+    Returns:
+        Configuration dictionary in the layout of the YAML files
+    """
+    keyspaces = OrderedDict()  # type: Dict[str, Dict[str, Any]]
+    for ks_name, tbl_name, changes in change_sets:
+        keyspace = keyspaces.setdefault(ks_name, {"name": ks_name, "tables": []})
+        values = {chg.get("property"): chg.get("desired") for chg in changes}
+        if tbl_name is None:
+            keyspace.update(values)
+        else:
+            keyspace["tables"].append(dict(values, name=tbl_name))
+
+    return {"keyspaces": list(keyspaces.values())}
+
+
+def get_config_keys(
+    config: Optional[Dict[str, Any]]
+    ) -> Set[Tuple[str, Optional[str]]]:
+    """Collect the keyspaces and tables of a configuration
+
+    Args:
+        config: Configuration dictionary or None
+
+    Returns:
+        Set of (keyspace name, table name or None for the keyspace) tuples
+    """
+    keys = set()  # type: Set[Tuple[str, Optional[str]]]
+    for keyspace in (config or {}).get("keyspaces", []):
+        keys.add((keyspace["name"], None))
+        for table in keyspace.get("tables", []):
+            keys.add((keyspace["name"], table["name"]))
+    return keys
+
+
+def verify_change_sets(
+    conn: db.Db, change_sets: Iterable[ChangeSet]
+    ) -> List[Dict[str, Any]]:
+    """Check that changes were applied
+
+    Only the changed keyspaces and tables are read from system_schema,
+    so the cost grows with the number of changes and not with the size
+    of the schema.
+
+    Args:
+        conn:        Database connection
+        change_sets: Applied (keyspace name, table name, changes) tuples
+
+    Returns:
+        Change records of the properties that did not converge to their
+        desired value. Every changed property of a keyspace or table that
+        no longer exists is reported with a current value of None.
+    """
+    change_sets = list(change_sets)
+    desired_config = get_desired_config(change_sets)
+    current_config = conn.get_matching_config(desired_config)
+    missing_keys = get_config_keys(desired_config) - get_config_keys(current_config)
+
+    records = []  # type: List[Dict[str, Any]]
+    for ks_name, tbl_name, changes in change_sets:
+        if (ks_name, tbl_name) in missing_keys or (ks_name, None) in missing_keys:
+            records.extend(
+                gen.make_change_records(
+                    ks_name,
+                    tbl_name,
+                    [dict(chg, current=None) for chg in changes],
+                )
+            )
+    for ks_name, tbl_name, changes in gen.iter_change_sets(
+        current_config if current_config else {"keyspaces": []}, desired_config
+    ):
+        records.extend(gen.make_change_records(ks_name, tbl_name, changes))
+
+    return records